@@ -0,0 +1,82 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from threading import Thread
+
+log_dir = os.path.join(os.path.expanduser("~"), "YouLoader_logs")
+log_file = os.path.join(log_dir, "youloader.log")
+
+# Rotação por tamanho: o arquivo atual mais LOG_BACKUPS antigos
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+# Logs antigos (inclusive os error_log_*.txt de versões anteriores) são apagados depois disso
+LOG_RETENTION_DAYS = 14
+DEFAULT_LOG_LEVEL = "INFO"
+
+_listener = None
+
+
+def arquivo_de_log(frontend=None):
+    # Cada interface (janela, cli, worker, daemon) rotaciona o próprio arquivo: um RotatingFileHandler não sabe que
+    # outro processo está escrevendo no mesmo arquivo e a rotação de um perde ou embaralha as linhas do outro
+    return os.path.join(log_dir, f"youloader-{frontend}.log") if frontend else log_file
+
+
+def limpar_logs_antigos(dias=LOG_RETENTION_DAYS, atual=log_file):
+    limite = time.time() - dias * 24 * 60 * 60
+    for nome in os.listdir(log_dir):
+        path = os.path.join(log_dir, nome)
+        try:
+            if os.path.isfile(path) and path != atual and os.path.getmtime(path) < limite:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def nivel_de_log(nivel=None):
+    nivel = (nivel or os.environ.get("YOULOADER_LOG_LEVEL") or DEFAULT_LOG_LEVEL).upper()
+    valor = logging.getLevelName(nivel)
+    return valor if isinstance(valor, int) else logging.INFO
+
+
+def configurar_logging(nivel=None, frontend=None):
+    global _listener
+    os.makedirs(log_dir, exist_ok=True)
+    path = arquivo_de_log(frontend)
+    # Listar e consultar cada arquivo pode ser lento em perfis de rede; a limpeza não atrasa a inicialização
+    Thread(target=limpar_logs_antigos, kwargs={"atual": path}, daemon=True).start()
+
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES,
+                                                        backupCount=LOG_BACKUPS, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    # As threads de download só enfileiram o registro; a escrita em disco fica com a thread do listener
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(nivel_de_log(nivel))
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    # Registrado depois do logging, roda antes do logging.shutdown e esvazia a fila
+    atexit.register(_listener.stop)
+    return path
+
+
+class YtDlpLogger:
+    # Encaminha as mensagens do yt-dlp para o log do aplicativo em vez da saída padrão
+    def debug(self, msg):
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"yt-dlp: {msg.removeprefix('[debug] ')}")
+
+    def info(self, msg):
+        logging.info(f"yt-dlp: {msg}")
+
+    def warning(self, msg):
+        logging.warning(f"yt-dlp: {msg}")
+
+    def error(self, msg):
+        logging.error(f"yt-dlp: {msg}")
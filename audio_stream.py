@@ -0,0 +1,149 @@
+import re
+import subprocess
+import logging
+from threading import Thread
+
+from yt_dlp.networking.exceptions import HTTPError
+from yt_dlp.utils import ContentTooShortError
+
+CHUNK_SIZE = 64 * 1024
+# Contêineres que o FFmpeg consegue ler de um pipe; mp4/m4a comum guarda o índice no fim do arquivo
+STREAMABLE_EXTS = ('webm', 'weba', 'ogg', 'opus', 'mp3', 'aac', 'flac', 'wav', 'mka')
+
+
+class AudioStreamError(Exception):
+    pass
+
+
+def pode_transmitir(formato):
+    if formato.get('protocol') not in ('http', 'https') or not formato.get('url'):
+        return False
+    if formato.get('requested_formats') or formato.get('fragments'):
+        return False
+    # O m4a fragmentado do DASH pode ser lido em sequência, ao contrário do m4a progressivo
+    return formato.get('ext') in STREAMABLE_EXTS or (formato.get('container') or '').endswith('_dash')
+
+
+class RespostaEmPartes:
+    # Lê o stream em pedidos com Range de até `tamanho` bytes, como o yt-dlp faz com http_chunk_size: o YouTube limita
+    # a velocidade de pedidos grandes sem Range
+    def __init__(self, abrir, tamanho, total=None):
+        # abrir(headers) devolve a resposta do pedido com os headers extras
+        self.abrir = abrir
+        self.tamanho = tamanho
+        self.total = total
+        self.posicao = 0
+        self._resposta = None
+        self._restante = 0
+        self._fim = False
+
+    def iniciar(self):
+        # Abre a primeira parte; o tamanho total vem do Content-Range
+        if self._resposta is None and not self._fim:
+            self._proxima()
+        return self
+
+    def _proxima(self):
+        fim = self.posicao + self.tamanho - 1
+        if self.total:
+            fim = min(fim, self.total - 1)
+        try:
+            resposta = self.abrir({'Range': f'bytes={self.posicao}-{fim}'})
+        except HTTPError as e:
+            if e.status == 416 and self.posicao and self.total is None:
+                # Sem o tamanho total, o fim só aparece quando o pedido passa dele
+                self._fim = True
+                return
+            raise
+        if resposta.status != 206:
+            if self.posicao:
+                resposta.close()
+                raise AudioStreamError(f"servidor respondeu {resposta.status} a um pedido com Range")
+            # Servidor sem suporte a Range: o arquivo inteiro vem nesta resposta
+            self.total = int(resposta.headers.get('Content-Length') or 0) or self.total
+            self._restante = float('inf')
+        else:
+            match = re.search(r'/(\d+)', resposta.headers.get('Content-Range') or '')
+            if match:
+                self.total = int(match.group(1))
+            self._restante = fim - self.posicao + 1
+        self._resposta = resposta
+
+    def read(self, n=-1):
+        while not self._fim:
+            if self._resposta is None:
+                if self.total is not None and self.posicao >= self.total:
+                    self._fim = True
+                    break
+                self._proxima()
+                continue
+            limite = self._restante if n is None or n < 0 else min(n, self._restante)
+            bloco = self._resposta.read(None if limite == float('inf') else limite)
+            if bloco:
+                self.posicao += len(bloco)
+                self._restante -= len(bloco)
+                if not self._restante:
+                    self._fechar_parte()
+                return bloco
+            # Parte terminou antes do previsto: o servidor fechou a conexão; quem chamou compara com o total
+            self._fechar_parte()
+            self._fim = True
+        return b''
+
+    def _fechar_parte(self):
+        if self._resposta is not None:
+            self._resposta.close()
+            self._resposta = None
+
+    def close(self):
+        self._fechar_parte()
+        self._fim = True
+
+
+def comando_ffmpeg(ffmpeg, destino, bitrate):
+    return [ffmpeg, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y', '-i', 'pipe:0',
+            '-vn', '-c:a', 'libmp3lame', '-b:a', f'{bitrate}k', '-f', 'mp3', destino]
+
+
+def transmitir_audio(resposta, ffmpeg, destino, bitrate, progresso=None, esperado=None):
+    # Os bytes baixados entram direto no codificador: só o mp3 é gravado em disco
+    processo = subprocess.Popen(comando_ffmpeg(ffmpeg, destino, bitrate), stdin=subprocess.PIPE,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+    saida_de_erro = []
+    # Esvazia o stderr em paralelo para o FFmpeg nunca travar com o pipe cheio
+    leitor = Thread(target=lambda: saida_de_erro.append(processo.stderr.read()), daemon=True)
+    leitor.start()
+
+    baixados = 0
+    try:
+        try:
+            while True:
+                bloco = resposta.read(CHUNK_SIZE)
+                if not bloco:
+                    break
+                processo.stdin.write(bloco)
+                baixados += len(bloco)
+                if progresso:
+                    progresso(baixados)
+            if esperado and baixados < esperado:
+                # Conexão encerrada antes do fim: o mp3 sairia truncado e iria para o histórico como concluído
+                raise ContentTooShortError(baixados, esperado)
+            processo.stdin.close()
+        except BrokenPipeError:
+            # O FFmpeg encerrou antes do fim do stream; o motivo está no stderr
+            pass
+        codigo = processo.wait()
+    except BaseException:
+        processo.kill()
+        processo.wait()
+        raise
+    finally:
+        resposta.close()
+
+    leitor.join()
+    if codigo != 0:
+        mensagem = b"".join(saida_de_erro).decode("utf-8", "replace").strip().splitlines()
+        raise AudioStreamError(f"FFmpeg terminou com código {codigo}: {mensagem[-1] if mensagem else 'sem detalhes'}")
+    logging.debug(f"Áudio transmitido para o FFmpeg: {baixados} bytes, {destino}")
+    return baixados
@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import logging
+from datetime import datetime
+from threading import Condition, Lock
+from urllib.parse import urlparse
+
+from yt_dlp.networking import Response
+
+profiles_file = os.path.join(os.path.expanduser("~"), "YouLoader_data", "perfis_banda.txt")
+
+# Perfis de horário são reavaliados no máximo a cada intervalo (segundos)
+PROFILE_CHECK_INTERVAL = 30
+# Depois disso a conexão segue mesmo sem vaga no host, para uma resposta esquecida aberta não travar a fila
+HOST_SLOT_TIMEOUT = 120
+# Rajada máxima do balde, em segundos de banda
+BURST_SECONDS = 1.0
+MIN_BURST = 64 * 1024
+
+
+class TokenBucket:
+    def __init__(self, rate=0):
+        self._cond = Condition()
+        self.rate = 0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._cond:
+            self._refill()
+            self.rate = max(0, int(rate or 0))
+            self._tokens = min(self._tokens, self._burst())
+            # Threads esperando recalculam a espera com a nova taxa
+            self._cond.notify_all()
+
+    def _burst(self):
+        return max(self.rate * BURST_SECONDS, MIN_BURST)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self._tokens + (now - self._updated) * self.rate, self._burst())
+        self._updated = now
+
+    def consume(self, count):
+        with self._cond:
+            if not self.rate:
+                return
+            self._refill()
+            # O consumo é debitado depois da leitura: quem deixa o saldo negativo espera ele voltar a zero
+            self._tokens -= count
+            while self.rate and self._tokens < 0:
+                self._cond.wait(-self._tokens / self.rate)
+                self._refill()
+
+
+class BandwidthProfile:
+    def __init__(self, start, end, rate, max_per_host=None):
+        self.start = start
+        self.end = end
+        self.rate = rate
+        self.max_per_host = max_per_host
+
+    def active(self, now):
+        current = now.hour * 60 + now.minute
+        if self.start <= self.end:
+            return self.start <= current < self.end
+        # Perfis que atravessam a meia-noite, ex.: 22:00-06:00
+        return current >= self.start or current < self.end
+
+    def __str__(self):
+        limite = f"{self.rate // 1024} KB/s" if self.rate else "sem limite"
+        texto = f"{self.start // 60:02d}:{self.start % 60:02d}-{self.end // 60:02d}:{self.end % 60:02d} {limite}"
+        if self.max_per_host:
+            texto += f", {self.max_per_host} conexões por host"
+        return texto
+
+
+def interpretar_perfil(texto):
+    # Formato: HH:MM-HH:MM=KB/s[/conexões por host], ex.: 08:00-18:00=512/4
+    match = re.fullmatch(r'\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(\d+)\s*(?:/\s*(\d+))?\s*', texto)
+    if not match:
+        raise ValueError(f"perfil de banda inválido: {texto!r} (use HH:MM-HH:MM=KB/s[/conexões])")
+    h1, m1, h2, m2, kbps, per_host = match.groups()
+    if int(h1) > 23 or int(h2) > 24 or int(m1) > 59 or int(m2) > 59:
+        raise ValueError(f"horário inválido no perfil de banda: {texto!r}")
+    return BandwidthProfile(int(h1) * 60 + int(m1), int(h2) * 60 + int(m2), int(kbps) * 1024,
+                            int(per_host) if per_host else None)
+
+
+def carregar_perfis(path=profiles_file):
+    perfis = []
+    if not os.path.exists(path):
+        return perfis
+    with open(path, "r", encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.split("#", 1)[0].strip()
+            if not linha:
+                continue
+            try:
+                perfis.append(interpretar_perfil(linha))
+            except ValueError as e:
+                logging.warning(f"Ignorando linha de {path}: {e}")
+    return perfis
+
+
+class BandwidthScheduler:
+    def __init__(self, rate=0, max_per_host=0, profiles=()):
+        self.bucket = TokenBucket()
+        self.profiles = list(profiles)
+        self._base_rate = rate
+        self._base_per_host = max_per_host
+        self._max_per_host = max_per_host
+        self._active_profile = None
+        self._last_check = 0
+        self._lock = Lock()
+        self._hosts = {}
+        self._host_cond = Condition(self._lock)
+        self._apply_limits()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._base_rate = rate
+        self._apply_limits()
+
+    def set_max_per_host(self, count):
+        with self._lock:
+            self._base_per_host = count
+        self._apply_limits()
+
+    def _apply_limits(self):
+        now = datetime.now()
+        with self._lock:
+            profile = next((p for p in self.profiles if p.active(now)), None)
+            if profile is not self._active_profile:
+                logging.info(f"Perfil de banda ativo: {profile or 'padrão'}")
+                self._active_profile = profile
+            rate = profile.rate if profile else self._base_rate
+            per_host = self._base_per_host
+            if profile and profile.max_per_host is not None:
+                per_host = profile.max_per_host
+            self._max_per_host = per_host
+            self._last_check = time.monotonic()
+            self._host_cond.notify_all()
+        if rate != self.bucket.rate:
+            logging.info(f"Limite de banda: {f'{rate // 1024} KB/s' if rate else 'sem limite'}")
+        self.bucket.set_rate(rate)
+
+    def _check_profiles(self):
+        if self.profiles and time.monotonic() - self._last_check >= PROFILE_CHECK_INTERVAL:
+            self._apply_limits()
+
+    def consume(self, count):
+        self._check_profiles()
+        self.bucket.consume(count)
+
+    def acquire_host(self, host):
+        self._check_profiles()
+        deadline = time.monotonic() + HOST_SLOT_TIMEOUT
+        with self._host_cond:
+            while self._max_per_host and self._hosts.get(host, 0) >= self._max_per_host:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.warning(f"Tempo esgotado aguardando conexão livre para {host}, seguindo sem vaga")
+                    return False
+                self._host_cond.wait(min(remaining, PROFILE_CHECK_INTERVAL))
+            self._hosts[host] = self._hosts.get(host, 0) + 1
+            return True
+
+    def release_host(self, host):
+        with self._host_cond:
+            count = self._hosts.get(host, 0) - 1
+            if count > 0:
+                self._hosts[host] = count
+            else:
+                self._hosts.pop(host, None)
+            self._host_cond.notify_all()
+
+    def open(self, abrir, req):
+        url = req if isinstance(req, str) else req.url
+        host = urlparse(url).hostname or ""
+        slot = self.acquire_host(host)
+        try:
+            response = abrir(req)
+        except Exception:
+            if slot:
+                self.release_host(host)
+            raise
+        return ThrottledResponse(response, self, host if slot else None)
+
+
+class ThrottledResponse(Response):
+    def __init__(self, response, scheduler, host):
+        super().__init__(response, response.url, response.headers, response.status, response.reason,
+                         response.extensions)
+        self._scheduler = scheduler
+        self._host = host
+        self._host_lock = Lock()
+
+    def read(self, amt=None):
+        # A resposta original já converte as exceções para os tipos do yt-dlp
+        data = self.fp.read(amt)
+        self._scheduler.consume(len(data))
+        if not data or amt is None:
+            self._release()
+        return data
+
+    def _release(self):
+        with self._host_lock:
+            host, self._host = self._host, None
+        if host is not None:
+            self._scheduler.release_host(host)
+
+    def close(self):
+        self._release()
+        return super().close()
@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.medicao import mediana
+
+
+def medir_inicio(ambiente):
+    # Cada medição é um processo novo: a importação do PySide6 e do yt-dlp faz parte do que é medido
+    comando = [sys.executable, os.path.join(RAIZ, "main.py"), "--profile-startup"]
+    processo = subprocess.run(comando, cwd=RAIZ, env=ambiente, stdout=subprocess.PIPE, text=True, encoding="utf-8")
+    linhas = processo.stdout.strip().splitlines()
+    if processo.returncode != 0 or not linhas:
+        return None
+    return json.loads(linhas[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo até a janela aparecer e até o mecanismo de download "
+                                                 "ficar pronto, usando o --profile-startup do main.py.")
+    parser.add_argument("--execucoes", type=int, default=5, help="inicializações medidas")
+    parser.add_argument("--orcamento-ms", type=float, default=1000,
+                        help="tempo máximo aceito até a primeira pintura da janela (mediana), em milissegundos")
+    args = parser.parse_args(argv)
+
+    ambiente = dict(os.environ)
+    # Sem janela de verdade: o Qt desenha em memória
+    ambiente.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # O relatório tem acentos; no Windows a saída redirecionada usaria a página de código local
+    ambiente["PYTHONIOENCODING"] = "utf-8"
+
+    resultados = []
+    for _ in range(args.execucoes):
+        resultado = medir_inicio(ambiente)
+        if resultado is None:
+            print("A inicialização falhou; veja o log do YouLoader")
+            return 1
+        resultados.append(resultado)
+
+    pintura = [r["marcos"]["primeira pintura"] for r in resultados]
+    pronto = [r["marcos"]["mecanismo de download pronto"] for r in resultados]
+    print(f"Primeira pintura: mediana {mediana(pintura):.0f} ms, mínimo {min(pintura):.0f} ms, "
+          f"máximo {max(pintura):.0f} ms em {len(resultados)} execuções")
+    print(f"Mecanismo de download pronto: mediana {mediana(pronto):.0f} ms")
+
+    print("Fases (mediana):")
+    nomes = [fase["fase"] for fase in resultados[0]["fases"]]
+    for nome in nomes:
+        duracoes = [fase["duracao"] for r in resultados for fase in r["fases"] if fase["fase"] == nome]
+        print(f"  {nome}: {mediana(duracoes):.0f} ms")
+
+    if mediana(pintura) > args.orcamento_ms:
+        print(f"Acima do orçamento de {args.orcamento_ms:.0f} ms até a primeira pintura")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import os
+import sys
+import glob
+import json
+import time
+import uuid
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from threading import Lock, Event
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A pasta benchmarks fica no sys.path para o yt-dlp encontrar o extrator em yt_dlp_plugins/extractor
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
+
+from benchmarks.servidor_range import ServidorRange
+from benchmarks.medicao import pico_de_memoria, percentil, mediana
+
+QUALIDADES = ["Alta", "Média", "Baixa"]
+PRESETS = [f"{formato}-{qualidade}" for formato in ("mp4", "mp3") for qualidade in QUALIDADES]
+# Fases que não fazem parte do pós-processamento propriamente dito
+FASES_FORA_DO_PROCESSAMENTO = {"queue_wait", "extract", "ffmpeg_wait", "postprocess_wait"}
+# Fora do repositório, junto dos dados do aplicativo: a comparação com a execução anterior não depende do checkout
+pasta_resultados = os.path.join(os.path.expanduser("~"), "YouLoader_data", "benchmarks")
+
+# Alturas dos streams de vídeo sintéticos e taxas dos streams de áudio
+ALTURAS = (1080, 480, 144)
+TAXAS_AUDIO = (128, 48)
+
+
+def executar_ffmpeg(ffmpeg, *args):
+    subprocess.run([ffmpeg, "-y", "-v", "error", *args], check=True,
+                   creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+
+
+def gerar_midia(pasta, duracao, ffmpeg=None, tamanho_mb=8):
+    # Com FFmpeg: streams separados de vídeo e áudio de verdade, para medir mesclagem e conversão.
+    # Sem FFmpeg: só arquivos progressivos com bytes aleatórios, e os presets caem no download de arquivo único.
+    arquivos = {}
+    formats = []
+    if ffmpeg:
+        for altura in ALTURAS:
+            nome = f"video_{altura}.mp4"
+            executar_ffmpeg(ffmpeg, "-f", "lavfi", "-i", f"testsrc2=size={altura * 16 // 9 // 2 * 2}x{altura}:"
+                            f"rate=25:duration={duracao}", "-c:v", "mpeg4", "-q:v", "4", "-an",
+                            os.path.join(pasta, nome))
+            formats.append({"format_id": f"v{altura}", "ext": "mp4", "height": altura, "vcodec": "mp4v.20.9",
+                            "acodec": "none", "_arquivo": nome})
+        for taxa in TAXAS_AUDIO:
+            nome = f"audio_{taxa}.m4a"
+            executar_ffmpeg(ffmpeg, "-f", "lavfi", "-i", f"sine=frequency=440:duration={duracao}",
+                            "-c:a", "aac", "-b:a", f"{taxa}k", "-vn", os.path.join(pasta, nome))
+            formats.append({"format_id": f"a{taxa}", "ext": "m4a", "abr": taxa, "vcodec": "none",
+                            "acodec": "mp4a.40.2", "_arquivo": nome})
+    else:
+        for indice, altura in enumerate(ALTURAS):
+            nome = f"progressivo_{altura}.mp4"
+            with open(os.path.join(pasta, nome), "wb") as f:
+                f.write(os.urandom(tamanho_mb * 1024 * 1024 // (4 ** indice)))
+            formats.append({"format_id": f"p{altura}", "ext": "mp4", "height": altura, "vcodec": "avc1.4d401e",
+                            "acodec": "mp4a.40.2", "_arquivo": nome})
+
+    for fmt in formats:
+        caminho = os.path.join(pasta, fmt["_arquivo"])
+        with open(caminho, "rb") as f:
+            arquivos["/media/" + fmt["_arquivo"]] = f.read()
+        fmt["filesize"] = os.path.getsize(caminho)
+    return arquivos, formats
+
+
+def publicar_videos(servidor, formats, prefixo, quantidade, duracao):
+    publicos = [{**{k: v for k, v in fmt.items() if not k.startswith("_")},
+                 "url": f"{servidor.url_base}/media/{fmt['_arquivo']}"} for fmt in formats]
+    for n in range(quantidade):
+        video_id = f"{prefixo}-{n}"
+        info = {"id": video_id, "title": video_id, "duration": duracao, "formats": publicos}
+        servidor.adicionar(f"/bench/{video_id}/info.json", json.dumps(info).encode("utf-8"))
+
+
+def executar_preset(args):
+    # Roda em um processo separado para o pico de memória ser só deste preset
+    from jobs import DownloadJob, DownloadListener
+    from engine import DownloadQueue, MetadataCache
+    from ffmpeg_utils import configurar_ffmpeg
+
+    class ColetorBench(DownloadListener):
+        def __init__(self, total):
+            self.total = total
+            self.inicio = {}
+            self.ttfb = {}
+            self.jobs = []
+            self.erros = []
+            self._lock = Lock()
+            self._fim = Event()
+
+        def job_started(self, job):
+            self.inicio[job.id] = time.monotonic()
+
+        def job_progress(self, job):
+            if job.id not in self.ttfb and job.downloaded_bytes > 0:
+                self.ttfb[job.id] = time.monotonic() - self.inicio[job.id]
+
+        def job_finished(self, job):
+            self._encerrar(job, None)
+
+        def job_failed(self, job, error):
+            self._encerrar(job, error)
+
+        def _encerrar(self, job, error):
+            with self._lock:
+                self.jobs.append(job)
+                if error:
+                    self.erros.append(error)
+                if len(self.jobs) >= self.total:
+                    self._fim.set()
+
+        def esperar(self):
+            self._fim.wait()
+
+    configurar_ffmpeg()
+    formato, qualidade = args.executar_preset.split("-", 1)
+    coletor = ColetorBench(args.jobs)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        download_queue = DownloadQueue(coletor, workers=args.workers)
+        # Cache de metadados isolado: cada execução deve medir a extração de verdade
+        download_queue.metadata_cache = MetadataCache(os.path.join(pasta, "cache"))
+        inicio = time.monotonic()
+        for n in range(args.jobs):
+            download_queue.submit(DownloadJob(f"{args.url_base}/bench/{args.prefixo}-{n}", qualidade, formato,
+                                              os.path.join(pasta, "saida")))
+        coletor.esperar()
+        duracao = time.monotonic() - inicio
+
+    processamento = [sum(segundos for fase, segundos in job.phases.items()
+                         if fase not in FASES_FORA_DO_PROCESSAMENTO and not fase.startswith("download"))
+                     for job in coletor.jobs if not job.error]
+    ttfb = sorted(coletor.ttfb.values())
+    resultado = {
+        "preset": args.executar_preset,
+        "jobs": args.jobs,
+        "ok": args.jobs - len(coletor.erros),
+        "erros": len(coletor.erros),
+        "primeiro_erro": coletor.erros[0] if coletor.erros else None,
+        "duracao": round(duracao, 3),
+        "jobs_por_minuto": round(args.jobs / duracao * 60, 2),
+        "ttfb_mediana": mediana(ttfb),
+        "ttfb_p95": percentil(ttfb, 95),
+        "processamento_mediana": mediana(processamento),
+        "processamento_total": round(sum(processamento), 3),
+        "bytes": sum(job.downloaded_bytes for job in coletor.jobs),
+        "pico_memoria": pico_de_memoria(),
+    }
+    print(json.dumps(resultado))
+    return 0
+
+
+def ultimo_resultado(pasta):
+    arquivos = sorted(glob.glob(os.path.join(pasta, "jobs_*.json")))
+    return arquivos[-1] if arquivos else None
+
+
+def formatar(valor, unidade=""):
+    if valor is None:
+        return "-"
+    if unidade == "MiB":
+        return f"{valor / 1024 / 1024:.1f}"
+    return f"{valor:.3f}" if isinstance(valor, float) else str(valor)
+
+
+def comparar(atual, anterior_path):
+    with open(anterior_path, "r", encoding="utf-8") as f:
+        anterior = json.load(f)
+    if anterior.get("parametros") != atual["parametros"]:
+        print("Aviso: a execução anterior usou parâmetros diferentes; a comparação é apenas indicativa")
+    anteriores = {r["preset"]: r for r in anterior.get("resultados", [])}
+
+    print(f"\nComparação com {os.path.basename(anterior_path)} (variação percentual):")
+    # Para jobs por minuto, maior é melhor; para as demais métricas, menor é melhor
+    metricas = [("jobs_por_minuto", 1), ("ttfb_mediana", -1), ("processamento_mediana", -1), ("pico_memoria", -1)]
+    for resultado in atual["resultados"]:
+        base = anteriores.get(resultado["preset"])
+        if not base:
+            continue
+        partes = []
+        for chave, sentido in metricas:
+            if resultado.get(chave) and base.get(chave):
+                variacao = (resultado[chave] - base[chave]) / base[chave] * 100
+                marca = " (piora)" if variacao * sentido < -5 else ""
+                partes.append(f"{chave}={variacao:+.1f}%{marca}")
+        print(f"  {resultado['preset']:<10} " + " ".join(partes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede jobs completos (extração, download e pós-processamento) por "
+                                                 "preset de formato/qualidade contra um servidor local.")
+    parser.add_argument("--jobs", type=int, default=8, help="jobs por preset")
+    parser.add_argument("--workers", type=int, default=4, help="downloads simultâneos")
+    parser.add_argument("--presets", nargs="+", choices=PRESETS, default=PRESETS)
+    parser.add_argument("--taxa-kbps", type=int, default=4096, help="limite por conexão em KiB/s (0 = sem limite)")
+    parser.add_argument("--latencia", type=float, default=0.05, help="latência por requisição em segundos")
+    parser.add_argument("--sem-range", action="store_true", help="servidor sem suporte a Range")
+    parser.add_argument("--duracao", type=int, default=10, help="duração dos vídeos sintéticos em segundos")
+    parser.add_argument("--tamanho-mb", type=int, default=8,
+                        help="tamanho do maior arquivo quando o FFmpeg não está disponível")
+    parser.add_argument("--saida", default=pasta_resultados, help="pasta onde os resultados são salvos")
+    parser.add_argument("--comparar", help="resultado anterior para comparar (padrão: o mais recente da pasta)")
+    parser.add_argument("--executar-preset", help=argparse.SUPPRESS)
+    parser.add_argument("--url-base", help=argparse.SUPPRESS)
+    parser.add_argument("--prefixo", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # Só erros do aplicativo aparecem; a saída padrão do processo filho é o resultado em JSON
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.executar_preset:
+        return executar_preset(args)
+
+    from ffmpeg_utils import configurar_ffmpeg, detectar_ffmpeg
+    configurar_ffmpeg()
+    ffmpeg = detectar_ffmpeg()
+    presets = args.presets
+    if not ffmpeg:
+        print("FFmpeg não encontrado: usando arquivos progressivos sintéticos, sem mesclagem, e ignorando os "
+              "presets mp3")
+        presets = [preset for preset in presets if not preset.startswith("mp3")]
+
+    # O servidor fica neste processo; cada preset roda em outro, para não disputarem memória nem o GIL
+    servidor = ServidorRange(taxa_por_conexao=args.taxa_kbps * 1024 or None, latencia=args.latencia,
+                             aceita_range=not args.sem_range).iniciar()
+    resultados = []
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivos, formats = gerar_midia(pasta, args.duracao, ffmpeg and ffmpeg["path"], args.tamanho_mb)
+            for caminho, dados in arquivos.items():
+                servidor.adicionar(caminho, dados)
+
+        print(f"{'preset':<10} {'ok':>4} {'jobs/min':>9} {'ttfb':>7} {'ttfb p95':>9} {'proc.':>7} {'MiB':>8} "
+              f"{'pico MiB':>9}")
+        for preset in presets:
+            prefixo = uuid.uuid4().hex[:12]
+            publicar_videos(servidor, formats, prefixo, args.jobs, args.duracao)
+            comando = [sys.executable, "-m", "benchmarks.bench_jobs", "--executar-preset", preset,
+                       "--url-base", servidor.url_base, "--prefixo", prefixo,
+                       "--jobs", str(args.jobs), "--workers", str(args.workers)]
+            processo = subprocess.run(comando, cwd=RAIZ, stdout=subprocess.PIPE, text=True)
+            if processo.returncode != 0 or not processo.stdout.strip():
+                print(f"{preset:<10} falhou (código {processo.returncode})")
+                continue
+            resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+            resultados.append(resultado)
+            print(f"{preset:<10} {resultado['ok']:>4} {resultado['jobs_por_minuto']:>9.1f} "
+                  f"{formatar(resultado['ttfb_mediana']):>7} {formatar(resultado['ttfb_p95']):>9} "
+                  f"{formatar(resultado['processamento_mediana']):>7} {formatar(resultado['bytes'], 'MiB'):>8} "
+                  f"{formatar(resultado['pico_memoria'], 'MiB'):>9}")
+            if resultado["primeiro_erro"]:
+                print(f"  primeiro erro: {resultado['primeiro_erro']}")
+    finally:
+        servidor.parar()
+
+    import yt_dlp
+    atual = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {"python": platform.python_version(), "plataforma": platform.platform(),
+                     "cpus": os.cpu_count(), "yt_dlp": yt_dlp.version.__version__,
+                     "ffmpeg": ffmpeg["version"] if ffmpeg else None},
+        "parametros": {k: v for k, v in vars(args).items()
+                       if k not in ("saida", "comparar", "executar_preset", "url_base", "prefixo")},
+        "resultados": resultados,
+    }
+
+    anterior = args.comparar or ultimo_resultado(args.saida)
+    os.makedirs(args.saida, exist_ok=True)
+    destino = os.path.join(args.saida, f"jobs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump(atual, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados salvos em {destino}")
+
+    if anterior:
+        comparar(atual, anterior)
+    return 0 if resultados and all(r["erros"] == 0 for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
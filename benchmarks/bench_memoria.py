@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+from threading import Event
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A pasta benchmarks fica no sys.path para o yt-dlp encontrar os extratores em yt_dlp_plugins/extractor
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
+
+from benchmarks.servidor_range import ServidorRange
+from benchmarks.medicao import memoria_atual
+
+# Início da playlist descartado da análise: caches, imports e threads ainda estão sendo criados
+AQUECIMENTO = 0.2
+
+
+def medir_jobs_na_fila(quantidade):
+    # Memória de jobs parados na fila, sem rede: o custo de cada registro
+    from jobs import DownloadJob
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    jobs = [DownloadJob(f"https://www.youtube.com/watch?v={n:011d}", "Alta", "mp4", "/tmp") for n in range(quantidade)]
+    total = tracemalloc.get_traced_memory()[0] - inicio
+    tracemalloc.stop()
+    del jobs
+    return total / quantidade
+
+
+def inclinacao(pontos):
+    # Mínimos quadrados: bytes de memória residente a mais por item concluído
+    n = len(pontos)
+    media_x = sum(x for x, _ in pontos) / n
+    media_y = sum(y for _, y in pontos) / n
+    variancia = sum((x - media_x) ** 2 for x, _ in pontos)
+    if not variancia:
+        return 0.0
+    return sum((x - media_x) * (y - media_y) for x, y in pontos) / variancia
+
+
+def executar_playlist(args):
+    # Roda em um processo separado para a memória medida ser só a da fila de downloads
+    from jobs import DownloadJob, DownloadListener
+    from engine import DownloadQueue, MetadataCache
+    from download_archive import DownloadArchive
+
+    class FimDaPlaylist(DownloadListener):
+        def __init__(self):
+            self.fim = Event()
+
+        def job_finished(self, job):
+            self.fim.set()
+
+        def job_failed(self, job, error):
+            self.fim.set()
+
+    listener = FimDaPlaylist()
+    amostras = []
+    with tempfile.TemporaryDirectory() as pasta:
+        download_queue = DownloadQueue(listener, workers=args.workers,
+                                       archive=DownloadArchive(os.path.join(pasta, "archive.sqlite3")))
+        download_queue.metadata_cache = MetadataCache(os.path.join(pasta, "cache"))
+        job = DownloadJob(f"{args.url_base}/bench-playlist/{args.prefixo}/{args.itens}", "Baixa", "mp4",
+                          os.path.join(pasta, "saida"))
+        inicio = time.monotonic()
+        download_queue.submit(job)
+        while not listener.fim.wait(args.intervalo):
+            batch = job.playlist
+            amostras.append((batch.done if batch else 0, memoria_atual()))
+        duracao = time.monotonic() - inicio
+        batch = job.playlist
+        amostras.append((batch.done if batch else 0, memoria_atual()))
+
+    print(json.dumps({
+        "itens": batch.done if batch else 0,
+        "erros": batch.failed if batch else None,
+        "duracao": round(duracao, 3),
+        "amostras": amostras,
+    }))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica se a memória fica estável ao baixar uma playlist "
+                                                 "com milhares de itens de um servidor local.")
+    parser.add_argument("--itens", type=int, default=10000, help="itens da playlist")
+    parser.add_argument("--workers", type=int, default=8, help="downloads simultâneos")
+    parser.add_argument("--tamanho-kb", type=int, default=4, help="tamanho de cada vídeo sintético")
+    parser.add_argument("--intervalo", type=float, default=0.5, help="intervalo entre amostras de memória")
+    parser.add_argument("--orcamento-kb", type=float, default=512,
+                        help="crescimento máximo aceito, em KiB a cada 1000 itens concluídos")
+    parser.add_argument("--executar-playlist", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url-base", help=argparse.SUPPRESS)
+    parser.add_argument("--prefixo", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.executar_playlist:
+        return executar_playlist(args)
+
+    por_job = medir_jobs_na_fila(args.itens)
+    print(f"Memória por job na fila: {por_job:.0f} bytes ({por_job * args.itens / 1024 / 1024:.1f} MiB "
+          f"para {args.itens} jobs)")
+
+    servidor = ServidorRange().iniciar()
+    prefixo = uuid.uuid4().hex[:12]
+    try:
+        servidor.adicionar("/media/video.mp4", os.urandom(args.tamanho_kb * 1024))
+        formats = [{"format_id": "p144", "ext": "mp4", "height": 144, "vcodec": "avc1.4d401e",
+                    "acodec": "mp4a.40.2", "filesize": args.tamanho_kb * 1024,
+                    "url": f"{servidor.url_base}/media/video.mp4"}]
+        for n in range(args.itens):
+            video_id = f"{prefixo}-{n}"
+            info = {"id": video_id, "title": video_id, "formats": formats}
+            servidor.adicionar(f"/bench/{video_id}/info.json", json.dumps(info).encode("utf-8"))
+
+        comando = [sys.executable, "-m", "benchmarks.bench_memoria", "--executar-playlist",
+                   "--url-base", servidor.url_base, "--prefixo", prefixo, "--itens", str(args.itens),
+                   "--workers", str(args.workers), "--intervalo", str(args.intervalo)]
+        processo = subprocess.run(comando, cwd=RAIZ, stdout=subprocess.PIPE, text=True)
+    finally:
+        servidor.parar()
+
+    if processo.returncode != 0 or not processo.stdout.strip():
+        print(f"A medição falhou (código {processo.returncode})")
+        return 1
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    amostras = [(itens, rss) for itens, rss in resultado["amostras"] if rss is not None]
+    analisadas = [(itens, rss) for itens, rss in amostras if itens >= resultado["itens"] * AQUECIMENTO]
+    if len(analisadas) < 3:
+        print("Poucas amostras para avaliar o crescimento; aumente --itens ou diminua --intervalo")
+        return 1
+
+    crescimento = inclinacao(analisadas) * 1000 / 1024
+    print(f"Playlist: {resultado['itens']} itens ({resultado['erros']} com erro) em {resultado['duracao']:.1f}s, "
+          f"{resultado['itens'] / resultado['duracao']:.1f} itens/s")
+    print(f"Memória residente: {analisadas[0][1] / 1024 / 1024:.1f} MiB após o aquecimento, "
+          f"{analisadas[-1][1] / 1024 / 1024:.1f} MiB no fim, pico {max(rss for _, rss in amostras) / 1024 / 1024:.1f} MiB")
+    print(f"Crescimento: {crescimento:.1f} KiB a cada 1000 itens (orçamento: {args.orcamento_kb:.0f} KiB)")
+
+    if crescimento > args.orcamento_kb:
+        print("Acima do orçamento de memória")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
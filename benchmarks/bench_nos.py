@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import sqlite3
+import tempfile
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.servidor_range import ServidorRange
+from shared_store import SharedJobStore
+
+
+def publicar_videos(servidor, prefixo, quantidade, tamanho):
+    servidor.adicionar("/media/video.mp4", os.urandom(tamanho))
+    formats = [{"format_id": "p144", "ext": "mp4", "height": 144, "vcodec": "avc1.4d401e", "acodec": "mp4a.40.2",
+                "filesize": tamanho, "url": f"{servidor.url_base}/media/video.mp4"}]
+    for n in range(quantidade):
+        video_id = f"{prefixo}-{n}"
+        info = {"id": video_id, "title": video_id, "formats": formats}
+        servidor.adicionar(f"/bench/{video_id}/info.json", json.dumps(info).encode("utf-8"))
+
+
+def iniciar_no(args, backlog, pasta, indice, ambiente):
+    comando = [sys.executable, os.path.join(RAIZ, "worker.py"), "--store", backlog, "run",
+               "--node", f"no-{indice}", "-w", str(args.workers), "--lease", str(args.lease),
+               "--poll-interval", "0.2", "--exit-when-idle", "--no-archive",
+               "--metrics-dir", os.path.join(pasta, f"metricas-{indice}"), "--log-level", "ERROR"]
+    return subprocess.Popen(comando, cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def medir(args, servidor, prefixo, nos, ambiente, matar_um=False):
+    with tempfile.TemporaryDirectory() as pasta:
+        backlog = os.path.join(pasta, "backlog.sqlite3")
+        store = SharedJobStore(backlog)
+        # Uma playlist só: o primeiro nó a reservá-la lista os itens e os devolve ao backlog para todos
+        store.enqueue([{"url": f"{servidor.url_base}/bench-playlist/{prefixo}/{args.videos}", "quality": "Baixa",
+                        "format_type": "mp4", "folder": os.path.join(pasta, "saida")}])
+        inicio = time.monotonic()
+        processos = [iniciar_no(args, backlog, pasta, indice, ambiente) for indice in range(nos)]
+        morto = None
+        try:
+            while any(processo.poll() is None for processo in processos):
+                if matar_um and morto is None and store.stats()["states"]["finished"] >= args.videos // 3:
+                    # Sem aviso nenhum, como um computador desligado: os jobs do nó só voltam quando a reserva expira
+                    processos[0].kill()
+                    morto = time.monotonic() - inicio
+                time.sleep(0.1)
+        finally:
+            for processo in processos:
+                if processo.poll() is None:
+                    processo.kill()
+        stats = store.stats()
+        store.close()
+        # Da primeira reserva ao último job concluído: a inicialização de cada processo (imports do yt-dlp) fica de fora
+        conn = sqlite3.connect(backlog)
+        primeiro, ultimo = conn.execute("SELECT MIN(started_at), MAX(finished_at) FROM jobs").fetchone()
+        conn.close()
+        duracao = (ultimo - primeiro) if primeiro and ultimo else time.monotonic() - inicio
+    estados = stats["states"]
+    return {
+        "nos": nos,
+        "duracao": duracao,
+        # A playlist também conta como job concluído
+        "videos": estados["finished"] - 1,
+        "pendentes": estados["queued"] + estados["running"],
+        "erros": estados["error"],
+        "por_no": {no["node"]: no["finished"] for no in stats["nodes"]},
+        "morto": morto,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede a vazão de vários nós do worker.py baixando o mesmo backlog "
+                                                 "compartilhado de um servidor local.")
+    parser.add_argument("--videos", type=int, default=60, help="vídeos da playlist enfileirada")
+    parser.add_argument("--nos", type=int, nargs="+", default=[1, 2, 4], help="quantidades de nós comparadas")
+    parser.add_argument("--workers", type=int, default=2, help="downloads simultâneos por nó")
+    parser.add_argument("--tamanho-kb", type=int, default=256, help="tamanho de cada vídeo sintético")
+    parser.add_argument("--taxa-kbps", type=int, default=512, help="limite de cada conexão no servidor, em KB/s")
+    parser.add_argument("--lease", type=float, default=3.0, help="prazo de reserva dos jobs, em segundos")
+    parser.add_argument("--matar-um", action="store_true",
+                        help="encerra um nó no meio da medição e verifica se os outros terminam os jobs dele")
+    args = parser.parse_args(argv)
+
+    ambiente = dict(os.environ)
+    # O worker.py precisa da pasta benchmarks no caminho para o yt-dlp encontrar o extrator de teste
+    ambiente["PYTHONPATH"] = os.pathsep.join(filter(None, [RAIZ, os.path.join(RAIZ, "benchmarks"),
+                                                           ambiente.get("PYTHONPATH")]))
+
+    servidor = ServidorRange(taxa_por_conexao=args.taxa_kbps * 1024).iniciar()
+    prefixo = uuid.uuid4().hex[:12]
+    falhou = False
+    base = None
+    try:
+        publicar_videos(servidor, prefixo, args.videos, args.tamanho_kb * 1024)
+        for nos in args.nos:
+            resultado = medir(args, servidor, prefixo, nos, ambiente, args.matar_um and nos > 1)
+            vazao = resultado["videos"] * args.tamanho_kb / 1024 / resultado["duracao"]
+            base = base or vazao
+            print(f"{nos} nós: {resultado['videos']} vídeos em {resultado['duracao']:.1f}s, {vazao:.2f} MiB/s "
+                  f"({vazao / base:.2f}x), por nó: {resultado['por_no']}")
+            if resultado["morto"] is not None:
+                print(f"  no-0 encerrado aos {resultado['morto']:.1f}s; os jobs dele voltaram à fila após "
+                      f"{args.lease:.0f}s sem renovação")
+            if resultado["pendentes"] or resultado["erros"] or resultado["videos"] != args.videos:
+                print(f"  {resultado['pendentes']} jobs pendentes e {resultado['erros']} com erro")
+                falhou = True
+    finally:
+        servidor.parar()
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import os
+import re
+import sys
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+from threading import Thread, Event, Lock
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A pasta benchmarks fica no sys.path para o yt-dlp encontrar o extrator em yt_dlp_plugins/extractor
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
+
+from benchmarks.servidor_range import ServidorRange
+from benchmarks.bench_nos import publicar_videos
+from output_writer import PUBLISH_SUFFIX
+
+
+class Observador(Thread):
+    # Faz o papel de quem consome a pasta de destino: tudo o que aparece lá deveria já estar completo
+    def __init__(self, pasta, tamanho, intervalo):
+        super().__init__(daemon=True)
+        self.pasta = pasta
+        self.tamanho = tamanho
+        self.intervalo = intervalo
+        # Arquivos com o nome final mas ainda incompletos, e arquivos de trabalho (.part, .ytdl, streams separados)
+        self.incompletos = set()
+        self.temporarios = set()
+        self.parar = Event()
+
+    def run(self):
+        while not self.parar.wait(self.intervalo):
+            try:
+                entradas = list(os.scandir(self.pasta))
+            except FileNotFoundError:
+                continue
+            for entrada in entradas:
+                if entrada.name.endswith(PUBLISH_SUFFIX):
+                    # A cópia em andamento tem outro nome até estar completa
+                    continue
+                if not re.fullmatch(r'[0-9a-f]+-\d+\.mp4', entrada.name):
+                    self.temporarios.add(entrada.name)
+                    continue
+                try:
+                    if entrada.stat().st_size != self.tamanho:
+                        self.incompletos.add(entrada.name)
+                except FileNotFoundError:
+                    pass
+
+
+def executar(args, servidor, prefixo, pasta_trabalho=None):
+    from jobs import DownloadJob, DownloadListener
+    from engine import DownloadQueue
+    from output_writer import OutputWriter
+
+    class Contador(DownloadListener):
+        def __init__(self, total):
+            self.restantes = total
+            self.erros = 0
+            self.lock = Lock()
+            self.fim = Event()
+
+        def job_finished(self, job):
+            self._encerrar()
+
+        def job_failed(self, job, error):
+            self.erros += 1
+            self._encerrar()
+
+        def _encerrar(self):
+            with self.lock:
+                self.restantes -= 1
+                if not self.restantes:
+                    self.fim.set()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        destino = os.path.join(args.destino or pasta, f"saida-{uuid.uuid4().hex[:8]}")
+        writer = OutputWriter(pasta_trabalho, args.max_transfers) if pasta_trabalho else None
+        contador = Contador(args.videos)
+        observador = Observador(destino, args.tamanho_kb * 1024, args.intervalo)
+        observador.start()
+        download_queue = DownloadQueue(contador, workers=args.workers, writer=writer)
+        inicio = time.monotonic()
+        for n in range(args.videos):
+            download_queue.submit(DownloadJob(f"{servidor.url_base}/bench/{prefixo}-{n}", "Baixa", "mp4", destino))
+        contador.fim.wait()
+        duracao = time.monotonic() - inicio
+        observador.parar.set()
+        observador.join()
+        if args.destino:
+            for nome in os.listdir(destino):
+                os.remove(os.path.join(destino, nome))
+            os.rmdir(destino)
+    return duracao, contador.erros, observador
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara baixar direto na pasta de destino com baixar em uma pasta "
+                                                 "de trabalho local e copiar o arquivo pronto, observando o que aparece "
+                                                 "no destino durante os downloads.")
+    parser.add_argument("--videos", type=int, default=16, help="vídeos baixados em cada modo")
+    parser.add_argument("--workers", type=int, default=4, help="downloads simultâneos")
+    parser.add_argument("--tamanho-kb", type=int, default=4096,
+                        help="tamanho de cada vídeo; a partir de 2048 o download é segmentado e pré-alocado")
+    parser.add_argument("--destino", help="pasta de destino, ex.: um compartilhamento de rede (padrão: temporária)")
+    parser.add_argument("--pasta-trabalho", help="pasta de trabalho local (padrão: temporária)")
+    parser.add_argument("--max-transfers", type=int, default=2, help="cópias simultâneas para o destino")
+    parser.add_argument("--intervalo", type=float, default=0.005, help="intervalo entre listagens do destino")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    servidor = ServidorRange().iniciar()
+    prefixo = uuid.uuid4().hex[:12]
+    falhou = False
+    try:
+        publicar_videos(servidor, prefixo, args.videos, args.tamanho_kb * 1024)
+        with tempfile.TemporaryDirectory() as temporaria:
+            modos = [("direto no destino", None), ("pasta de trabalho", args.pasta_trabalho or temporaria)]
+            for nome, pasta_trabalho in modos:
+                duracao, erros, observador = executar(args, servidor, prefixo, pasta_trabalho)
+                print(f"{nome}: {args.videos} vídeos em {duracao:.2f}s ({erros} com erro); no destino, "
+                      f"{len(observador.temporarios)} arquivos de trabalho"
+                      + (f" (ex.: {sorted(observador.temporarios)[0]})" if observador.temporarios else "")
+                      + f" e {len(observador.incompletos)} incompletos com o nome final")
+                if pasta_trabalho and (observador.temporarios or observador.incompletos or erros):
+                    falhou = True
+    finally:
+        servidor.parar()
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
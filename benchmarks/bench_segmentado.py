@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.servidor_range import ServidorRange
+from segmented import baixar_segmentado, descobrir_tamanho
+
+
+def abrir(url, headers):
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+
+
+def medir(url, segmentos, destino):
+    total = descobrir_tamanho(abrir, url)
+    inicio = time.monotonic()
+    usados = baixar_segmentado(abrir, url, destino, total, segmentos)
+    duracao = time.monotonic() - inicio
+    with open(destino, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return usados, duracao, total / duracao, digest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara o download segmentado com uma única conexão "
+                                                 "contra um servidor local com limite de taxa por conexão.")
+    parser.add_argument("--tamanho-mb", type=int, default=16, help="tamanho do arquivo sintético")
+    parser.add_argument("--taxa-kbps", type=int, default=2048, help="limite por conexão em KiB/s")
+    parser.add_argument("--latencia", type=float, default=0.05, help="latência por requisição em segundos")
+    parser.add_argument("--segmentos", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+
+    servidor = ServidorRange(taxa_por_conexao=args.taxa_kbps * 1024, latencia=args.latencia).iniciar()
+    try:
+        dados = os.urandom(args.tamanho_mb * 1024 * 1024)
+        esperado = hashlib.sha256(dados).hexdigest()
+        url = servidor.adicionar("/video.mp4", dados)
+
+        base = None
+        with tempfile.TemporaryDirectory() as pasta:
+            for segmentos in args.segmentos:
+                destino = os.path.join(pasta, f"video_{segmentos}.mp4")
+                usados, duracao, taxa, digest = medir(url, segmentos, destino)
+                base = base or duracao
+                status = "ok" if digest == esperado else "CORROMPIDO"
+                print(f"segmentos={segmentos:2d} conexões={usados:2d} tempo={duracao:6.2f}s "
+                      f"taxa={taxa / 1024 / 1024:6.2f} MiB/s ganho={base / duracao:5.2f}x {status}")
+                if digest != esperado:
+                    return 1
+    finally:
+        servidor.parar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+import random
+import argparse
+from threading import Thread, Event
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+# Sem janela de verdade: o Qt desenha em memória, o que basta para medir o custo da tabela
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QTimer, QElapsedTimer
+from PySide6.QtWidgets import QApplication, QTableView, QHeaderView, QAbstractItemView
+
+from benchmarks.medicao import percentil, mediana
+from jobs import DownloadJob
+from job_table import JobTableModel, ProgressDelegate
+
+# Intervalo do timer usado para medir atrasos no loop de eventos
+INTERVALO_SONDA_MS = 10
+
+
+def criar_job(n, state):
+    job = DownloadJob(f"https://www.youtube.com/watch?v={n:011d}", "Alta", "mp4", "/tmp")
+    job.title = f"Vídeo sintético {n}"
+    job.state = state
+    if state == DownloadJob.FINISHED:
+        job.percent = 100.0
+    return job
+
+
+def simular_downloads(ativos, parar, intervalo):
+    # Faz o papel dos workers: altera os jobs fora da thread da interface, sem avisar a tabela
+    while not parar.wait(intervalo):
+        for job in list(ativos):
+            job.percent = min(99.0, job.percent + random.uniform(0.1, 1.0))
+            job.speed = random.uniform(100_000, 5_000_000)
+            job.eta = random.uniform(1, 600)
+
+
+class ModeloMedido(JobTableModel):
+    def __init__(self):
+        super().__init__()
+        self.duracoes = []
+
+    def flush(self):
+        inicio = time.perf_counter()
+        super().flush()
+        self.duracoes.append(time.perf_counter() - inicio)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede se a tabela de jobs mantém a interface responsiva com "
+                                                 "muitos downloads ativos e um histórico grande.")
+    parser.add_argument("--historico", type=int, default=10000, help="linhas de jobs já encerrados")
+    parser.add_argument("--ativos", type=int, default=50, help="jobs baixando ao mesmo tempo")
+    parser.add_argument("--duracao", type=float, default=10, help="segundos de medição")
+    parser.add_argument("--conclusoes-por-segundo", type=float, default=5,
+                        help="jobs ativos que terminam e dão lugar a novos a cada segundo")
+    parser.add_argument("--orcamento-ms", type=float, default=50,
+                        help="atraso máximo aceito no loop de eventos (p99), em milissegundos")
+    args = parser.parse_args(argv)
+
+    app = QApplication(sys.argv)
+    model = ModeloMedido()
+    view = QTableView()
+    view.setModel(model)
+    view.setItemDelegateForColumn(JobTableModel.PROGRESS_COLUMN, ProgressDelegate(view))
+    view.setSelectionBehavior(QAbstractItemView.SelectRows)
+    view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    view.verticalHeader().setDefaultSectionSize(22)
+    view.resize(900, 600)
+    view.show()
+
+    contador = iter(range(10 ** 9))
+    inicio = time.perf_counter()
+    for _ in range(args.historico):
+        model.add_job(criar_job(next(contador), DownloadJob.FINISHED))
+    ativos = [criar_job(next(contador), DownloadJob.DOWNLOADING) for _ in range(args.ativos)]
+    for job in ativos:
+        model.add_job(job)
+    model.flush()
+    app.processEvents()
+    carga = time.perf_counter() - inicio
+    model.duracoes.clear()
+
+    # Mostra o fim da tabela, onde ficam os jobs ativos, como quem acompanha os downloads
+    view.scrollToBottom()
+
+    atrasos = []
+    relogio = QElapsedTimer()
+    relogio.start()
+    ultimo = [relogio.elapsed()]
+
+    def sonda():
+        agora = relogio.elapsed()
+        atrasos.append(max(0, agora - ultimo[0] - INTERVALO_SONDA_MS))
+        ultimo[0] = agora
+
+    concluidos = [0]
+
+    def concluir():
+        # Um job ativo termina e outro começa, como num lote em andamento
+        if not ativos:
+            return
+        job = ativos.pop(random.randrange(len(ativos)))
+        job.percent = 100.0
+        job.state = DownloadJob.FINISHED
+        novo = criar_job(next(contador), DownloadJob.DOWNLOADING)
+        ativos.append(novo)
+        model.add_job(novo)
+        concluidos[0] += 1
+
+    timer_sonda = QTimer()
+    timer_sonda.setInterval(INTERVALO_SONDA_MS)
+    timer_sonda.timeout.connect(sonda)
+    timer_sonda.start()
+    timer_conclusoes = QTimer()
+    timer_conclusoes.setInterval(int(1000 / args.conclusoes_por_segundo) if args.conclusoes_por_segundo > 0 else 0)
+    timer_conclusoes.timeout.connect(concluir)
+    if args.conclusoes_por_segundo > 0:
+        timer_conclusoes.start()
+
+    parar = Event()
+    Thread(target=simular_downloads, args=(ativos, parar, 0.05), daemon=True).start()
+    QTimer.singleShot(int(args.duracao * 1000), app.quit)
+    app.exec()
+    parar.set()
+
+    p99 = percentil(atrasos, 99) or 0
+    print(f"Histórico: {args.historico} linhas carregadas em {carga * 1000:.0f} ms | "
+          f"{model.rowCount()} linhas no fim, {concluidos[0]} jobs concluídos durante a medição")
+    print(f"Atualização da tabela: mediana {mediana(model.duracoes) * 1000:.2f} ms, "
+          f"p99 {percentil(model.duracoes, 99) * 1000:.2f} ms em {len(model.duracoes)} lotes")
+    print(f"Atraso do loop de eventos: mediana {mediana(atrasos):.1f} ms, p99 {p99:.1f} ms, "
+          f"máximo {max(atrasos)} ms (orçamento p99: {args.orcamento_ms:.0f} ms)")
+
+    if p99 > args.orcamento_ms:
+        print("Acima do orçamento de latência")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import os
+import sys
+import statistics
+
+
+def pico_de_memoria():
+    # Pico de memória residente do processo, em bytes
+    try:
+        import resource
+    except ImportError:
+        return _pico_de_memoria_windows()
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # No Linux o valor vem em KiB; no macOS, em bytes
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+def memoria_atual():
+    # Memória residente neste instante, em bytes; sem suporte no sistema, usa o pico
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    if sys.platform == "win32":
+        contadores = _contadores_windows()
+        return contadores.WorkingSetSize if contadores else None
+    return pico_de_memoria()
+
+
+def _pico_de_memoria_windows():
+    contadores = _contadores_windows()
+    return contadores.PeakWorkingSetSize if contadores else None
+
+
+def _contadores_windows():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    contadores = PROCESS_MEMORY_COUNTERS()
+    contadores.cb = ctypes.sizeof(contadores)
+    processo = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(processo, ctypes.byref(contadores), contadores.cb):
+        return None
+    return contadores
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+def mediana(valores):
+    return statistics.median(valores) if valores else None
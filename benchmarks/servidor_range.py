@@ -0,0 +1,105 @@
+import os
+import re
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+
+BLOCK_SIZE = 16 * 1024
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._responder(enviar_corpo=False)
+
+    def do_GET(self):
+        self._responder(enviar_corpo=True)
+
+    def _responder(self, enviar_corpo):
+        dados = self.server.arquivos.get(self.path)
+        if dados is None:
+            self.send_error(404)
+            return
+
+        if self.server.latencia:
+            time.sleep(self.server.latencia)
+
+        total = len(dados)
+        inicio, fim = 0, total - 1
+        match = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range') or '')
+        if match and self.server.aceita_range:
+            if match.group(1):
+                inicio = int(match.group(1))
+                fim = int(match.group(2)) if match.group(2) else total - 1
+            else:
+                inicio = total - int(match.group(2))
+            fim = min(fim, total - 1)
+            if inicio > fim:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{total}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{fim}/{total}")
+        else:
+            self.send_response(200)
+
+        self.send_header("Accept-Ranges", "bytes" if self.server.aceita_range else "none")
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(fim - inicio + 1))
+        self.end_headers()
+        if not enviar_corpo:
+            return
+
+        # Limite por conexão, como faz uma CDN que estrangula cada stream
+        taxa = self.server.taxa_por_conexao
+        comeco = time.monotonic()
+        enviados = 0
+        posicao = inicio
+        try:
+            while posicao <= fim:
+                bloco = dados[posicao:min(posicao + BLOCK_SIZE, fim + 1)]
+                self.wfile.write(bloco)
+                posicao += len(bloco)
+                enviados += len(bloco)
+                if taxa:
+                    atraso = enviados / taxa - (time.monotonic() - comeco)
+                    if atraso > 0:
+                        time.sleep(atraso)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class ServidorRange(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, taxa_por_conexao=None, latencia=0.0, aceita_range=True, porta=0):
+        super().__init__(("127.0.0.1", porta), RangeRequestHandler)
+        self.arquivos = {}
+        self.taxa_por_conexao = taxa_por_conexao
+        self.latencia = latencia
+        self.aceita_range = aceita_range
+
+    @property
+    def url_base(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def adicionar(self, caminho, dados):
+        self.arquivos[caminho] = dados
+        return self.url_base + caminho
+
+    def adicionar_aleatorio(self, caminho, tamanho):
+        return self.adicionar(caminho, os.urandom(tamanho))
+
+    def iniciar(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,23 @@
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class YouLoaderBenchIE(InfoExtractor):
+    # Extrator dos benchmarks: as informações do vídeo vêm do servidor local, sem acessar a internet
+    IE_NAME = 'youloader:bench'
+    _VALID_URL = r'https?://127\.0\.0\.1:\d+/bench/(?P<id>[\w-]+)$'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        return self._download_json(f'{url}/info.json', video_id, note='Baixando informações do vídeo de teste')
+
+
+class YouLoaderBenchPlaylistIE(InfoExtractor):
+    # Playlist sintética com N vídeos do YouLoaderBenchIE; as entradas são geradas sob demanda
+    IE_NAME = 'youloader:bench:playlist'
+    _VALID_URL = r'(?P<base>https?://127\.0\.0\.1:\d+)/bench-playlist/(?P<prefixo>[\w]+)/(?P<total>\d+)$'
+
+    def _real_extract(self, url):
+        base, prefixo, total = self._match_valid_url(url).group('base', 'prefixo', 'total')
+        entries = (self.url_result(f'{base}/bench/{prefixo}-{n}', YouLoaderBenchIE, f'{prefixo}-{n}')
+                   for n in range(int(total)))
+        return self.playlist_result(entries, prefixo, f'Playlist de teste {prefixo}')
@@ -37,7 +37,8 @@ echo.
 
 pyinstaller ^
     --name=YouLoader ^
-    --onefile ^
+    --onedir ^
+    --noupx ^
     --windowed ^
     --icon=app-icon.ico ^
     --add-data="app-icon.png;." ^
@@ -55,20 +56,20 @@ if %ERRORLEVEL% EQU 0 (
     echo.
     echo ===================================
     echo  Compilacao concluida com sucesso!
-    echo  O executavel esta em: dist\YouLoader.exe
+    echo  O executavel esta em: dist\YouLoader\YouLoader.exe
     echo ===================================
     
     REM Cria arquivo README na pasta dist
-    echo # YouLoader > dist\README.txt
-    echo. >> dist\README.txt
-    echo Aplicativo para download de videos do YouTube >> dist\README.txt
-    echo. >> dist\README.txt
-    echo Como usar: >> dist\README.txt
-    echo 1. Execute YouLoader.exe >> dist\README.txt
-    echo 2. Cole o link do video do YouTube >> dist\README.txt
-    echo 3. Selecione as opcoes e clique em Baixar >> dist\README.txt
-    echo. >> dist\README.txt
-    echo O FFmpeg sera baixado automaticamente na primeira execucao, se necessario. >> dist\README.txt
+    echo # YouLoader > dist\YouLoader\README.txt
+    echo. >> dist\YouLoader\README.txt
+    echo Aplicativo para download de videos do YouTube >> dist\YouLoader\README.txt
+    echo. >> dist\YouLoader\README.txt
+    echo Como usar: >> dist\YouLoader\README.txt
+    echo 1. Execute YouLoader.exe >> dist\YouLoader\README.txt
+    echo 2. Cole o link do video do YouTube >> dist\YouLoader\README.txt
+    echo 3. Selecione as opcoes e clique em Baixar >> dist\YouLoader\README.txt
+    echo. >> dist\YouLoader\README.txt
+    echo O FFmpeg sera baixado automaticamente na primeira execucao, se necessario. >> dist\YouLoader\README.txt
 ) else (
     echo.
     echo ===================================
@@ -0,0 +1,228 @@
+import sys
+import os
+import json
+import time
+import argparse
+import logging
+from threading import Lock, Event
+
+from app_logging import configurar_logging
+from jobs import QUALITIES, FORMATS, DEFAULT_WORKERS, DownloadJob, DownloadListener, ProgressCoalescer
+from engine import MAX_RETRIES, DownloadQueue
+from ffmpeg_utils import FFmpegBootstrap
+from download_archive import DownloadArchive
+from job_store import JobStore
+from metrics import MetricsRecorder, metrics_dir
+from bandwidth import BandwidthScheduler, carregar_perfis, interpretar_perfil, profiles_file
+from output_writer import OutputWriter, staging_dir, MAX_TRANSFERS_PER_DESTINATION
+
+
+class CliReporter(DownloadListener):
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self.finished = 0
+        self.skipped = 0
+        self.failed = 0
+        self.cancelled = 0
+        # Itens com erro em playlists que terminaram com outros itens baixados
+        self.failed_items = 0
+        self._lock = Lock()
+        self._coalescer = ProgressCoalescer()
+        self._pending = set()
+        self._done = Event()
+
+    def emit(self, event, **fields):
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def track(self, job):
+        with self._lock:
+            self._pending.add(job.id)
+        self.emit("queued", job=job.id, url=job.url, format=job.format_type, quality=job.quality)
+
+    def job_started(self, job):
+        self.emit("started", job=job.id, url=job.url, parent=job.batch.job.id if job.batch else None)
+
+    def job_progress(self, job):
+        self._coalescer.mark(job)
+
+    def job_finished(self, job):
+        if job.state == DownloadJob.SKIPPED:
+            self.emit("skipped", job=job.id, url=job.url, reason="archive")
+            self._resolve(job, ok=True, skipped=True)
+            return
+        fields = {}
+        if job.playlist is not None:
+            fields = {"items": job.playlist.finished, "skipped_items": job.playlist.skipped,
+                      "failed_items": job.playlist.failed}
+            with self._lock:
+                if job.id in self._pending:
+                    self.failed_items += job.playlist.failed
+        self.emit("finished", job=job.id, url=job.url, title=job.title, folder=job.folder,
+                  bytes=job.downloaded_bytes, phases=self._phases(job), **fields)
+        self._resolve(job, ok=True)
+
+    def job_failed(self, job, error):
+        self.emit("error", job=job.id, url=job.url, title=job.title, error=error, phases=self._phases(job))
+        self._resolve(job, ok=False)
+
+    def job_cancelled(self, job):
+        self.emit("cancelled", job=job.id, url=job.url, title=job.title, phases=self._phases(job))
+        self._resolve(job, ok=False, cancelled=True)
+
+    def _phases(self, job):
+        return {phase: round(seconds, 3) for phase, seconds in job.phases.items()}
+
+    def _resolve(self, job, ok, skipped=False, cancelled=False):
+        with self._lock:
+            if job.id not in self._pending:
+                return
+            self._pending.discard(job.id)
+            if skipped:
+                self.skipped += 1
+            elif cancelled:
+                self.cancelled += 1
+            elif ok:
+                self.finished += 1
+            else:
+                self.failed += 1
+            if not self._pending:
+                self._done.set()
+
+    def flush_progress(self):
+        for job in self._coalescer.collect():
+            self.emit("progress", job=job.id, state=job.state, percent=round(job.percent, 1), speed=job.speed,
+                      eta=job.eta, bytes=job.downloaded_bytes)
+
+    def wait(self, interval):
+        while not self._done.wait(interval):
+            self.flush_progress()
+        self.flush_progress()
+
+
+def ler_urls(args):
+    urls = list(args.urls)
+    if args.batch_file:
+        if args.batch_file == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(args.batch_file, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        urls.extend(line.strip() for line in lines if line.strip() and not line.strip().startswith("#"))
+    return urls
+
+
+def perfil_argumento(texto):
+    try:
+        return interpretar_perfil(texto)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="youloader-cli",
+        description="Baixa vídeos, playlists e canais do YouTube sem interface gráfica. "
+                    "Os eventos são impressos como JSON, um por linha.")
+    parser.add_argument("urls", nargs="*", help="links de vídeos, playlists ou canais")
+    parser.add_argument("-b", "--batch-file", help="arquivo com um link por linha ('-' para a entrada padrão)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="mp4", help="formato de saída")
+    parser.add_argument("-q", "--quality", choices=QUALITIES, default="Alta", help="qualidade do vídeo")
+    parser.add_argument("-o", "--output", default=os.getcwd(), help="pasta de destino")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="downloads simultâneos")
+    parser.add_argument("--no-fast-remux", action="store_true", help="sempre recodifica o vídeo ao mesclar")
+    parser.add_argument("--no-stream-audio", action="store_true",
+                        help="no mp3, baixa o áudio completo antes de converter em vez de converter durante o download")
+    parser.add_argument("--limit-rate", type=int, default=0, metavar="KB/s",
+                        help="limite de banda somando todos os downloads (0 = sem limite)")
+    parser.add_argument("--max-per-host", type=int, default=0, metavar="N",
+                        help="conexões simultâneas por servidor (0 = sem limite)")
+    parser.add_argument("--profile", type=perfil_argumento, action="append", default=[],
+                        metavar="HH:MM-HH:MM=KB/s[/N]",
+                        help="limite por horário; pode ser repetido e tem prioridade sobre --limit-rate")
+    parser.add_argument("--profiles-file", default=profiles_file,
+                        help="arquivo com um perfil de horário por linha")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="baixa de novo mesmo os vídeos que já constam no histórico")
+    parser.add_argument("--verify-archive", action="store_true",
+                        help="só ignora vídeos do histórico cujo arquivo ainda existe no disco")
+    parser.add_argument("--resume", action="store_true",
+                        help="retoma também os downloads interrompidos em execuções anteriores")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES, metavar="N",
+                        help="novas tentativas por job após falhas de rede (0 = nenhuma)")
+    parser.add_argument("--staging-dir", default=staging_dir,
+                        help="pasta local onde os arquivos são baixados e processados antes de ir para o destino "
+                             "(padrão: YOULOADER_STAGING_DIR ou ~/YouLoader_data/staging)")
+    parser.add_argument("--no-staging", action="store_true",
+                        help="baixa e processa direto na pasta de destino")
+    parser.add_argument("--max-transfers", type=int, default=MAX_TRANSFERS_PER_DESTINATION, metavar="N",
+                        help="cópias simultâneas para cada disco ou compartilhamento de destino")
+    parser.add_argument("--metrics-dir", default=metrics_dir,
+                        help="pasta onde são gravados jobs.jsonl e youloader.prom")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="nível do log em arquivo (padrão: YOULOADER_LOG_LEVEL ou INFO)")
+    parser.add_argument("--progress-interval", type=float, default=1.0,
+                        help="intervalo em segundos entre eventos de progresso")
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+
+    urls = ler_urls(args)
+    if not urls and not args.resume:
+        parser.error("informe ao menos um link, um arquivo com --batch-file ou --resume")
+
+    log_file = configurar_logging(args.log_level, frontend="cli")
+    logging.info(f"=== INICIANDO MODO CLI === {len(urls)} links, {args.workers} downloads simultâneos")
+
+    # O FFmpeg é verificado em paralelo com a extração dos primeiros vídeos
+    bootstrap = FFmpegBootstrap().iniciar()
+
+    archive = None if args.no_archive else DownloadArchive(verify_files=args.verify_archive)
+
+    scheduler = BandwidthScheduler(args.limit_rate * 1024, args.max_per_host,
+                                   carregar_perfis(args.profiles_file) + args.profile)
+
+    reporter = CliReporter()
+    # A saída padrão fica reservada para os eventos JSON: o motor já manda as mensagens do yt-dlp para o log
+    download_queue = DownloadQueue(reporter, workers=args.workers,
+                                   ffmpeg_pronto=bootstrap.pronto, archive=archive, scheduler=scheduler,
+                                   metrics=MetricsRecorder(args.metrics_dir), store=JobStore(),
+                                   max_retries=args.retries, stream_audio=not args.no_stream_audio,
+                                   writer=None if args.no_staging else OutputWriter(args.staging_dir,
+                                                                                    args.max_transfers))
+    started = time.monotonic()
+
+    resumed = download_queue.restore_jobs() if args.resume else []
+    if not resumed and not urls:
+        reporter.emit("summary", finished=0, skipped=0, failed=0, cancelled=0, failed_items=0, elapsed=0.0,
+                      log=log_file)
+        return 0
+    for job in resumed:
+        reporter.track(job)
+        download_queue.submit(job)
+
+    for url in urls:
+        job = DownloadJob(url, args.quality, args.format, args.output, not args.no_fast_remux)
+        reporter.track(job)
+        download_queue.submit(job)
+
+    try:
+        reporter.wait(args.progress_interval)
+    except KeyboardInterrupt:
+        reporter.emit("interrupted")
+        return 130
+    finally:
+        reporter.emit("summary", finished=reporter.finished, skipped=reporter.skipped, failed=reporter.failed,
+                      cancelled=reporter.cancelled, failed_items=reporter.failed_items,
+                      elapsed=round(time.monotonic() - started, 3), log=log_file)
+
+    return 1 if reporter.failed or reporter.cancelled or reporter.failed_items else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
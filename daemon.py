@@ -0,0 +1,434 @@
+import os
+import re
+import sys
+import json
+import queue
+import hmac
+import secrets
+import argparse
+import itertools
+import logging
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock, Event
+
+from app_logging import configurar_logging
+from jobs import (QUALITIES, FORMATS, DEFAULT_WORKERS, DownloadJob, DownloadListener, ListenerGroup,
+                  ProgressCoalescer)
+from engine import DownloadQueue
+from ffmpeg_utils import FFmpegBootstrap
+from download_archive import DownloadArchive, data_dir
+from job_store import JobStore
+from bandwidth import BandwidthScheduler, carregar_perfis
+from metrics import MetricsRecorder
+from output_writer import OutputWriter, staging_dir, MAX_TRANSFERS_PER_DESTINATION
+
+DEFAULT_PORT = 8750
+# Eventos pendentes por cliente do stream; quem fica para trás é desconectado
+SUBSCRIBER_BUFFER = 1000
+HEARTBEAT_INTERVAL = 15
+MAX_BODY_SIZE = 10 * 1024 * 1024
+# Token gerado quando a API é iniciada sem um; lido pelos scripts locais que usam a API
+token_file = os.path.join(data_dir, "api_token")
+# Nomes aceitos no cabeçalho Host: bloqueia páginas que apontam o próprio domínio para 127.0.0.1 (DNS rebinding)
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+
+def gerar_token(path=token_file):
+    token = secrets.token_urlsafe(24)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Só o usuário atual pode ler o arquivo
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def nome_do_host(header):
+    # "127.0.0.1:8750", "[::1]:8750" ou "localhost" -> nome sem porta nem colchetes
+    header = (header or "").strip().lower()
+    if header.startswith("["):
+        return header[1:].partition("]")[0]
+    return header.rpartition(":")[0] if header.count(":") == 1 else header
+
+
+def pasta_dentro_de(folder, base):
+    folder = os.path.normcase(os.path.realpath(folder))
+    base = os.path.normcase(os.path.realpath(base))
+    try:
+        return os.path.commonpath([folder, base]) == base
+    except ValueError:
+        # Discos diferentes no Windows
+        return False
+
+
+def resumo_do_job(job):
+    resumo = {
+        "id": job.id,
+        "url": job.url,
+        "title": job.title,
+        "state": job.state,
+        "format": job.format_type,
+        "quality": job.quality,
+        "folder": job.folder,
+        "percent": round(job.percent, 1),
+        "speed": job.speed,
+        "eta": job.eta,
+        "bytes": job.downloaded_bytes,
+        "parent": job.batch.job.id if job.batch else None,
+        "error": job.error,
+    }
+    if job.playlist is not None:
+        batch = job.playlist
+        resumo["items"] = {"discovered": batch.discovered, "total": batch.total, "finished": batch.finished,
+                           "skipped": batch.skipped, "failed": batch.failed, "cancelled": batch.cancelled}
+    return resumo
+
+
+class Subscription:
+    def __init__(self):
+        self.queue = queue.Queue(SUBSCRIBER_BUFFER)
+        self.active = True
+
+
+class EventBroadcaster(DownloadListener):
+    def __init__(self, progress_interval=1.0):
+        self.progress_interval = progress_interval
+        self._ids = itertools.count(1)
+        self._subscriptions = []
+        self._lock = Lock()
+        self._coalescer = ProgressCoalescer()
+        self._stop = Event()
+        Thread(target=self._progress_loop, daemon=True).start()
+
+    def subscribe(self):
+        subscription = Subscription()
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.active = False
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, event, data):
+        # Serializado uma única vez para todos os clientes
+        payload = f"id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        payload = payload.encode("utf-8")
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(payload)
+            except queue.Full:
+                logging.warning("Cliente do stream de eventos não acompanhou o ritmo e foi desconectado")
+                self.unsubscribe(subscription)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, []
+        for subscription in subscriptions:
+            subscription.active = False
+
+    def _progress_loop(self):
+        while not self._stop.wait(self.progress_interval):
+            for job in self._coalescer.collect():
+                # O evento final do job já foi enviado
+                if job.state in DownloadJob.ENDED:
+                    continue
+                self.publish("progress", resumo_do_job(job))
+
+    def job_started(self, job):
+        self.publish("started", resumo_do_job(job))
+
+    def job_progress(self, job):
+        self._coalescer.mark(job)
+
+    def job_finished(self, job):
+        self.publish("skipped" if job.state == DownloadJob.SKIPPED else "finished", resumo_do_job(job))
+
+    def job_failed(self, job, error):
+        self.publish("error", resumo_do_job(job))
+
+    def job_cancelled(self, job):
+        self.publish("cancelled", resumo_do_job(job))
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug(f"API {self.address_string()} {format % args}")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        path, _, query = self.path.partition("?")
+        params = urllib.parse.parse_qs(query)
+        try:
+            self._check_origin()
+            authenticated = self._check_token()
+            match = re.fullmatch(r"/jobs/(\d+)", path)
+            if method == "GET" and path == "/events":
+                self._stream_events()
+            elif method == "GET" and path == "/jobs":
+                self._list_jobs(params)
+            elif method == "POST" and path == "/jobs":
+                self._submit_jobs(authenticated)
+            elif method == "GET" and path == "/stats":
+                self._send_json(200, self.server.download_queue.counts())
+            elif match and method == "GET":
+                self._send_json(200, resumo_do_job(self._get_job(int(match.group(1)))))
+            elif match and method == "DELETE":
+                self._cancel_job(int(match.group(1)))
+            else:
+                raise ApiError(404, "rota não encontrada")
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            logging.error(f"Erro na API ({method} {path}): {e}")
+            logging.exception("Detalhes do erro:")
+            self._send_json(500, {"error": str(e)})
+
+    def _check_origin(self):
+        # Páginas abertas no navegador enviam Origin; a API atende só programas locais
+        if self.headers.get("Origin") is not None:
+            raise ApiError(403, "requisições de navegadores não são aceitas")
+        host = nome_do_host(self.headers.get("Host"))
+        bound = self.server.server_address[0].lower()
+        if host in LOOPBACK_HOSTS or (bound not in WILDCARD_HOSTS and host == bound):
+            return
+        if bound in WILDCARD_HOSTS and self.server.token:
+            # Escutando em todos os endereços, qualquer nome da máquina vale; a proteção fica com o token
+            return
+        raise ApiError(403, f"host não permitido: {host or '(ausente)'}")
+
+    def _check_token(self):
+        # True se a requisição trouxe o token; sem token configurado (--no-token) ela segue sem autenticação
+        token = self.server.token
+        header = self.headers.get("Authorization") or ""
+        if token and hmac.compare_digest(header.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+            return True
+        if token:
+            raise ApiError(401, "token inválido ou ausente")
+        return False
+
+    def _read_json(self):
+        # Formulários de outros sites não conseguem enviar application/json sem uma consulta prévia (CORS)
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            raise ApiError(415, "use Content-Type: application/json")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ApiError(400, "Content-Length inválido")
+        if length < 0:
+            raise ApiError(400, "Content-Length inválido")
+        if length > MAX_BODY_SIZE:
+            raise ApiError(413, "corpo da requisição muito grande")
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ApiError(400, "JSON inválido")
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_job(self, job_id):
+        job = self.server.download_queue.jobs.get(job_id)
+        if job is None:
+            raise ApiError(404, f"job {job_id} não encontrado")
+        return job
+
+    def _submit_jobs(self, authenticated):
+        data = self._read_json()
+        if not isinstance(data, dict):
+            raise ApiError(400, "o corpo deve ser um objeto JSON")
+        urls = data.get("urls") if "urls" in data else ([data["url"]] if data.get("url") else [])
+        if (not isinstance(urls, list) or not urls
+                or not all(isinstance(url, str) and url.strip() for url in urls)):
+            raise ApiError(400, "informe 'url' ou uma lista 'urls'")
+        format_type = data.get("format", "mp4")
+        quality = data.get("quality", "Alta")
+        if format_type not in FORMATS:
+            raise ApiError(400, f"formato inválido: {format_type} (use {', '.join(FORMATS)})")
+        if quality not in QUALITIES:
+            raise ApiError(400, f"qualidade inválida: {quality} (use {', '.join(QUALITIES)})")
+        folder = os.path.abspath(data.get("folder") or self.server.default_folder)
+        if not authenticated and not pasta_dentro_de(folder, self.server.default_folder):
+            raise ApiError(403, "sem token, só são aceitas pastas dentro da pasta de destino padrão")
+        fast_remux = data.get("fast_remux", True)
+        if not isinstance(fast_remux, bool):
+            raise ApiError(400, "'fast_remux' deve ser true ou false")
+
+        jobs = []
+        for url in urls:
+            job = DownloadJob(url.strip(), quality, format_type, folder, fast_remux)
+            self.server.download_queue.submit(job)
+            resumo = resumo_do_job(job)
+            self.server.broadcaster.publish("queued", resumo)
+            jobs.append(resumo)
+        logging.info(f"API: {len(jobs)} jobs enfileirados")
+        self._send_json(201, {"jobs": jobs})
+
+    def _list_jobs(self, params):
+        states = set(params.get("state", []))
+        try:
+            limit = int((params.get("limit") or [1000])[0])
+        except ValueError:
+            raise ApiError(400, "'limit' deve ser um número inteiro")
+        if limit < 0:
+            raise ApiError(400, "'limit' não pode ser negativo")
+        jobs = [job for job in self.server.download_queue.list_jobs() if not states or job.state in states]
+        self._send_json(200, {"total": len(jobs), "jobs": [resumo_do_job(job) for job in jobs[:limit]]})
+
+    def _cancel_job(self, job_id):
+        job = self._get_job(job_id)
+        if not self.server.download_queue.cancel(job_id):
+            raise ApiError(409, f"o job {job_id} não pode ser cancelado no estado '{job.state}'")
+        self._send_json(202, resumo_do_job(job))
+
+    def _stream_events(self):
+        # Server-sent events: uma conexão aberta recebendo os eventos de todos os jobs
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        subscription = self.server.broadcaster.subscribe()
+        try:
+            while subscription.active:
+                try:
+                    payload = subscription.queue.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    payload = b": ping\n\n"
+                self.wfile.write(payload)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.broadcaster.unsubscribe(subscription)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, download_queue, broadcaster, default_folder, host="127.0.0.1", port=DEFAULT_PORT, token=None,
+                 require_token=True):
+        super().__init__((host, port), ApiRequestHandler)
+        self.download_queue = download_queue
+        self.broadcaster = broadcaster
+        self.default_folder = os.path.abspath(default_folder)
+        # Sem token informado, um aleatório é gravado em token_file
+        self.token_file = None
+        if not token and require_token:
+            token = gerar_token()
+            self.token_file = token_file
+        self.token = token
+
+    @property
+    def url_base(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def iniciar(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        logging.info(f"API local disponível em {self.url_base}")
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
+        logging.info("API local encerrada")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="youloader-daemon",
+        description="Mantém uma fila de downloads recebendo jobs por uma API HTTP local.")
+    parser.add_argument("--host", default="127.0.0.1", help="endereço de escuta (padrão: apenas esta máquina)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="porta da API")
+    parser.add_argument("--token", default=os.environ.get("YOULOADER_API_TOKEN"),
+                        help="exige 'Authorization: Bearer TOKEN' (padrão: YOULOADER_API_TOKEN; sem ele, um token "
+                             "aleatório é gravado em ~/YouLoader_data/api_token)")
+    parser.add_argument("--no-token", action="store_true",
+                        help="aceita requisições sem token, só com pastas dentro da pasta de destino padrão")
+    parser.add_argument("-o", "--output", default=os.getcwd(), help="pasta de destino padrão dos jobs")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="downloads simultâneos")
+    parser.add_argument("--limit-rate", type=int, default=0, metavar="KB/s", help="limite de banda total")
+    parser.add_argument("--max-per-host", type=int, default=0, metavar="N", help="conexões por servidor")
+    parser.add_argument("--no-archive", action="store_true", help="não ignora vídeos já baixados")
+    parser.add_argument("--staging-dir", default=staging_dir,
+                        help="pasta local onde os arquivos são baixados e processados antes de ir para o destino "
+                             "(padrão: YOULOADER_STAGING_DIR ou ~/YouLoader_data/staging)")
+    parser.add_argument("--no-staging", action="store_true",
+                        help="baixa e processa direto na pasta de destino")
+    parser.add_argument("--max-transfers", type=int, default=MAX_TRANSFERS_PER_DESTINATION, metavar="N",
+                        help="cópias simultâneas para cada disco ou compartilhamento de destino")
+    parser.add_argument("--progress-interval", type=float, default=1.0,
+                        help="intervalo em segundos entre eventos de progresso no stream")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    configurar_logging(args.log_level, frontend="daemon")
+    logging.info(f"=== INICIANDO MODO DAEMON === {args.host}:{args.port}, {args.workers} downloads simultâneos")
+
+    if args.host not in LOOPBACK_HOSTS and args.no_token:
+        logging.warning("API exposta na rede sem token de acesso")
+
+    bootstrap = FFmpegBootstrap().iniciar()
+    broadcaster = EventBroadcaster(args.progress_interval)
+    download_queue = DownloadQueue(ListenerGroup(broadcaster), workers=args.workers, ffmpeg_pronto=bootstrap.pronto,
+                                   archive=None if args.no_archive else DownloadArchive(),
+                                   scheduler=BandwidthScheduler(args.limit_rate * 1024, args.max_per_host,
+                                                                carregar_perfis()),
+                                   metrics=MetricsRecorder(), store=JobStore(),
+                                   writer=None if args.no_staging else OutputWriter(args.staging_dir,
+                                                                                    args.max_transfers))
+    for job in download_queue.restore_jobs():
+        download_queue.submit(job)
+    server = ApiServer(download_queue, broadcaster, os.path.abspath(args.output), args.host, args.port,
+                       None if args.no_token else args.token, require_token=not args.no_token)
+    print(f"YouLoader aguardando jobs em {server.url_base}", file=sys.stderr)
+    if server.token_file:
+        print(f"Token de acesso gravado em {server.token_file}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broadcaster.close()
+        server.server_close()
+        logging.info("Daemon encerrado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
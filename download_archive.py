@@ -0,0 +1,86 @@
+import os
+import time
+import sqlite3
+import logging
+from threading import Lock
+
+data_dir = os.path.join(os.path.expanduser("~"), "YouLoader_data")
+archive_file = os.path.join(data_dir, "archive.sqlite3")
+
+# Limite de parâmetros por consulta do SQLite em versões antigas
+SQLITE_MAX_VARIABLES = 999
+# Cada chave usa dois parâmetros, além do preset
+LOOKUP_CHUNK = (SQLITE_MAX_VARIABLES - 1) // 2
+
+
+class DownloadArchive:
+    def __init__(self, path=archive_file, verify_files=False):
+        self.path = path
+        self.verify_files = verify_files
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS downloads (
+                    extractor TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    preset TEXT NOT NULL,
+                    filepath TEXT,
+                    title TEXT,
+                    downloaded_at REAL NOT NULL,
+                    PRIMARY KEY (extractor, video_id, preset)
+                ) WITHOUT ROWID
+            """)
+        logging.info(f"Histórico de downloads: {path}")
+
+    def _arquivo_existe(self, filepath):
+        return not self.verify_files or bool(filepath and os.path.exists(filepath))
+
+    def contains(self, key, preset):
+        if not key:
+            return False
+        return key in self.contains_many([key], preset)
+
+    def contains_many(self, keys, preset):
+        keys = list({key for key in keys if key})
+        found = set()
+        missing_files = []
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                placeholders = ", ".join("(?, ?)" for _ in chunk)
+                params = [value for key in chunk for value in key]
+                rows = self._conn.execute(
+                    f"SELECT extractor, video_id, filepath FROM downloads "
+                    f"WHERE preset = ? AND (extractor, video_id) IN (VALUES {placeholders})",
+                    [preset, *params]).fetchall()
+                for extractor, video_id, filepath in rows:
+                    if self._arquivo_existe(filepath):
+                        found.add((extractor, video_id))
+                    else:
+                        missing_files.append((extractor, video_id))
+
+        for key in missing_files:
+            logging.info(f"Arquivo de {key[0]}:{key[1]} não existe mais no disco, será baixado de novo")
+            self.remove(key, preset)
+        return found
+
+    def record(self, key, preset, filepath=None, title=None):
+        if not key:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (extractor, video_id, preset, filepath, title, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key[0], key[1], preset, filepath, title, time.time()))
+
+    def remove(self, key, preset):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM downloads WHERE extractor = ? AND video_id = ? AND preset = ?",
+                               (key[0], key[1], preset))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,1120 @@
+import os
+import re
+import json
+import time
+import heapq
+import random
+import logging
+import queue
+from collections import deque
+from threading import Thread, Lock, Condition
+
+import yt_dlp
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import TransportError, HTTPError
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+from yt_dlp.utils import (DownloadCancelled, ExtractorError, UnsupportedError, GeoRestrictedError,
+                          ContentTooShortError)
+
+import segmented
+from audio_stream import AudioStreamError, RespostaEmPartes, pode_transmitir, transmitir_audio
+from app_logging import YtDlpLogger
+from metrics import nome_da_fase
+from jobs import DEFAULT_WORKERS, PROGRESS_INTERVAL, DownloadJob, DownloadBatch, formatar_bytes
+
+segmented.instalar()
+
+MP3_BITRATE = '192'
+
+# A mesclagem e a conversão usam CPU, não rede: um FFmpeg por núcleo
+POSTPROCESS_WORKERS = os.cpu_count() or 2
+# Downloads prontos aguardando FFmpeg, por processamento simultâneo; cada um segura a sessão do yt-dlp até ser processado
+POSTPROCESS_BACKLOG = 2
+
+cache_dir = os.path.join(os.path.expanduser("~"), "YouLoader_cache")
+# Os links de mídia retornados pela extração expiram depois de algumas horas
+METADATA_TTL = 60 * 60
+
+# Codecs que podem ser copiados para um contêiner mp4 sem recodificação
+MP4_VIDEO_CODECS = ('avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'h265', 'av01', 'mp4v')
+MP4_AUDIO_CODECS = ('mp4a', 'aac', 'mp3', 'ac-3', 'ec-3', 'alac')
+
+# Conexões paralelas por arquivo progressivo e fragmentos simultâneos em DASH/HLS, por qualidade
+SEGMENTOS_POR_QUALIDADE = {"Alta": 8, "Média": 4, "Baixa": 2}
+
+# Entradas de playlist consultadas de uma vez no histórico de downloads
+ARCHIVE_LOOKUP_BATCH = 50
+
+# Novas tentativas após falhas de rede, com espera exponencial: 5s, 10s, 20s... até 5 minutos
+MAX_RETRIES = 4
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 5 * 60
+# Respostas HTTP que indicam um problema passageiro do servidor, não do vídeo
+HTTP_TRANSIENT_STATUS = (408, 425, 429, 500, 502, 503, 504)
+# Respostas aos links de mídia que indicam link expirado ou assinatura inválida
+HTTP_STALE_URL_STATUS = (403, 404, 410)
+
+# Intervalo entre gravações do progresso de um job nos jobs pendentes
+JOB_STORE_INTERVAL = 5
+
+# Jobs encerrados que continuam consultáveis na fila; os mais antigos ficam só nas métricas e no histórico
+MAX_ENDED_JOBS = 1000
+# Partes do info dict que nenhum pós-processador usa e que podem ter dezenas de KB por vídeo
+POSTPROCESS_DROPPED_KEYS = ('formats', 'automatic_captions', 'heatmap')
+
+# Uma sessão do yt-dlp é recriada depois de tantos jobs, para os caches internos dela não crescerem sem limite
+SESSION_MAX_JOBS = 200
+# Parâmetros que mudam entre jobs do mesmo perfil; o resto é fixo enquanto a sessão existir
+SESSION_JOB_PARAMS = ('outtmpl', 'format', 'postprocessor_args')
+
+
+def montar_opcoes_ydl(job, extra_params=None, folder=None):
+    # folder: onde o yt-dlp grava os arquivos, se não for a pasta de destino do job (pasta de trabalho local)
+    folder = folder or job.folder
+    if job.format_type == "mp4":
+        if job.quality == "Alta":
+            format_yt = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/mp4"
+        elif job.quality == "Média":
+            format_yt = "bestvideo[height<=480][ext=mp4]+bestaudio[ext=m4a]/best[height<=480][ext=mp4]/mp4"
+        else:
+            format_yt = "worstvideo[ext=mp4]+worstaudio[ext=m4a]/worst[ext=mp4]/mp4"
+
+        ydl_opts = {
+            'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
+            'format': format_yt,
+            'extract_flat': 'in_playlist',
+            'merge_output_format': 'mp4',
+        }
+
+    else:  # mp3
+        format_yt = "bestaudio/best"
+
+        ydl_opts = {
+            'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
+            'format': format_yt,
+            'extract_flat': 'in_playlist',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': MP3_BITRATE,
+            }],
+        }
+
+    # As mensagens do yt-dlp vão para o log; o progresso é tratado pelo progress_hook
+    if job.format_id:
+        # Job retomado: os mesmos streams permitem continuar os arquivos parciais
+        ydl_opts['format'] = f"{job.format_id}/{format_yt}"
+
+    ydl_opts['logger'] = YtDlpLogger()
+    ydl_opts['noprogress'] = True
+
+    segments = SEGMENTOS_POR_QUALIDADE.get(job.quality, 1)
+    ydl_opts['youloader_segments'] = segments
+    ydl_opts['concurrent_fragment_downloads'] = segments
+
+    if extra_params:
+        ydl_opts.update(extra_params)
+
+    logging.info(f"[Job {job.id}] Formato yt-dlp: {format_yt}")
+    logging.debug(f"[Job {job.id}] Opções yt-dlp: {ydl_opts}")
+    return ydl_opts
+
+
+def resumir_formatos(formats):
+    # Uma linha curta no lugar da lista completa de formatos, que pode ter centenas de KB
+    formats = formats or []
+    videos = [f for f in formats if f.get('vcodec') not in (None, 'none')]
+    audios = [f for f in formats if f.get('vcodec') in (None, 'none') and f.get('acodec') not in (None, 'none')]
+    alturas = sorted({f['height'] for f in videos if f.get('height')})
+    codecs_video = sorted({f['vcodec'].split('.')[0] for f in videos})
+    codecs_audio = sorted({f['acodec'].split('.')[0] for f in audios})
+    resumo = f"{len(formats)} formatos"
+    if videos:
+        faixa = f"{alturas[0]}p-{alturas[-1]}p" if alturas else "?"
+        resumo += f", vídeo {len(videos)} ({faixa}, {'/'.join(codecs_video)})"
+    if audios:
+        resumo += f", áudio {len(audios)} ({'/'.join(codecs_audio)})"
+    return resumo
+
+
+def codec_compativel(codec, compativeis):
+    return bool(codec) and codec.lower().startswith(compativeis)
+
+
+def argumentos_merge_mp4(info, fast_remux=True):
+    formats = info.get('requested_formats')
+    if not formats:
+        return None, "sem mesclagem (arquivo único)"
+
+    vcodec = next((f.get('vcodec') for f in formats if f.get('vcodec') not in (None, 'none')), None)
+    acodec = next((f.get('acodec') for f in formats if f.get('acodec') not in (None, 'none')), None)
+    codecs = f"vídeo={vcodec}, áudio={acodec}"
+
+    if not fast_remux:
+        return ['-c:v', 'libx264', '-c:a', 'aac'], f"transcodificação (remux rápido desativado), {codecs}"
+
+    video_copy = codec_compativel(vcodec, MP4_VIDEO_CODECS)
+    audio_copy = codec_compativel(acodec, MP4_AUDIO_CODECS)
+    if video_copy and audio_copy:
+        # O merger do yt-dlp já usa "-c copy" por padrão
+        return [], f"remux (cópia de streams), {codecs}"
+
+    args = ['-c:v', 'copy' if video_copy else 'libx264',
+            '-c:a', 'copy' if audio_copy else 'aac']
+    return args, f"transcodificação parcial ({' '.join(args)}), {codecs}"
+
+
+def tamanho_estimado(info):
+    # Soma dos streams escolhidos; formatos sem tamanho informado contam zero
+    formats = info.get('requested_formats') or [info]
+    return sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in formats)
+
+
+def causas_do_erro(error):
+    # O yt-dlp embrulha a exceção original (DownloadError.exc_info, ExtractorError.cause)
+    vistos = set()
+    while error is not None and id(error) not in vistos:
+        vistos.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        error = (getattr(error, 'cause', None) or (exc_info[1] if exc_info else None)
+                 or error.__cause__ or error.__context__)
+
+
+def erro_transitorio(error):
+    for causa in causas_do_erro(error):
+        if isinstance(causa, (DownloadCancelled, UnsupportedError, GeoRestrictedError)):
+            return False
+        if isinstance(causa, HTTPError):
+            return causa.status in HTTP_TRANSIENT_STATUS
+        if isinstance(causa, ExtractorError) and causa.expected and not causa.cause:
+            # Vídeo privado, removido, exige login...
+            return False
+        if isinstance(causa, (TransportError, ContentTooShortError, ConnectionError, TimeoutError)):
+            return True
+    return False
+
+
+def metadados_invalidos(error):
+    # Só links expirados e falhas definitivas descartam o cache; uma nova tentativa depois de um timeout ou 5xx usa os
+    # mesmos metadados sem repetir a extração
+    for causa in causas_do_erro(error):
+        if isinstance(causa, HTTPError) and causa.status in HTTP_STALE_URL_STATUS:
+            return True
+        if re.search(r'expired|signature', str(causa), re.IGNORECASE):
+            return True
+    return not erro_transitorio(error)
+
+
+def atraso_da_tentativa(attempt):
+    # Metade fixa e metade aleatória: muitos jobs falhando juntos não voltam todos no mesmo instante
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def remover_parciais(paths):
+    for path in paths:
+        for arquivo in (path, path + segmented.STATE_SUFFIX, path + '.ytdl'):
+            try:
+                if os.path.exists(arquivo):
+                    os.remove(arquivo)
+            except OSError as e:
+                logging.warning(f"Não foi possível remover o arquivo parcial {arquivo}: {e}")
+
+
+def identificar_video(ydl, url):
+    # Identifica o vídeo só pela URL, sem acessar a rede: (extrator, id)
+    for ie_key, ie in ydl._ies.items():
+        if ie.suitable(url):
+            temp_id = ie.get_temp_id(url)
+            return (ie_key, temp_id) if temp_id else None
+    return None
+
+
+def chave_do_resultado(info):
+    if info.get('extractor_key') and info.get('id'):
+        return info['extractor_key'], info['id']
+    if info.get('ie_key') and info.get('id'):
+        # Entradas de playlist extraídas com extract_flat
+        return info['ie_key'], info['id']
+    return None
+
+
+class PipelinedYoutubeDL(yt_dlp.YoutubeDL):
+    # O pós-processamento (mesclagem, conversão para MP3) fica pendente para rodar fora da thread de download
+    def __init__(self, params=None, auto_init=True, scheduler=None, profile=None):
+        # Hooks fixos que repassam os eventos ao job atual: a mesma sessão atende vários jobs, um de cada vez
+        self.progress_hook = None
+        self.postprocessor_hook = None
+        params = dict(params or {}, progress_hooks=[self._on_progress], postprocessor_hooks=[self._on_postprocessor])
+        super().__init__(params, auto_init)
+        self.pending_postprocessing = []
+        self.scheduler = scheduler
+        self.profile = profile
+        self.jobs_served = 0
+
+    def _on_progress(self, d):
+        if self.progress_hook is not None:
+            self.progress_hook(d)
+
+    def _on_postprocessor(self, d):
+        if self.postprocessor_hook is not None:
+            self.postprocessor_hook(d)
+
+    def configure(self, params):
+        # Pasta, streams de um job retomado e argumentos da mesclagem do job anterior não podem vazar para o próximo
+        for name in SESSION_JOB_PARAMS:
+            if name not in params:
+                self.params.pop(name, None)
+            elif name == 'outtmpl':
+                self.params['outtmpl']['default'] = params['outtmpl']
+            elif name == 'format':
+                if params['format'] != self.params.get('format'):
+                    self.params['format'] = params['format']
+                    self.format_selector = self.build_format_selector(params['format'])
+            else:
+                self.params[name] = params[name]
+
+    def urlopen(self, req):
+        # Toda requisição (extração, downloads, fragmentos, segmentos) passa pelo limite de banda compartilhado
+        if self.scheduler is None:
+            return super().urlopen(req)
+        return self.scheduler.open(super().urlopen, req)
+
+    def post_process(self, filename, info, files_to_move=None):
+        info['filepath'] = filename
+        # Cópia: o yt-dlp remove do info as chaves repetidas logo depois do download
+        pending = {k: v for k, v in info.items() if k not in POSTPROCESS_DROPPED_KEYS}
+        self.pending_postprocessing.append((filename, pending, dict(files_to_move or {})))
+        return info
+
+    def run_pending_postprocessing(self):
+        pending, self.pending_postprocessing = self.pending_postprocessing, []
+        return [super(PipelinedYoutubeDL, self).post_process(filename, info, files_to_move)
+                for filename, info, files_to_move in pending]
+
+
+class SessionPool:
+    # Sessões do yt-dlp reaproveitadas entre jobs do mesmo perfil (formato e qualidade): extratores já carregados,
+    # cookies, cache de player/assinaturas e conexões keep-alive continuam prontos para o próximo job
+    def __init__(self, extra_params=None, scheduler=None, max_idle=DEFAULT_WORKERS, max_jobs=SESSION_MAX_JOBS):
+        self.extra_params = extra_params
+        self.scheduler = scheduler
+        self.max_idle = max_idle
+        self.max_jobs = max_jobs
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = Lock()
+
+    def checkout(self, job, progress_hook=None, postprocessor_hook=None, folder=None):
+        ydl_opts = montar_opcoes_ydl(job, self.extra_params, folder)
+        with self._lock:
+            idle = self._idle.get(job.preset)
+            ydl = idle.pop() if idle else None
+            if ydl is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if ydl is None:
+            ydl = PipelinedYoutubeDL(ydl_opts, scheduler=self.scheduler, profile=job.preset)
+            logging.debug(f"[Job {job.id}] Nova sessão yt-dlp para o perfil {job.preset}")
+        else:
+            ydl.configure(ydl_opts)
+            logging.debug(f"[Job {job.id}] Sessão yt-dlp reaproveitada ({job.preset}, {ydl.jobs_served} jobs)")
+        ydl.progress_hook = progress_hook
+        ydl.postprocessor_hook = postprocessor_hook
+        ydl.jobs_served += 1
+        return ydl
+
+    def release(self, ydl, reusable=True):
+        # Sessões que passaram por um erro são descartadas: o estado interno do yt-dlp pode ter ficado pela metade
+        ydl.progress_hook = None
+        ydl.postprocessor_hook = None
+        if reusable and not ydl.pending_postprocessing and ydl.jobs_served < self.max_jobs:
+            with self._lock:
+                idle = self._idle.setdefault(ydl.profile, [])
+                if len(idle) < self.max_idle:
+                    idle.append(ydl)
+                    return
+        ydl.close()
+
+    def close(self):
+        with self._lock:
+            sessions = [ydl for idle in self._idle.values() for ydl in idle]
+            self._idle = {}
+        for ydl in sessions:
+            ydl.close()
+
+
+class JobResult:
+    # O que sobra de um download concluído; o info dict (formatos, miniaturas, legendas) é descartado logo após
+    __slots__ = ('key', 'filepath')
+
+    def __init__(self, key, filepath=None):
+        self.key = key
+        self.filepath = filepath
+
+    @classmethod
+    def from_info(cls, info):
+        downloads = info.get('requested_downloads') or [{}]
+        return cls(chave_do_resultado(info), downloads[0].get('filepath') or info.get('filepath'))
+
+
+class MetadataCache:
+    def __init__(self, directory=os.path.join(cache_dir, "metadata"), ttl=METADATA_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', "_".join(key)) + ".json")
+
+    def get(self, key):
+        if not key:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Cache de metadados inválido para {key}: {e}")
+            return None
+
+    def put(self, ydl, info):
+        key = chave_do_resultado(info)
+        if info.get('_type', 'video') != 'video' or not key:
+            return
+        path = self._path(key)
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(ydl.sanitize_info(info, remove_private_keys=True), f)
+            os.replace(tmp_path, path)
+            logging.debug(f"Metadados salvos em cache: {key}")
+        except Exception as e:
+            logging.warning(f"Erro ao salvar cache de metadados para {key}: {e}")
+
+    def invalidate(self, key):
+        if not key:
+            return
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class DownloadQueue:
+    def __init__(self, listener, workers=DEFAULT_WORKERS, ydl_params=None, ffmpeg_pronto=None, archive=None,
+                 postprocess_workers=POSTPROCESS_WORKERS, scheduler=None, metrics=None, store=None,
+                 max_retries=MAX_RETRIES, stream_audio=True, entry_sink=None, writer=None):
+        self.listener = listener
+        # Pasta de trabalho local e cópia final para o destino (OutputWriter); sem ele, grava direto no destino
+        self.writer = writer
+        # Recebe (job da playlist, entradas) no lugar de enfileirar os itens aqui; usado pelo worker.py
+        self.entry_sink = entry_sink
+        self.stream_audio = stream_audio
+        self.archive = archive
+        self.store = store
+        self.max_retries = max_retries
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.sessions = SessionPool(ydl_params, scheduler)
+        self.ffmpeg_pronto = ffmpeg_pronto
+        self.jobs = {}
+        self.batches = {}
+        self.metadata_cache = MetadataCache()
+        self._queue = queue.Queue()
+        # Downloads concluídos aguardando mesclagem/conversão; cheia, segura os workers até o FFmpeg alcançar
+        self._postprocess_queue = queue.Queue(maxsize=max(1, postprocess_workers) * POSTPROCESS_BACKLOG)
+        self._lock = Lock()
+        # Avisa a expansão de playlists quando a fila tem espaço para novos itens
+        self._capacity = Condition(self._lock)
+        self._ended = deque()
+        self._counts = {DownloadJob.QUEUED: 0, DownloadJob.DOWNLOADING: 0, DownloadJob.PROCESSING_QUEUED: 0,
+                        DownloadJob.PROCESSING: 0, DownloadJob.FINISHED: 0, DownloadJob.SKIPPED: 0,
+                        DownloadJob.ERROR: 0, DownloadJob.CANCELLED: 0}
+        # Jobs aguardando uma nova tentativa, ordenados pelo horário em que voltam à fila
+        self._retries = []
+        self._retry_ready = Condition()
+        Thread(target=self._retry_loop, daemon=True).start()
+        self._workers = 0
+        self._target_workers = 0
+        self.set_worker_count(workers)
+        for _ in range(max(1, postprocess_workers)):
+            Thread(target=self._postprocess_loop, daemon=True).start()
+        logging.info(f"Processamentos simultâneos: {max(1, postprocess_workers)}")
+
+    def submit(self, job):
+        job.start_phase('queue_wait')
+        # Itens de playlist não são salvos: ao retomar, a playlist é listada de novo e o histórico pula o que já terminou
+        if self.store is not None and job.batch is None and job.store_id is None:
+            self._store_call(job, self.store.add)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._counts[job.state] += 1
+            # Item de playlist cancelada enquanto a expansão aguardava espaço na fila
+            if job.batch is not None and job.batch.job.cancelled:
+                job.cancelled = True
+        self._queue.put(job)
+        logging.info(f"[Job {job.id}] Enfileirado: URL={job.url}, Qualidade={job.quality}, "
+                     f"Formato={job.format_type}, Pasta={job.folder}")
+        return job
+
+    def restore_jobs(self):
+        # Jobs interrompidos por um fechamento ou falha anterior; quem chama decide quando enviá-los à fila
+        if self.store is None:
+            return []
+        jobs = []
+        for row in self.store.claim_pending():
+            job = DownloadJob(row["url"], row["quality"], row["format_type"], row["folder"], row["fast_remux"])
+            job.store_id = row["id"]
+            job.format_id = row["format_id"]
+            job.partial_files = row["partial_files"]
+            parcial = sum(os.path.getsize(path) for path in job.partial_files if os.path.exists(path))
+            logging.info(f"[Job {job.id}] Retomando {job.url} ({formatar_bytes(parcial)} em arquivos parciais"
+                         + (f", último erro: {row['last_error']}" if row["last_error"] else "") + ")")
+            jobs.append(job)
+        return jobs
+
+    def set_worker_count(self, count):
+        count = max(1, int(count))
+        with self._lock:
+            self._target_workers = count
+            missing = count - self._workers
+            if missing > 0:
+                self._workers += missing
+            self._capacity.notify_all()
+        # Uma sessão ociosa por worker e perfil: cobre a fila inteira baixando o mesmo formato e qualidade
+        self.sessions.max_idle = count
+        # Workers excedentes se encerram sozinhos ao terminar o job atual
+        for _ in range(missing):
+            Thread(target=self._worker_loop, daemon=True).start()
+        logging.info(f"Downloads simultâneos: {count}")
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            # O FFmpeg em andamento não é interrompido; jobs encerrados não têm o que cancelar
+            if job is None or job.cancelled or job.state in DownloadJob.ENDED or job.state == DownloadJob.PROCESSING:
+                return False
+            job.cancelled = True
+            children = [child for child in self.jobs.values()
+                        if job.playlist is not None and child.batch is job.playlist]
+        logging.info(f"[Job {job.id}] Cancelamento solicitado")
+        for child in children:
+            self.cancel(child.id)
+        return True
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def list_jobs(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def active_jobs(self):
+        with self._lock:
+            return [job for job in self.jobs.values() if job.state == DownloadJob.DOWNLOADING]
+
+    def active_batches(self):
+        with self._lock:
+            return list(self.batches.values())
+
+    def _set_state(self, job, state):
+        with self._lock:
+            self._counts[job.state] -= 1
+            self._counts[state] += 1
+            job.state = state
+            if state in DownloadJob.ENDED and job.batch is None:
+                self._ended.append(job.id)
+                while len(self._ended) > MAX_ENDED_JOBS:
+                    self.jobs.pop(self._ended.popleft(), None)
+        if self.writer is not None and (state in DownloadJob.ENDED or state == DownloadJob.QUEUED):
+            # O espaço em disco fica reservado só enquanto o job está em andamento
+            self.writer.release(job)
+
+    def _worker_loop(self):
+        while True:
+            with self._lock:
+                if self._workers > self._target_workers:
+                    self._workers -= 1
+                    return
+            try:
+                job = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            with self._capacity:
+                self._capacity.notify_all()
+            try:
+                self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    def _extract(self, ydl, job, key):
+        job.start_phase('extract')
+        try:
+            return self._extract_info(ydl, job, key)
+        finally:
+            job.end_phase('extract')
+
+    def _extract_info(self, ydl, job, key):
+        info = self.metadata_cache.get(key)
+        if info is not None:
+            logging.info(f"[Job {job.id}] Metadados obtidos do cache: {key}")
+            return info
+
+        # Extrai sem processar para poder reaproveitar o resultado no download
+        info = ydl.extract_info(job.url, download=False, process=False)
+        # Links que apenas redirecionam (ex.: canais) são resolvidos até o resultado final
+        while info.get('_type') == 'url':
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        self.metadata_cache.put(ydl, info)
+        return info
+
+    def _select_formats(self, ydl, job, info):
+        # A seleção de formatos não acessa a rede; a cópia evita alterar o info original
+        selected = ydl.process_ie_result(dict(info), download=False)
+        if selected.get('format_id') and selected['format_id'] != job.format_id:
+            job.format_id = selected['format_id']
+            self._persist(job)
+        return selected
+
+    def _configure_merge(self, ydl, job, selected):
+        args, description = argumentos_merge_mp4(selected, job.fast_remux)
+        if args is not None:
+            job.merge_mode = "transcode" if args else "remux"
+        logging.info(f"[Job {job.id}] Modo de mesclagem: {description}")
+        if args:
+            ydl.params['postprocessor_args'] = {'merger': args}
+
+    def _stream_audio(self, ydl, job, selected):
+        # Converte para mp3 enquanto baixa, sem gravar o stream original; None volta ao caminho normal
+        postprocessor = FFmpegPostProcessor(ydl)
+        if not postprocessor.available:
+            return None
+        ffmpeg = postprocessor.executable
+        filepath = os.path.splitext(ydl.prepare_filename(selected))[0] + '.mp3'
+        if os.path.exists(filepath):
+            logging.info(f"[Job {job.id}] Arquivo já existe: {filepath}")
+            return filepath
+        tmpfilename = filepath + '.part'
+        format_id = selected.get('format_id')
+        logging.info(f"[Job {job.id}] Convertendo para mp3 durante o download (formato {format_id}, "
+                     f"{selected.get('ext')})")
+
+        headers = selected.get('http_headers') or {}
+        chunk_size = (selected.get('downloader_options') or {}).get('http_chunk_size')
+        if chunk_size:
+            def abrir(extra):
+                return ydl.urlopen(Request(selected['url'], headers={**headers, **extra}))
+
+            response = RespostaEmPartes(abrir, chunk_size, selected.get('filesize')).iniciar()
+            expected = response.total
+        else:
+            response = ydl.urlopen(Request(selected['url'], headers=headers))
+            expected = int(response.headers.get('Content-Length') or 0) or selected.get('filesize')
+        total = expected or selected.get('filesize_approx')
+        started = time.time()
+
+        def progresso(downloaded):
+            now = time.time()
+            self._progress_hook(job, {
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'filename': filepath,
+                'tmpfilename': tmpfilename,
+                'speed': FileDownloader.calc_speed(started, now, downloaded),
+                'eta': FileDownloader.calc_eta(started, now, total, downloaded),
+                'info_dict': selected,
+            })
+
+        try:
+            downloaded = transmitir_audio(response, ffmpeg, tmpfilename, MP3_BITRATE, progresso, expected)
+        except ContentTooShortError:
+            # O mp3 truncado não é retomado: a nova tentativa converte o stream desde o início
+            remover_parciais([tmpfilename])
+            if tmpfilename in job.partial_files:
+                job.partial_files.remove(tmpfilename)
+            raise
+        except AudioStreamError as e:
+            logging.warning(f"[Job {job.id}] Conversão durante o download falhou, baixando o arquivo completo: {e}")
+            remover_parciais([tmpfilename])
+            if tmpfilename in job.partial_files:
+                job.partial_files.remove(tmpfilename)
+            return None
+
+        os.replace(tmpfilename, filepath)
+        self._progress_hook(job, {'status': 'finished', 'downloaded_bytes': downloaded, 'total_bytes': downloaded,
+                                  'filename': filepath, 'info_dict': selected})
+        return filepath
+
+    def _prepare_output(self, ydl, job, selected):
+        # Com a pasta de trabalho, o yt-dlp não vê o arquivo já publicado no destino; devolve o caminho dele se existir
+        if self.writer is None:
+            return None
+        filepath = ydl.prepare_filename(selected)
+        if job.format_type == "mp3":
+            filepath = os.path.splitext(filepath)[0] + '.mp3'
+        destination = self.writer.destination(job, filepath)
+        if os.path.exists(destination):
+            logging.info(f"[Job {job.id}] Arquivo já existe: {destination}")
+            return destination
+        size = tamanho_estimado(selected)
+        # A mesclagem e a conversão gravam o resultado ao lado dos arquivos baixados antes de apagá-los
+        converted = bool(selected.get('requested_formats')) or job.format_type == "mp3"
+        self.writer.reserve(job, size * 2 if converted else size, size)
+        return None
+
+    def _publish(self, job, filepath):
+        job.info = "Movendo para a pasta de destino..."
+        self.listener.job_progress(job)
+        job.start_phase('publish')
+        try:
+            return self.writer.publish(job, filepath)
+        finally:
+            job.end_phase('publish')
+
+    def _wait_for_ffmpeg(self, job):
+        # A mesclagem e a conversão dependem do FFmpeg, que pode ainda estar sendo baixado
+        if self.ffmpeg_pronto is None or self.ffmpeg_pronto.is_set():
+            return
+        logging.info(f"[Job {job.id}] Aguardando a configuração do FFmpeg")
+        job.info = "Aguardando FFmpeg..."
+        self.listener.job_progress(job)
+        job.start_phase('ffmpeg_wait')
+        self.ffmpeg_pronto.wait()
+        job.end_phase('ffmpeg_wait')
+
+    def _run_job(self, job):
+        job.end_phase('queue_wait')
+        job.end_phase('retry_wait')
+        if job.cancelled:
+            self._cancel_job(job)
+            if job.batch is not None:
+                self._child_done(job)
+            return
+        self._set_state(job, DownloadJob.DOWNLOADING)
+        self.listener.job_started(job)
+        key = None
+        ydl = None
+        handed_off = False
+        failed = False
+        try:
+            logging.info(f"[Job {job.id}] Download iniciado para URL: {job.url}")
+            job.start_phase('session')
+            ydl = self.sessions.checkout(job, lambda d: self._progress_hook(job, d),
+                                         lambda d: self._postprocessor_hook(job, d),
+                                         self.writer.staging_folder(job.folder) if self.writer else None)
+            job.end_phase('session')
+            key = identificar_video(ydl, job.url)
+            if self.archive is not None and self.archive.contains(key, job.preset):
+                logging.info(f"[Job {job.id}] Já baixado anteriormente ({key[0]}:{key[1]}, {job.preset}), ignorando")
+                job.percent = 100.0
+                self._set_state(job, DownloadJob.SKIPPED)
+                self._record_metrics(job)
+                if job.batch is None:
+                    self.listener.job_finished(job)
+                return
+
+            info = self._extract(ydl, job, key)
+            job.title = info.get('title')
+
+            if info.get('_type') in ('playlist', 'multi_video'):
+                # A sessão do yt-dlp passa a pertencer à thread que percorre a playlist
+                self._start_batch(job, ydl, info)
+                handed_off = True
+                return
+
+            logging.info(f"[Job {job.id}] Informações do vídeo: Título={info.get('title')}, "
+                         f"Formatos disponíveis: {resumir_formatos(info.get('formats'))}")
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"[Job {job.id}] IDs dos formatos: "
+                              f"{' '.join(str(f.get('format_id')) for f in info.get('formats') or [])}")
+            selected = self._select_formats(ydl, job, info)
+            existing = self._prepare_output(ydl, job, selected)
+            if existing is not None:
+                self._finish_job(job, JobResult(chave_do_resultado(selected), existing))
+                return
+            if job.format_type == "mp4":
+                self._configure_merge(ydl, job, selected)
+            self._wait_for_ffmpeg(job)
+            if self.stream_audio and job.format_type == "mp3" and pode_transmitir(selected):
+                filepath = self._stream_audio(ydl, job, selected)
+                if filepath is not None:
+                    self._finish_job(job, JobResult(chave_do_resultado(selected), filepath))
+                    return
+            result = JobResult.from_info(ydl.process_ie_result(info, download=True))
+            job.percent = 100.0
+            if ydl.pending_postprocessing:
+                # A thread de download fica livre para o próximo job enquanto o FFmpeg trabalha
+                self._set_state(job, DownloadJob.PROCESSING_QUEUED)
+                job.info = "Aguardando processamento..."
+                self.listener.job_progress(job)
+                logging.info(f"[Job {job.id}] Download concluído, aguardando processamento")
+                job.start_phase('postprocess_wait')
+                self._postprocess_queue.put((job, ydl, result))
+                handed_off = True
+                return
+            self._finish_job(job, result)
+        except Exception as e:
+            failed = True
+            if job.cancelled:
+                self._cancel_job(job)
+                return
+            if metadados_invalidos(e):
+                # Links de mídia expirados ou inválidos não devem ser reaproveitados
+                self.metadata_cache.invalidate(key)
+            if self._schedule_retry(job, e):
+                # O job volta à fila mais tarde e continua contando como pendente na playlist
+                handed_off = True
+                return
+            self._fail_job(job, e, "Erro no download")
+        finally:
+            if ydl is not None and not handed_off:
+                self.sessions.release(ydl, reusable=not failed)
+            if job.batch is not None and not handed_off:
+                self._child_done(job)
+
+    def _postprocess_loop(self):
+        while True:
+            job, ydl, result = self._postprocess_queue.get()
+            try:
+                self._postprocess_job(job, ydl, result)
+            finally:
+                self._postprocess_queue.task_done()
+
+    def _postprocess_job(self, job, ydl, result):
+        job.end_phase('postprocess_wait')
+        failed = False
+        try:
+            if job.cancelled:
+                self._cancel_job(job)
+                return
+            self._set_state(job, DownloadJob.PROCESSING)
+            job.info = "Processando com FFmpeg..."
+            self.listener.job_progress(job)
+            started = time.monotonic()
+            processed = ydl.run_pending_postprocessing()
+            logging.info(f"[Job {job.id}] Processamento concluído em {time.monotonic() - started:.1f}s")
+            result.filepath = processed[0].get('filepath') or result.filepath
+            self._finish_job(job, result)
+        except Exception as e:
+            failed = True
+            self._fail_job(job, e, "Erro no processamento")
+        finally:
+            # Canceladas antes do FFmpeg, as etapas pendentes ficam na sessão e ela é descartada
+            self.sessions.release(ydl, reusable=not failed)
+            if job.batch is not None:
+                self._child_done(job)
+
+    def _finish_job(self, job, result):
+        if self.writer is not None and result.filepath:
+            # Antes de tirar o job dos pendentes: se a cópia falhar, o arquivo continua na pasta de trabalho
+            result.filepath = self._publish(job, result.filepath)
+        self._forget(job)
+        if self.archive is not None:
+            self.archive.record(result.key, job.preset, result.filepath, job.title)
+
+        job.percent = 100.0
+        job.info = ""
+        self._set_state(job, DownloadJob.FINISHED)
+        self._record_metrics(job)
+        logging.info(f"[Job {job.id}] Download concluído com sucesso")
+        if job.batch is None:
+            self.listener.job_finished(job)
+
+    def _fail_job(self, job, error, context):
+        job.error = str(error)
+        if erro_transitorio(error):
+            # Tentativas esgotadas por falha de rede: fica nos pendentes para ser retomado no próximo início
+            self._persist(job, force=True)
+        else:
+            self._forget(job)
+        self._set_state(job, DownloadJob.ERROR)
+        self._record_metrics(job)
+        logging.error(f"[Job {job.id}] {context}: {error}")
+        logging.exception("Detalhes do erro:")
+        if job.batch is None:
+            self.listener.job_failed(job, str(error))
+
+    def _cancel_job(self, job):
+        self._forget(job)
+        remover_parciais(job.partial_files)
+        job.info = "Cancelado"
+        self._set_state(job, DownloadJob.CANCELLED)
+        self._record_metrics(job)
+        logging.info(f"[Job {job.id}] Cancelado")
+        if job.batch is None:
+            self.listener.job_cancelled(job)
+
+    def _schedule_retry(self, job, error):
+        if job.attempts >= self.max_retries or not erro_transitorio(error):
+            return False
+        job.attempts += 1
+        delay = atraso_da_tentativa(job.attempts)
+        job.error = str(error)
+        job.speed = None
+        job.eta = None
+        job.info = f"Falha de rede, nova tentativa ({job.attempts}/{self.max_retries}) em {delay:.0f}s"
+        self._set_state(job, DownloadJob.QUEUED)
+        self._persist(job, force=True)
+        logging.warning(f"[Job {job.id}] {error} - nova tentativa {job.attempts}/{self.max_retries} em {delay:.1f}s")
+        self.listener.job_progress(job)
+        job.start_phase('retry_wait')
+        with self._retry_ready:
+            heapq.heappush(self._retries, (time.monotonic() + delay, job.id, job))
+            self._retry_ready.notify()
+        return True
+
+    def _retry_loop(self):
+        while True:
+            with self._retry_ready:
+                while not self._retries or self._retries[0][0] > time.monotonic():
+                    self._retry_ready.wait(self._retries[0][0] - time.monotonic() if self._retries else None)
+                _, _, job = heapq.heappop(self._retries)
+            logging.info(f"[Job {job.id}] Nova tentativa de download")
+            job.start_phase('queue_wait')
+            self._queue.put(job)
+
+    def _persist(self, job, force=False):
+        if self.store is None or job.store_id is None:
+            return
+        now = time.monotonic()
+        if not force and now - job.last_persist < JOB_STORE_INTERVAL:
+            return
+        job.last_persist = now
+        self._store_call(job, self.store.update)
+
+    def _forget(self, job):
+        if self.store is not None and job.store_id is not None:
+            self._store_call(job, self.store.remove)
+
+    def _store_call(self, job, method):
+        # Uma falha ao salvar o estado não deve interromper o download
+        try:
+            method(job)
+        except Exception as e:
+            logging.error(f"[Job {job.id}] Erro ao salvar o estado do job: {e}")
+            logging.exception("Detalhes do erro:")
+
+    def _record_metrics(self, job):
+        job.finish_timing()
+        if self.metrics is None:
+            return
+        try:
+            self.metrics.record(job)
+        except Exception as e:
+            logging.error(f"[Job {job.id}] Erro ao registrar métricas: {e}")
+            logging.exception("Detalhes do erro:")
+
+    def _start_batch(self, job, ydl, info):
+        batch = DownloadBatch(job, info.get('title') or job.url, info.get('playlist_count'))
+        job.playlist = batch
+        with self._lock:
+            self.batches[job.id] = batch
+        logging.info(f"[Job {job.id}] Playlist detectada: Título={batch.title}, Itens={batch.total or '?'}")
+        Thread(target=self._expand_batch, args=(batch, ydl, info.get('entries') or []), daemon=True).start()
+
+    def _wait_for_capacity(self):
+        # Mantém só alguns itens da playlist na fila para a memória não crescer com o tamanho dela
+        with self._capacity:
+            while self._queue.qsize() >= 2 * self._target_workers:
+                self._capacity.wait(timeout=1)
+
+    def _expand_batch(self, batch, ydl, entries):
+        parent = batch.job
+        failed = False
+        try:
+            pending = []
+            # Com extract_flat as entradas chegam conforme as páginas são carregadas
+            for entry in entries:
+                if parent.cancelled:
+                    break
+                if entry and (entry.get('url') or entry.get('webpage_url')):
+                    pending.append(entry)
+                if len(pending) >= ARCHIVE_LOOKUP_BATCH:
+                    self._submit_entries(batch, pending)
+                    pending = []
+            self._submit_entries(batch, pending)
+        except Exception as e:
+            failed = True
+            parent.error = str(e)
+            logging.error(f"[Job {parent.id}] Erro ao listar itens da playlist: {e}")
+            logging.exception("Detalhes do erro:")
+        finally:
+            self.sessions.release(ydl, reusable=not failed)
+            with self._lock:
+                batch.expanding = False
+            logging.info(f"[Job {parent.id}] Playlist listada: {batch.discovered} itens")
+            self._check_batch(batch)
+
+    def _submit_entries(self, batch, entries):
+        parent = batch.job
+        archived = set()
+        delegated = []
+        if self.archive is not None and entries:
+            # Uma única consulta ao histórico para o lote inteiro de entradas
+            archived = self.archive.contains_many([chave_do_resultado(entry) for entry in entries], parent.preset)
+
+        for entry in entries:
+            if parent.cancelled:
+                with self._lock:
+                    batch.cancelled += len(delegated)
+                return
+            with self._lock:
+                batch.discovered += 1
+                if chave_do_resultado(entry) in archived:
+                    batch.skipped += 1
+                    continue
+            if self.entry_sink is not None:
+                delegated.append(entry)
+                continue
+            self._wait_for_capacity()
+            child = DownloadJob(entry.get('url') or entry.get('webpage_url'), parent.quality, parent.format_type,
+                                parent.folder, parent.fast_remux, batch=batch)
+            child.title = entry.get('title')
+            self.submit(child)
+
+        if delegated:
+            try:
+                self.entry_sink(parent, delegated)
+            except Exception:
+                # Já contados como descobertos: sem isto a playlist nunca seria encerrada
+                with self._lock:
+                    batch.failed += len(delegated)
+                raise
+            with self._lock:
+                batch.delegated += len(delegated)
+
+        if archived:
+            logging.info(f"[Job {parent.id}] {len(archived)} itens da playlist já baixados anteriormente")
+
+    def _child_done(self, job):
+        batch = job.batch
+        with self._lock:
+            if job.state == DownloadJob.FINISHED:
+                batch.finished += 1
+            elif job.state == DownloadJob.SKIPPED:
+                batch.skipped += 1
+            elif job.state == DownloadJob.CANCELLED:
+                batch.cancelled += 1
+            else:
+                batch.failed += 1
+            # Itens concluídos de playlists ficam apenas nos contadores do lote
+            self.jobs.pop(job.id, None)
+            if batch.total or batch.discovered:
+                batch.job.percent = batch.done * 100.0 / max(batch.total or 0, batch.discovered)
+        self._check_batch(batch)
+
+    def _check_batch(self, batch):
+        with self._lock:
+            if batch.expanding or batch.done < batch.discovered or batch.job.id not in self.batches:
+                return
+            del self.batches[batch.job.id]
+
+        parent = batch.job
+        parent.downloaded_bytes = batch.bytes
+        parent.finish_timing()
+        logging.info(f"[Job {parent.id}] Playlist concluída: {batch.finished} baixados, {batch.skipped} já existentes, "
+                     f"{batch.failed} com erro, {formatar_bytes(batch.bytes)} a {formatar_bytes(batch.throughput())}/s"
+                     + (f", {batch.delegated} enviados a outra fila" if batch.delegated else ""))
+        self._forget(parent)
+        if parent.cancelled:
+            self._set_state(parent, DownloadJob.CANCELLED)
+        elif batch.discovered == 0 and parent.error:
+            self._set_state(parent, DownloadJob.ERROR)
+        elif batch.failed and batch.failed == batch.discovered - batch.skipped:
+            # Nenhum item novo foi baixado: a playlist não pode aparecer como concluída
+            parent.error = f"Todos os {batch.failed} itens da playlist falharam"
+            self._set_state(parent, DownloadJob.ERROR)
+        else:
+            parent.percent = 100.0
+            self._set_state(parent, DownloadJob.FINISHED)
+
+        if parent.batch is not None:
+            # Playlist dentro de um canal: conta como um item do lote externo
+            self._child_done(parent)
+        elif parent.state == DownloadJob.CANCELLED:
+            self.listener.job_cancelled(parent)
+        elif parent.state == DownloadJob.ERROR:
+            self.listener.job_failed(parent, parent.error)
+        else:
+            self.listener.job_finished(parent)
+
+    def _progress_hook(self, job, d):
+        # Interrompe o download em andamento; a exceção sobe até o _run_job
+        if job.cancelled:
+            raise DownloadCancelled("Download cancelado")
+        try:
+            format_id = (d.get('info_dict') or {}).get('format_id')
+            phase = f"download:{format_id}" if format_id else "download"
+            if d['status'] == 'downloading':
+                job.start_phase(phase)
+                now = time.monotonic()
+                if now - job.last_progress < PROGRESS_INTERVAL:
+                    return
+                job.last_progress = now
+
+                tmpfilename = d.get('tmpfilename')
+                if tmpfilename and tmpfilename not in job.partial_files:
+                    job.partial_files.append(tmpfilename)
+                    self._persist(job, force=True)
+
+                downloaded = d.get('downloaded_bytes') or 0
+                self._account_bytes(job, downloaded)
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                if total:
+                    job.percent = min(downloaded * 100.0 / total, 100.0)
+                elif d.get('fragment_count'):
+                    job.percent = (d.get('fragment_index') or 0) * 100.0 / d['fragment_count']
+                job.speed = d.get('speed')
+                job.eta = d.get('eta')
+                job.info = ""
+                self._persist(job)
+                self.listener.job_progress(job)
+
+            elif d['status'] == 'finished':
+                job.end_phase(phase)
+                # O arquivo parcial já foi renomeado para o nome final
+                tmpfilename = d.get('tmpfilename') or (d.get('filename') or '') + '.part'
+                if tmpfilename in job.partial_files:
+                    job.partial_files.remove(tmpfilename)
+                self._account_bytes(job, d.get('total_bytes') or d.get('downloaded_bytes') or job.current_bytes)
+                job.current_bytes = 0
+                # Um arquivo terminou, mas ainda pode haver outro stream ou pós-processamento
+                job.info = "Processando arquivo..."
+                self.listener.job_progress(job)
+
+            elif d['status'] == 'error':
+                job.end_phase(phase)
+                logging.error(f"[Job {job.id}] Erro reportado pelo yt-dlp: {d.get('error', 'Erro desconhecido')}")
+        except Exception as e:
+            logging.error(f"Erro no hook de progresso: {e}")
+
+    def _postprocessor_hook(self, job, d):
+        try:
+            phase = nome_da_fase(d.get('postprocessor') or 'postprocess')
+            if d['status'] == 'started':
+                job.start_phase(phase)
+            elif d['status'] == 'finished':
+                job.end_phase(phase)
+        except Exception as e:
+            logging.error(f"Erro no hook de pós-processamento: {e}")
+
+    def _account_bytes(self, job, downloaded):
+        delta = downloaded - job.current_bytes
+        if delta <= 0:
+            return
+        job.current_bytes = downloaded
+        job.downloaded_bytes += delta
+        if job.batch is not None:
+            job.batch.add_bytes(delta)
@@ -0,0 +1,234 @@
+import sys
+import os
+import json
+import shutil
+import hashlib
+import logging
+import subprocess
+import urllib.request
+import urllib.error
+import zipfile
+from threading import Thread, Event
+
+FFMPEG_URL = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
+FFMPEG_SHA256_URL = FFMPEG_URL + ".sha256"
+# Só estes executáveis são extraídos do pacote
+FFMPEG_BINARIOS = ("ffmpeg.exe", "ffprobe.exe")
+
+ffmpeg_cache_file = os.path.join(os.path.expanduser("~"), "YouLoader_cache", "ffmpeg.json")
+
+
+def pasta_base():
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.abspath(".")
+
+
+def caminho_ffmpeg_local(destino="ffmpeg"):
+    nome = "ffmpeg.exe" if sys.platform == "win32" else "ffmpeg"
+    return os.path.join(pasta_base(), destino, "bin", nome)
+
+
+def ler_cache_ffmpeg():
+    try:
+        with open(ffmpeg_cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def salvar_cache_ffmpeg(dados):
+    try:
+        os.makedirs(os.path.dirname(ffmpeg_cache_file), exist_ok=True)
+        tmp_path = ffmpeg_cache_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+        os.replace(tmp_path, ffmpeg_cache_file)
+    except OSError as e:
+        logging.warning(f"Erro ao salvar cache do FFmpeg: {e}")
+
+
+def versao_ffmpeg(path):
+    try:
+        result = subprocess.run([path, "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, timeout=15, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"Erro ao executar {path}: {e}")
+        return None
+    if result.returncode != 0:
+        return None
+    primeira_linha = result.stdout.splitlines()[0] if result.stdout else ""
+    return primeira_linha.replace("ffmpeg version", "").split(" Copyright")[0].strip() or "desconhecida"
+
+
+def detectar_ffmpeg(destino="ffmpeg"):
+    cache = ler_cache_ffmpeg()
+    candidatos = [caminho_ffmpeg_local(destino), shutil.which("ffmpeg")]
+
+    for path in filter(None, candidatos):
+        if not os.path.isfile(path):
+            continue
+        mtime = os.path.getmtime(path)
+        # Mesmo executável da última vez: não precisa executar o FFmpeg de novo
+        if cache.get("path") == path and cache.get("mtime") == mtime:
+            logging.info(f"FFmpeg {cache.get('version')} encontrado em: {path} (cache)")
+            return cache
+
+        version = versao_ffmpeg(path)
+        if version:
+            dados = {"path": path, "version": version, "mtime": mtime}
+            salvar_cache_ffmpeg(dados)
+            logging.info(f"FFmpeg {version} encontrado em: {path}")
+            return dados
+
+    logging.warning("FFmpeg não encontrado no sistema nem na pasta local")
+    return None
+
+
+def baixar_com_retomada(url, path):
+    inicio = os.path.getsize(path) if os.path.exists(path) else 0
+    headers = {"Range": f"bytes={inicio}-"} if inicio else {}
+    try:
+        resposta = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30)
+    except urllib.error.HTTPError as e:
+        if e.code == 416:
+            # O arquivo parcial já está completo
+            return
+        raise
+
+    with resposta:
+        if inicio and resposta.status == 206:
+            logging.info(f"Retomando download do FFmpeg a partir de {inicio} bytes")
+            modo = "ab"
+        else:
+            modo = "wb"
+        with open(path, modo) as f:
+            shutil.copyfileobj(resposta, f, 1024 * 1024)
+
+
+def sha256_esperado(url):
+    with urllib.request.urlopen(url, timeout=30) as resposta:
+        return resposta.read().decode("ascii", "ignore").split()[0].strip().lower()
+
+
+def sha256_arquivo(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def extrair_binarios(zip_path, bin_dir):
+    os.makedirs(bin_dir, exist_ok=True)
+    extraidos = []
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for membro in zip_ref.infolist():
+            pasta, _, nome = membro.filename.rpartition("/")
+            if nome not in FFMPEG_BINARIOS or not pasta.endswith("bin"):
+                continue
+            alvo = os.path.join(bin_dir, nome)
+            with zip_ref.open(membro) as origem, open(alvo + ".tmp", "wb") as saida:
+                shutil.copyfileobj(origem, saida, 1024 * 1024)
+            os.replace(alvo + ".tmp", alvo)
+            extraidos.append(nome)
+    return extraidos
+
+
+def baixar_ffmpeg(destino="ffmpeg", notificar=None):
+    try:
+        logging.info("Verificando se o FFmpeg já está disponível")
+        if detectar_ffmpeg(destino):
+            return True
+
+        if sys.platform != "win32":
+            logging.warning("Download automático do FFmpeg disponível apenas no Windows")
+            if notificar:
+                notificar("aviso", "FFmpeg não encontrado",
+                          "Instale o FFmpeg pelo gerenciador de pacotes do sistema.\n"
+                          "Sem ele, a conversão para MP3 e a mesclagem de vídeos podem falhar.")
+            return False
+
+        destino_completo = os.path.join(pasta_base(), destino)
+        os.makedirs(destino_completo, exist_ok=True)
+        # O arquivo parcial é mantido entre execuções para que o download seja retomado
+        zip_path = os.path.join(destino_completo, "ffmpeg.zip.part")
+
+        if notificar:
+            notificar("info", "Download do FFmpeg",
+                      "O FFmpeg não foi encontrado no sistema. Baixando em segundo plano...\n"
+                      "Este processo será realizado apenas uma vez.")
+
+        logging.info("Baixando FFmpeg...")
+        esperado = sha256_esperado(FFMPEG_SHA256_URL)
+        baixar_com_retomada(FFMPEG_URL, zip_path)
+        logging.info("Download do FFmpeg concluído, verificando checksum")
+
+        obtido = sha256_arquivo(zip_path)
+        if obtido != esperado:
+            os.remove(zip_path)
+            raise Exception(f"Checksum do FFmpeg inválido (esperado {esperado}, obtido {obtido})")
+
+        logging.info("Extraindo executáveis do FFmpeg...")
+        extraidos = extrair_binarios(zip_path, os.path.join(destino_completo, "bin"))
+        logging.info(f"Extração concluída: {', '.join(extraidos)}")
+        os.remove(zip_path)
+
+        configurar_ffmpeg(destino)
+        if detectar_ffmpeg(destino):
+            logging.info("FFmpeg instalado com sucesso")
+            if notificar:
+                notificar("info", "Download do FFmpeg", "FFmpeg instalado com sucesso.")
+            return True
+        raise Exception("Falha ao verificar instalação do FFmpeg")
+
+    except Exception as e:
+        logging.error(f"Erro ao baixar/configurar FFmpeg: {e}")
+        logging.exception("Detalhes do erro:")
+        if notificar:
+            notificar("aviso", "Erro FFmpeg",
+                      "Ocorreu um erro ao instalar o FFmpeg.\n"
+                      "O aplicativo tentará continuar, mas os downloads de áudio podem falhar.\n"
+                      "O download será retomado na próxima execução.\n\n"
+                      f"Erro: {str(e)}")
+        return False
+
+
+def configurar_ffmpeg(destino="ffmpeg"):
+    try:
+        ffmpeg_path = os.path.dirname(caminho_ffmpeg_local(destino))
+        logging.info(f"Caminho do FFmpeg: {ffmpeg_path}")
+
+        if not os.path.exists(ffmpeg_path):
+            logging.warning(f"Pasta FFmpeg não encontrada em: {ffmpeg_path}")
+
+        if ffmpeg_path not in os.environ["PATH"].split(os.pathsep):
+            os.environ["PATH"] += os.pathsep + ffmpeg_path
+
+        logging.debug(f"PATH atual: {os.environ['PATH']}")
+    except Exception as e:
+        logging.error(f"Erro ao configurar caminhos do FFmpeg: {e}")
+        logging.exception("Detalhes do erro:")
+
+
+class FFmpegBootstrap:
+    def __init__(self, destino="ffmpeg", notificar=None):
+        self.destino = destino
+        self.notificar = notificar
+        self.disponivel = False
+        # Liberado quando a verificação (e o download, se necessário) termina
+        self.pronto = Event()
+
+    def iniciar(self):
+        Thread(target=self._executar, daemon=True).start()
+        return self
+
+    def _executar(self):
+        try:
+            configurar_ffmpeg(self.destino)
+            self.disponivel = baixar_ffmpeg(self.destino, self.notificar)
+        except Exception as e:
+            logging.error(f"Erro na configuração do FFmpeg: {e}")
+            logging.exception("Detalhes do erro:")
+        finally:
+            self.pronto.set()
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+from threading import Thread, Lock, Event
+
+from download_archive import data_dir
+
+jobs_file = os.path.join(data_dir, "jobs.sqlite3")
+
+# A interface gráfica, o cli.py e o daemon.py usam o mesmo arquivo: cada job pertence ao processo que o baixa, que
+# renova a reserva periodicamente; só jobs de processos encerrados (ou sem renovar há LEASE_SECONDS) são retomados
+LEASE_SECONDS = 60
+HEARTBEAT_INTERVAL = 15
+
+
+def processo_ativo(pid):
+    # Na dúvida responde True: o job só é retomado quando a reserva expirar
+    if pid == os.getpid():
+        return True
+    try:
+        if sys.platform == "win32":
+            import ctypes
+
+            # os.kill(pid, 0) no Windows encerraria o processo
+            kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+            # PROCESS_QUERY_LIMITED_INFORMATION
+            handle = kernel32.OpenProcess(0x1000, False, pid)
+            if not handle:
+                # ERROR_INVALID_PARAMETER: não existe processo com esse pid
+                return ctypes.get_last_error() != 87
+            try:
+                codigo = ctypes.c_ulong()
+                if not kernel32.GetExitCodeProcess(handle, ctypes.byref(codigo)):
+                    return True
+                # STILL_ACTIVE
+                return codigo.value == 259
+            finally:
+                kernel32.CloseHandle(handle)
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except Exception:
+        logging.debug(f"Não foi possível verificar o processo {pid}", exc_info=True)
+    return True
+
+
+def dono_encerrado(owner, now, lease_until):
+    # owner: "computador:pid" do processo que reservou o job
+    if not owner or lease_until is None or lease_until < now:
+        return True
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    return not processo_ativo(int(pid))
+
+
+class JobStore:
+    # Jobs ainda não concluídos; sobrevivem ao fechamento do programa para serem retomados
+    def __init__(self, path=jobs_file, lease=LEASE_SECONDS):
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = lease
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    quality TEXT NOT NULL,
+                    format_type TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    fast_remux INTEGER NOT NULL,
+                    format_id TEXT,
+                    partial_files TEXT,
+                    downloaded_bytes INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT,
+                    lease_until REAL
+                )
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            # Arquivos criados por versões anteriores
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        logging.info(f"Jobs pendentes: {path}")
+        self._stop = Event()
+        Thread(target=self._heartbeat_loop, name="reserva-jobs", daemon=True).start()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self._lock, self._conn:
+                    self._conn.execute("UPDATE jobs SET lease_until = ? WHERE owner = ?",
+                                       (time.time() + self.lease, self.owner))
+            except Exception as e:
+                logging.error(f"Erro ao renovar a reserva dos jobs pendentes: {e}")
+                logging.exception("Detalhes do erro:")
+
+    def add(self, job):
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (url, quality, format_type, folder, fast_remux, format_id, partial_files, "
+                "downloaded_bytes, attempts, last_error, created_at, updated_at, owner, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.url, job.quality, job.format_type, job.folder, int(job.fast_remux), job.format_id,
+                 json.dumps(job.partial_files), job.downloaded_bytes, job.attempts, job.error, now, now,
+                 self.owner, now + self.lease))
+        job.store_id = cursor.lastrowid
+
+    def update(self, job):
+        if job.store_id is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET format_id = ?, partial_files = ?, downloaded_bytes = ?, attempts = ?, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (job.format_id, json.dumps(job.partial_files), job.downloaded_bytes, job.attempts, job.error,
+                 time.time(), job.store_id))
+
+    def remove(self, job):
+        if job.store_id is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job.store_id,))
+        job.store_id = None
+
+    def claim_pending(self):
+        # Reserva para este processo os jobs cujo dono foi encerrado; os de outra janela ou daemon em execução ficam
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE: dois processos retomando ao mesmo tempo não pegam o mesmo job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, url, quality, format_type, folder, fast_remux, format_id, partial_files, "
+                    "downloaded_bytes, last_error, owner, lease_until FROM jobs WHERE owner IS NULL OR owner != ? "
+                    "ORDER BY id", (self.owner,)).fetchall()
+                rows = [row for row in rows if dono_encerrado(row[10], now, row[11])]
+                self._conn.executemany("UPDATE jobs SET owner = ?, lease_until = ? WHERE id = ?",
+                                       [(self.owner, now + self.lease, row[0]) for row in rows])
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return [{
+            "id": row[0],
+            "url": row[1],
+            "quality": row[2],
+            "format_type": row[3],
+            "folder": row[4],
+            "fast_remux": bool(row[5]),
+            "format_id": row[6],
+            "partial_files": json.loads(row[7] or "[]"),
+            "downloaded_bytes": row[8],
+            "last_error": row[9],
+        } for row in rows]
+
+    def close(self):
+        # Encerramento normal: os jobs ficam livres para o próximo processo sem esperar a reserva expirar
+        self._stop.set()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("UPDATE jobs SET owner = NULL, lease_until = NULL WHERE owner = ?", (self.owner,))
+            self._conn.close()
@@ -0,0 +1,204 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionProgressBar
+
+from jobs import PROGRESS_INTERVAL, DownloadJob, formatar_bytes, formatar_tempo
+
+# Linhas mantidas no histórico da tabela; as mais antigas já encerradas saem primeiro
+MAX_TABLE_ROWS = 10000
+# Linhas encerradas removidas de uma vez quando o histórico passa do limite
+TABLE_PRUNE_BATCH = 500
+# Linhas separadas por até tantas outras sem mudança entram no mesmo dataChanged
+RANGE_GAP = 8
+
+STATE_LABELS = {
+    DownloadJob.QUEUED: "Na fila",
+    DownloadJob.DOWNLOADING: "Baixando",
+    DownloadJob.PROCESSING_QUEUED: "Aguardando processamento",
+    DownloadJob.PROCESSING: "Processando",
+    DownloadJob.FINISHED: "Concluído",
+    DownloadJob.SKIPPED: "Já baixado",
+    DownloadJob.ERROR: "Erro",
+    DownloadJob.CANCELLED: "Cancelado",
+}
+
+# Estados que mudam sozinhos, sem evento para a interface: a linha é relida a cada atualização
+LIVE_STATES = (DownloadJob.DOWNLOADING, DownloadJob.PROCESSING_QUEUED, DownloadJob.PROCESSING)
+
+# A view chama data() milhares de vezes por quadro; o nome abreviado (Qt.DisplayRole) custa microssegundos a cada acesso
+DISPLAY_ROLE = Qt.ItemDataRole.DisplayRole
+TOOLTIP_ROLE = Qt.ItemDataRole.ToolTipRole
+FOREGROUND_ROLE = Qt.ItemDataRole.ForegroundRole
+PROGRESS_ROLE = Qt.ItemDataRole.UserRole
+HANDLED_ROLES = frozenset((DISPLAY_ROLE, TOOLTIP_ROLE, FOREGROUND_ROLE, PROGRESS_ROLE))
+ERROR_COLOR = QColor(Qt.GlobalColor.red)
+
+
+def percentual_do_job(job):
+    batch = job.playlist
+    if batch is not None and job.state not in DownloadJob.ENDED:
+        total = max(batch.total or 0, batch.discovered)
+        return 100.0 * batch.done / total if total else 0.0
+    return job.percent
+
+
+def agrupar_linhas(rows):
+    # Linhas ordenadas viram intervalos contínuos; lacunas pequenas são absorvidas para emitir menos sinais
+    ranges = []
+    for row in rows:
+        if ranges and row - ranges[-1][1] <= RANGE_GAP + 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return ranges
+
+
+class JobTableModel(QAbstractTableModel):
+    COLUMNS = ("Título", "Estado", "Progresso", "Velocidade", "Restante", "Detalhes")
+    TITLE_COLUMN, STATE_COLUMN, PROGRESS_COLUMN, SPEED_COLUMN, ETA_COLUMN, DETAILS_COLUMN = range(6)
+
+    def __init__(self, parent=None, max_rows=MAX_TABLE_ROWS):
+        super().__init__(parent)
+        self.max_rows = max_rows
+        self._jobs = []
+        # Posição absoluta de cada job; linhas removidas do início só avançam o deslocamento
+        self._positions = {}
+        self._offset = 0
+        self._new = []
+        self._dirty = set()
+        self._live = set()
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(PROGRESS_INTERVAL * 1000))
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def add_job(self, job):
+        # A linha só é inserida na próxima atualização, junto com as demais que chegarem até lá
+        if job.id in self._positions:
+            self._dirty.add(job.id)
+            return
+        self._positions[job.id] = None
+        self._new.append(job)
+
+    def mark(self, job_ids):
+        self._dirty.update(job_ids)
+
+    def job_at(self, row):
+        return self._jobs[row] if 0 <= row < len(self._jobs) else None
+
+    def flush(self):
+        # Executado na thread da interface: insere as linhas novas e avisa a view em poucos intervalos
+        if self._new:
+            first = len(self._jobs)
+            self.beginInsertRows(QModelIndex(), first, first + len(self._new) - 1)
+            for job in self._new:
+                self._positions[job.id] = self._offset + len(self._jobs)
+                self._jobs.append(job)
+                if job.state not in DownloadJob.ENDED:
+                    self._live.add(job.id)
+            self._new = []
+            self.endInsertRows()
+
+        changed = self._dirty | self._live
+        self._dirty = set()
+        rows = []
+        for job_id in changed:
+            position = self._positions.get(job_id)
+            if position is None:
+                continue
+            job = self._jobs[position - self._offset]
+            if job.state in LIVE_STATES:
+                self._live.add(job_id)
+            else:
+                self._live.discard(job_id)
+            rows.append(position - self._offset)
+
+        last_column = len(self.COLUMNS) - 1
+        for first, last in agrupar_linhas(sorted(rows)):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_column))
+
+        if len(self._jobs) > self.max_rows + TABLE_PRUNE_BATCH:
+            self._prune()
+
+    def _prune(self):
+        # Só sai do início o trecho já encerrado; um job antigo ainda na fila segura o restante
+        count = 0
+        limit = len(self._jobs) - self.max_rows
+        while count < limit and self._jobs[count].state in DownloadJob.ENDED:
+            count += 1
+        if not count:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        for job in self._jobs[:count]:
+            self._positions.pop(job.id, None)
+            self._live.discard(job.id)
+        del self._jobs[:count]
+        self._offset += count
+        self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._jobs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=DISPLAY_ROLE):
+        if role == DISPLAY_ROLE and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=DISPLAY_ROLE):
+        if role not in HANDLED_ROLES or not index.isValid():
+            return None
+        job = self._jobs[index.row()]
+        column = index.column()
+
+        if role == DISPLAY_ROLE:
+            if column == self.TITLE_COLUMN:
+                return job.title or job.url
+            if column == self.STATE_COLUMN:
+                return STATE_LABELS.get(job.state, job.state)
+            if column == self.PROGRESS_COLUMN:
+                batch = job.playlist
+                if batch is not None:
+                    return f"{batch.done}/{max(batch.total or 0, batch.discovered)}"
+                return f"{percentual_do_job(job):.0f}%"
+            if column == self.SPEED_COLUMN:
+                if job.state != DownloadJob.DOWNLOADING:
+                    return ""
+                speed = job.playlist.throughput() if job.playlist is not None else job.speed
+                return f"{formatar_bytes(speed)}/s" if speed else "--"
+            if column == self.ETA_COLUMN:
+                return formatar_tempo(job.eta) if job.state == DownloadJob.DOWNLOADING else ""
+            if column == self.DETAILS_COLUMN:
+                return job.error if job.state == DownloadJob.ERROR else job.info
+        elif role == PROGRESS_ROLE and column == self.PROGRESS_COLUMN:
+            return percentual_do_job(job)
+        elif role == TOOLTIP_ROLE:
+            if column == self.TITLE_COLUMN:
+                return f"{job.url}\nPasta: {job.folder}\nFormato: {job.format_type} | Qualidade: {job.quality}"
+            if column == self.DETAILS_COLUMN and job.error:
+                return job.error
+        elif role == FOREGROUND_ROLE and job.state == DownloadJob.ERROR:
+            return ERROR_COLOR
+        return None
+
+
+class ProgressDelegate(QStyledItemDelegate):
+    # Desenha a barra direto na célula: nenhum widget é criado por linha
+    def paint(self, painter, option, index):
+        percent = index.data(PROGRESS_ROLE)
+        if percent is None:
+            super().paint(painter, option, index)
+            return
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(2, 2, -2, -2)
+        bar.state = option.state
+        bar.minimum = 0
+        bar.maximum = 100
+        bar.progress = int(percent)
+        bar.text = index.data(DISPLAY_ROLE)
+        bar.textVisible = True
+        bar.textAlignment = Qt.AlignmentFlag.AlignCenter
+        QApplication.style().drawControl(QStyle.ControlElement.CE_ProgressBar, bar, painter)
@@ -0,0 +1,209 @@
+import os
+import time
+import itertools
+from threading import Lock
+
+# Sem yt-dlp: a janela importa este módulo antes de aparecer, e o motor de download só depois
+QUALITIES = ["Alta", "Média", "Baixa"]
+FORMATS = ["mp4", "mp3"]
+
+DEFAULT_WORKERS = os.cpu_count() or 4
+
+# Intervalo mínimo entre amostras de progresso de um job e entre atualizações da interface (10 Hz)
+PROGRESS_INTERVAL = 0.1
+
+
+def formatar_bytes(num_bytes):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TiB"
+
+
+def formatar_tempo(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class DownloadJob:
+    # Milhares de jobs podem estar na fila ou na lista de encerrados ao mesmo tempo
+    __slots__ = ('id', 'url', 'quality', 'format_type', 'folder', 'state', 'percent', 'speed', 'eta', 'info',
+                 'last_progress', 'current_bytes', 'downloaded_bytes', 'fast_remux', 'batch', 'playlist', 'title',
+                 'error', 'cancelled', 'merge_mode', 'phases', '_phase_started', 'created_at', 'finished_at',
+                 'store_id', 'format_id', 'partial_files', 'attempts', 'last_persist')
+
+    QUEUED = "queued"
+    DOWNLOADING = "downloading"
+    PROCESSING_QUEUED = "processing_queued"
+    PROCESSING = "processing"
+    FINISHED = "finished"
+    SKIPPED = "skipped"
+    ERROR = "error"
+    CANCELLED = "cancelled"
+    # Estados em que o job não muda mais
+    ENDED = (FINISHED, SKIPPED, ERROR, CANCELLED)
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, quality, format_type, folder, fast_remux=True, batch=None):
+        self.id = next(DownloadJob._ids)
+        self.url = url
+        self.quality = quality
+        self.format_type = format_type
+        self.folder = folder
+        self.state = DownloadJob.QUEUED
+        self.percent = 0.0
+        self.speed = None
+        self.eta = None
+        self.info = ""
+        self.last_progress = 0.0
+        self.current_bytes = 0
+        self.downloaded_bytes = 0
+        self.fast_remux = fast_remux
+        self.batch = batch
+        self.playlist = None
+        self.title = None
+        self.error = None
+        self.cancelled = False
+        self.merge_mode = None
+        # Tempo acumulado por fase (fila, extração, download de cada stream, mesclagem...), em segundos
+        self.phases = {}
+        self._phase_started = {}
+        self.created_at = time.time()
+        self.finished_at = None
+        # Estado salvo nos jobs pendentes para retomar o download depois de uma falha ou reinício
+        self.store_id = None
+        self.format_id = None
+        self.partial_files = []
+        self.attempts = 0
+        self.last_persist = 0.0
+
+    @property
+    def preset(self):
+        return f"{self.format_type}-{self.quality}"
+
+    def start_phase(self, name):
+        self._phase_started.setdefault(name, time.monotonic())
+
+    def end_phase(self, name):
+        started = self._phase_started.pop(name, None)
+        if started is not None:
+            self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - started
+
+    def finish_timing(self):
+        for name in list(self._phase_started):
+            self.end_phase(name)
+        self.finished_at = time.time()
+
+
+class DownloadBatch:
+    __slots__ = ('job', 'title', 'total', 'discovered', 'finished', 'skipped', 'failed', 'cancelled', 'delegated',
+                 'bytes', 'expanding', 'started', '_lock')
+
+    def __init__(self, job, title, total=None):
+        self.job = job
+        self.title = title
+        self.total = total
+        self.discovered = 0
+        self.finished = 0
+        self.skipped = 0
+        self.failed = 0
+        self.cancelled = 0
+        # Itens entregues a outra fila (modo worker) em vez de baixados aqui
+        self.delegated = 0
+        self.bytes = 0
+        self.expanding = True
+        self.started = time.monotonic()
+        self._lock = Lock()
+
+    @property
+    def done(self):
+        return self.finished + self.skipped + self.failed + self.cancelled + self.delegated
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+    def throughput(self):
+        elapsed = time.monotonic() - self.started
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+
+def descrever_progresso(job):
+    if job.info:
+        return job.info
+    speed = f"{formatar_bytes(job.speed)}/s" if job.speed else "--"
+    return f"Velocidade: {speed} | Tempo restante: {formatar_tempo(job.eta)}"
+
+
+class DownloadListener:
+    # Chamados a partir das threads de download; implementações devem ser rápidas
+    def job_started(self, job):
+        pass
+
+    def job_progress(self, job):
+        pass
+
+    def job_finished(self, job):
+        pass
+
+    def job_failed(self, job, error):
+        pass
+
+    def job_cancelled(self, job):
+        pass
+
+
+class ListenerGroup(DownloadListener):
+    # Repassa os eventos da fila para vários clientes (interface, API local...)
+    def __init__(self, *listeners):
+        self._listeners = list(listeners)
+        self._lock = Lock()
+
+    def add(self, listener):
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+
+    def remove(self, listener):
+        with self._lock:
+            self._listeners = [item for item in self._listeners if item is not listener]
+
+    def job_started(self, job):
+        for listener in self._listeners:
+            listener.job_started(job)
+
+    def job_progress(self, job):
+        for listener in self._listeners:
+            listener.job_progress(job)
+
+    def job_finished(self, job):
+        for listener in self._listeners:
+            listener.job_finished(job)
+
+    def job_failed(self, job, error):
+        for listener in self._listeners:
+            listener.job_failed(job, error)
+
+    def job_cancelled(self, job):
+        for listener in self._listeners:
+            listener.job_cancelled(job)
+
+
+class ProgressCoalescer:
+    def __init__(self):
+        # Jobs com progresso novo desde a última coleta
+        self._pending = {}
+        self._lock = Lock()
+
+    def mark(self, job):
+        with self._lock:
+            self._pending[job.id] = job
+
+    def collect(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return list(pending.values())
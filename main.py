@@ -1,27 +1,31 @@
 import sys
 import os
+import argparse
+import importlib
 import traceback
-import urllib.request
-import zipfile
 import logging
 from threading import Thread
-from datetime import datetime
 
-log_dir = os.path.join(os.path.expanduser("~"), "YouLoader_logs")
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
-logging.basicConfig(filename=log_file, level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+from startup_profile import StartupProfile
+
+# Criado antes dos demais imports para o --profile-startup medir também o PySide6
+STARTUP = StartupProfile()
+
+from app_logging import configurar_logging
+
+# Definido em main(): importar este módulo não cria pastas nem arquivos de log
+log_file = None
 
 
 def log_uncaught_exceptions(exctype, value, tb):
     logging.critical("Erro não capturado:", exc_info=(exctype, value, tb))
     traceback.print_exception(exctype, value, tb)
-    with open(log_file, "a") as f:
-        f.write("\n" + "=" * 50 + "\n")
-        f.write(f"ERRO FATAL: {exctype.__name__}: {value}\n")
-        f.write("=" * 50 + "\n")
-        traceback.print_exception(exctype, value, tb, file=f)
+    if log_file:
+        with open(log_file, "a") as f:
+            f.write("\n" + "=" * 50 + "\n")
+            f.write(f"ERRO FATAL: {exctype.__name__}: {value}\n")
+            f.write("=" * 50 + "\n")
+            traceback.print_exception(exctype, value, tb, file=f)
 
     from PySide6.QtWidgets import QMessageBox, QApplication
     if QApplication.instance():
@@ -34,14 +38,22 @@ def log_uncaught_exceptions(exctype, value, tb):
 
 sys.excepthook = log_uncaught_exceptions
 
+# Só o necessário para desenhar a janela; o yt-dlp e o FFmpeg são carregados depois que ela aparece
 try:
-    from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
-                                   QHBoxLayout, QLabel, QLineEdit, QComboBox,
-                                   QPushButton, QFileDialog, QMessageBox, QProgressBar)
-    from PySide6.QtCore import Qt, QStandardPaths, Signal, QObject
-    from PySide6.QtGui import QIcon, QPixmap
-    import yt_dlp
+    with STARTUP.phase("import PySide6"):
+        from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
+                                       QHBoxLayout, QLabel, QLineEdit, QComboBox,
+                                       QPushButton, QFileDialog, QMessageBox, QProgressBar,
+                                       QSpinBox, QCheckBox, QDialog, QPlainTextEdit, QTableView, QHeaderView,
+                                       QAbstractItemView, QSystemTrayIcon)
+        from PySide6.QtCore import Qt, QStandardPaths, Signal, QObject, QTimer
+        from PySide6.QtGui import QIcon, QPixmap
+    with STARTUP.phase("import interface"):
+        from jobs import (QUALITIES, FORMATS, DEFAULT_WORKERS, PROGRESS_INTERVAL, DownloadJob, DownloadListener,
+                          ListenerGroup, ProgressCoalescer, descrever_progresso, formatar_bytes)
+        from job_table import JobTableModel, ProgressDelegate
 except ImportError as e:
+    log_file = configurar_logging()
     logging.critical(f"Erro ao importar módulos: {e}")
     try:
         import tkinter as tk
@@ -56,6 +68,10 @@ except ImportError as e:
     sys.exit(1)
 
 
+# Prazo para começar a carregar o mecanismo de download se a janela ainda não tiver sido pintada
+ENGINE_LOAD_FALLBACK_MS = 2000
+
+
 def resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
@@ -67,214 +83,142 @@ def resource_path(relative_path):
     return result
 
 
-def verificar_ffmpeg():
-    try:
-        import subprocess
-        import shutil
-
-        # Primeiro tenta encontrar o FFmpeg no PATH do sistema
-        ffmpeg_path = shutil.which('ffmpeg')
-        if ffmpeg_path:
-            logging.info(f"FFmpeg encontrado no sistema em: {ffmpeg_path}")
-            return True
-
-        # Se não encontrou no PATH, tenta executar diretamente
-        result = subprocess.run(["ffmpeg", "-version"],
-                              stdout=subprocess.PIPE,
-                              stderr=subprocess.PIPE,
-                              text=True,
-                              shell=True)
-        
-        if result.returncode == 0:
-            logging.info("FFmpeg encontrado no sistema")
-            return True
-        else:
-            logging.warning("FFmpeg não encontrado no sistema, verificando pasta local")
-            return False
-    except Exception as e:
-        logging.warning(f"Erro ao verificar FFmpeg no sistema: {e}")
-        return False
+class DownloadProgress(QObject, DownloadListener):
+    job_started_signal = Signal(object)
+    progress_update = Signal(list)
+    download_complete = Signal(object)
+    download_error = Signal(object, str)
+    download_cancelled = Signal(object)
+    notice = Signal(str, str, str)
 
+    def __init__(self):
+        super().__init__()
+        self._coalescer = ProgressCoalescer()
 
-def verificar_ffmpeg_local(destino="ffmpeg"):
-    if getattr(sys, 'frozen', False):
-        base_path = os.path.dirname(sys.executable)
-    else:
-        base_path = os.path.abspath(".")
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(PROGRESS_INTERVAL * 1000))
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
 
-    ffmpeg_exe = os.path.join(base_path, destino, "bin", "ffmpeg.exe")
+    # Chamados pelas threads do DownloadQueue; os sinais levam os eventos para a thread da interface
+    def job_started(self, job):
+        self.job_started_signal.emit(job)
 
-    if os.path.exists(ffmpeg_exe):
-        logging.info(f"FFmpeg encontrado localmente em: {ffmpeg_exe}")
-        return True
-    else:
-        logging.warning(f"FFmpeg não encontrado localmente em: {ffmpeg_exe}")
-        return False
+    def job_progress(self, job):
+        self._coalescer.mark(job)
 
+    def job_finished(self, job):
+        self.download_complete.emit(job)
 
-def baixar_ffmpeg(destino="ffmpeg"):
-    try:
-        logging.info("Verificando se o FFmpeg já está disponível")
-
-        # Primeiro verifica se o FFmpeg já está instalado no sistema
-        if verificar_ffmpeg():
-            logging.info("FFmpeg já disponível no sistema, não será baixado")
-            return True
-
-        # Depois verifica se já existe localmente
-        if verificar_ffmpeg_local(destino):
-            logging.info("FFmpeg já existe localmente, configurando PATH")
-            configurar_ffmpeg()
-            return True
-
-        # Se não encontrou, prepara para download
-        if getattr(sys, 'frozen', False):
-            base_path = os.path.dirname(sys.executable)
-        else:
-            base_path = os.path.abspath(".")
-
-        destino_completo = os.path.join(base_path, destino)
-        os.makedirs(destino_completo, exist_ok=True)
-        zip_path = os.path.join(destino_completo, "ffmpeg.zip")
-
-        # Informa ao usuário sobre o download
-        QMessageBox.information(None, "Download do FFmpeg",
-                              "O FFmpeg não foi encontrado no sistema. Iniciando o download...\n" 
-                              "Este processo será realizado apenas uma vez.")
+    def job_failed(self, job, error):
+        self.download_error.emit(job, error)
 
-        try:
-            logging.info("Baixando FFmpeg...")
-            url = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
-            urllib.request.urlretrieve(url, zip_path)
-            logging.info("Download do FFmpeg concluído")
-
-            logging.info("Extraindo arquivos FFmpeg...")
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(destino_completo)
-            logging.info("Extração concluída")
-
-            # Remove o arquivo zip após extração
-            if os.path.exists(zip_path):
-                os.remove(zip_path)
-                logging.info("Arquivo zip removido")
-
-            # Procura e move a pasta bin para o local correto
-            bin_encontrado = False
-            for root, dirs, _ in os.walk(destino_completo):
-                for d in dirs:
-                    if "bin" in d:
-                        src = os.path.join(root, d)
-                        dest_bin = os.path.join(destino_completo, "bin")
-                        if src != dest_bin and not os.path.exists(dest_bin):
-                            logging.info(f"Movendo pasta bin de {src} para {dest_bin}")
-                            os.rename(src, dest_bin)
-                            bin_encontrado = True
-                            break
-                if bin_encontrado:
-                    break
-
-            # Verifica se a instalação foi bem-sucedida
-            if verificar_ffmpeg_local(destino):
-                logging.info("FFmpeg instalado com sucesso")
-                configurar_ffmpeg()
-                return True
-            else:
-                raise Exception("Falha ao verificar instalação do FFmpeg")
+    def job_cancelled(self, job):
+        self.download_cancelled.emit(job)
 
-        except Exception as download_error:
-            logging.error(f"Erro durante download/extração do FFmpeg: {download_error}")
-            if os.path.exists(zip_path):
-                os.remove(zip_path)
-            raise download_error
+    def flush(self):
+        # Executado na thread da interface: envia um único lote com todos os jobs alterados
+        jobs = self._coalescer.collect()
+        if jobs:
+            self.progress_update.emit([(job.id, job.percent, descrever_progresso(job)) for job in jobs])
 
-    except Exception as e:
-        logging.error(f"Erro ao baixar/configurar FFmpeg: {e}")
-        logging.exception("Detalhes do erro:")
-        QMessageBox.warning(None, "Erro FFmpeg",
-                          "Ocorreu um erro ao instalar o FFmpeg.\n" 
-                          "O aplicativo tentará continuar, mas os downloads de áudio podem falhar.\n\n" 
-                          f"Erro: {str(e)}")
-        return False
 
+class StatsDialog(QDialog):
+    def __init__(self, metrics, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.setWindowTitle("Estatísticas")
+        self.resize(420, 320)
 
-def configurar_ffmpeg():
-    try:
-        logging.info("Configurando caminhos do FFmpeg")
-        if getattr(sys, 'frozen', False):
-            base_path = os.path.dirname(sys.executable)
-            logging.info(f"Executando a partir do executável congelado: {base_path}")
-        else:
-            base_path = os.path.abspath(".")
-            logging.info(f"Executando a partir do script: {base_path}")
-
-        ffmpeg_path = os.path.join(base_path, "ffmpeg", "bin")
-        logging.info(f"Caminho do FFmpeg: {ffmpeg_path}")
-
-        if not os.path.exists(ffmpeg_path):
-            logging.warning(f"Pasta FFmpeg não encontrada em: {ffmpeg_path}")
-
-        os.environ["PATH"] += os.pathsep + ffmpeg_path
-
-        logging.debug(f"PATH atual: {os.environ['PATH']}")
-    except Exception as e:
-        logging.error(f"Erro ao configurar caminhos do FFmpeg: {e}")
-        logging.exception("Detalhes do erro:")
+        layout = QVBoxLayout(self)
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        layout.addWidget(self.text)
+        layout.addWidget(QLabel(f"Exportado em: {metrics.directory}"))
 
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self.refresh)
+        self.refresh()
 
-class DownloadProgress(QObject):
-    progress_update = Signal(float, str)
-    download_complete = Signal()
-    download_error = Signal(str)
+    def showEvent(self, event):
+        self._timer.start()
+        super().showEvent(event)
 
-    def __init__(self):
-        super().__init__()
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
 
-    def progress_hook(self, d):
+    def refresh(self):
         try:
-            if d['status'] == 'downloading':
-                p = d.get('_percent_str', '0%')
-                p = p.replace('%', '').strip()
-                try:
-                    percent = float(p)
-                except ValueError:
-                    percent = 0
-
-                speed = d.get('_speed_str', '')
-                eta = d.get('_eta_str', '')
-                info = f"Velocidade: {speed} | Tempo restante: {eta}"
-
-                self.progress_update.emit(percent, info)
-
-            elif d['status'] == 'finished':
-                self.download_complete.emit()
-
-            elif d['status'] == 'error':
-                self.download_error.emit(str(d.get('error', 'Erro desconhecido')))
+            snapshot = self.metrics.snapshot()
+            linhas = ["Jobs encerrados:"]
+            linhas += [f"  {state}: {count}" for state, count in sorted(snapshot["states"].items())]
+            linhas.append("")
+            linhas.append("Tempo por fase (média | total):")
+            for phase, (seconds, count) in sorted(snapshot["phases"].items(), key=lambda item: -item[1][0]):
+                linhas.append(f"  {phase}: {seconds / count:.2f}s | {seconds:.1f}s em {count} jobs")
+            if snapshot["merge_modes"]:
+                linhas.append("")
+                linhas.append("Mesclagens: " + ", ".join(f"{mode}={count}"
+                                                         for mode, count in sorted(snapshot["merge_modes"].items())))
+            linhas.append("")
+            linhas.append(f"Total baixado: {formatar_bytes(snapshot['bytes'])} | "
+                          f"Vazão média: {formatar_bytes(snapshot['throughput'])}/s")
+            self.text.setPlainText("\n".join(linhas))
         except Exception as e:
-            logging.error(f"Erro no hook de progresso: {e}")
-            self.download_error.emit(f"Erro no progresso: {e}")
+            logging.error(f"Erro ao atualizar estatísticas: {e}")
 
 
 class YouLoader(QMainWindow):
-    def __init__(self):
+    # Emitidos pela thread que carrega o mecanismo de download
+    engine_loaded = Signal(object)
+    engine_failed = Signal(str)
+
+    def __init__(self, startup=STARTUP, resume=True):
         super().__init__()
         try:
             logging.info("Iniciando a interface do YouTube Downloader")
+            self.startup = startup
+            # Desligado no --profile-startup: a medição não retoma downloads nem instala o FFmpeg
+            self.resume = resume
             self.setWindowTitle("YouLoader")
-            self.setFixedSize(500, 400)
+            self.resize(900, 780)
+            self.setMinimumSize(640, 640)
 
             self.default_download_folder = QStandardPaths.writableLocation(QStandardPaths.DownloadLocation)
             logging.info(f"Pasta de downloads padrão: {self.default_download_folder}")
 
             self.setup_icon()
             self.setup_logo()
+            self.setup_tray()
 
             self.progress_manager = DownloadProgress()
+            self.progress_manager.job_started_signal.connect(self.job_started)
             self.progress_manager.progress_update.connect(self.update_progress)
             self.progress_manager.download_complete.connect(self.download_finished)
             self.progress_manager.download_error.connect(self.download_error)
+            self.progress_manager.download_cancelled.connect(self.download_cancelled)
+            self.progress_manager.notice.connect(self.show_notice)
+
+            # Criados por load_engine depois da primeira pintura; até lá os botões que dependem deles ficam desativados
+            self.ffmpeg_bootstrap = None
+            self.download_archive = None
+            self.bandwidth = None
+            self.metrics = None
+            self.download_queue = None
+            self.engine_thread = None
+            self.stats_dialog = None
+            # A API local, quando ativada, recebe os eventos da mesma fila que a janela
+            self.listeners = ListenerGroup(self.progress_manager)
+            self.api_server = None
+            self.api_broadcaster = None
+            # Jobs enviados pela janela; os que chegam pela API ou são retomados só aparecem na barra de status
+            self.own_jobs = set()
 
             self.init_ui()
+            self.engine_loaded.connect(self.engine_ready)
+            self.engine_failed.connect(self.engine_error)
             logging.info("Interface inicializada com sucesso")
         except Exception as e:
             logging.critical(f"Erro ao inicializar a interface: {e}")
@@ -310,6 +254,20 @@ class YouLoader(QMainWindow):
             self.logo_pixmap = QPixmap(64, 60)
             self.logo_pixmap.fill(Qt.red)
 
+    def setup_tray(self):
+        # Avisos de conclusão aparecem como notificação do sistema quando a janela não está em foco
+        self.tray_icon = None
+        try:
+            if QSystemTrayIcon.isSystemTrayAvailable():
+                self.tray_icon = QSystemTrayIcon(self.windowIcon(), self)
+                self.tray_icon.setToolTip("YouLoader")
+                self.tray_icon.show()
+            else:
+                logging.info("Bandeja do sistema indisponível; avisos só na barra de status")
+        except Exception as e:
+            logging.error(f"Erro ao configurar ícone da bandeja: {e}")
+            self.tray_icon = None
+
     def init_ui(self):
         try:
             central_widget = QWidget()
@@ -332,23 +290,52 @@ class YouLoader(QMainWindow):
             main_layout.addLayout(logo_layout)
             main_layout.addSpacing(10)
 
-            url_label = QLabel("Link do vídeo do YouTube:")
+            url_label = QLabel("Link do vídeo, playlist ou canal do YouTube:")
             self.url_input = QLineEdit()
             main_layout.addWidget(url_label)
             main_layout.addWidget(self.url_input)
 
             quality_label = QLabel("Qualidade do vídeo:")
             self.quality_combo = QComboBox()
-            self.quality_combo.addItems(["Alta", "Média", "Baixa"])
+            self.quality_combo.addItems(QUALITIES)
             main_layout.addWidget(quality_label)
             main_layout.addWidget(self.quality_combo)
 
             format_label = QLabel("Formato:")
             self.format_combo = QComboBox()
-            self.format_combo.addItems(["mp4", "mp3"])
+            self.format_combo.addItems(FORMATS)
             main_layout.addWidget(format_label)
             main_layout.addWidget(self.format_combo)
 
+            self.fast_remux_check = QCheckBox("Remux rápido (evita recodificar o vídeo quando possível)")
+            self.fast_remux_check.setChecked(True)
+            main_layout.addWidget(self.fast_remux_check)
+
+            workers_label = QLabel("Downloads simultâneos:")
+            self.workers_spin = QSpinBox()
+            self.workers_spin.setRange(1, 32)
+            self.workers_spin.setValue(DEFAULT_WORKERS)
+            self.workers_spin.valueChanged.connect(self.change_worker_count)
+            main_layout.addWidget(workers_label)
+            main_layout.addWidget(self.workers_spin)
+
+            bandwidth_layout = QHBoxLayout()
+            self.rate_spin = QSpinBox()
+            self.rate_spin.setRange(0, 1000000)
+            self.rate_spin.setSingleStep(256)
+            self.rate_spin.setSuffix(" KB/s")
+            self.rate_spin.setSpecialValueText("Sem limite")
+            self.rate_spin.valueChanged.connect(self.change_rate_limit)
+            self.per_host_spin = QSpinBox()
+            self.per_host_spin.setRange(0, 64)
+            self.per_host_spin.setSpecialValueText("Sem limite")
+            self.per_host_spin.valueChanged.connect(self.change_per_host_limit)
+            bandwidth_layout.addWidget(QLabel("Limite de banda:"))
+            bandwidth_layout.addWidget(self.rate_spin)
+            bandwidth_layout.addWidget(QLabel("Conexões por servidor:"))
+            bandwidth_layout.addWidget(self.per_host_spin)
+            main_layout.addLayout(bandwidth_layout)
+
             folder_label = QLabel("Pasta de destino:")
             main_layout.addWidget(folder_label)
 
@@ -361,10 +348,51 @@ class YouLoader(QMainWindow):
             folder_layout.addWidget(self.folder_btn)
             main_layout.addLayout(folder_layout)
 
-            self.download_btn = QPushButton("Baixar")
+            self.api_check = QCheckBox("Aceitar jobs pela API local")
+            self.api_check.setEnabled(False)
+            self.api_check.toggled.connect(self.toggle_api)
+            main_layout.addWidget(self.api_check)
+
+            self.download_btn = QPushButton("Carregando...")
+            self.download_btn.setEnabled(False)
             self.download_btn.setStyleSheet("background-color: #4CAF50; color: white; padding: 8px;")
             self.download_btn.clicked.connect(self.download)
-            main_layout.addWidget(self.download_btn, alignment=Qt.AlignCenter)
+            self.stats_btn = QPushButton("Estatísticas")
+            self.stats_btn.setEnabled(False)
+            self.stats_btn.clicked.connect(self.show_stats)
+            self.cancel_btn = QPushButton("Cancelar selecionados")
+            self.cancel_btn.clicked.connect(self.cancel_selected)
+            buttons_layout = QHBoxLayout()
+            buttons_layout.addStretch()
+            buttons_layout.addWidget(self.download_btn)
+            buttons_layout.addWidget(self.stats_btn)
+            buttons_layout.addWidget(self.cancel_btn)
+            buttons_layout.addStretch()
+            main_layout.addLayout(buttons_layout)
+
+            # Só as linhas visíveis são desenhadas; o modelo avisa a view em lotes periódicos
+            self.job_model = JobTableModel(self)
+            self.job_table = QTableView()
+            self.job_table.setModel(self.job_model)
+            self.job_table.setItemDelegateForColumn(JobTableModel.PROGRESS_COLUMN, ProgressDelegate(self.job_table))
+            self.job_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+            self.job_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            self.job_table.setAlternatingRowColors(True)
+            self.job_table.setWordWrap(False)
+            # Altura fixa e larguras sem ResizeToContents: a view não precisa medir as 10 mil linhas
+            vertical_header = self.job_table.verticalHeader()
+            vertical_header.setVisible(False)
+            vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+            vertical_header.setDefaultSectionSize(22)
+            header = self.job_table.horizontalHeader()
+            header.setSectionResizeMode(QHeaderView.Interactive)
+            header.setSectionResizeMode(JobTableModel.TITLE_COLUMN, QHeaderView.Stretch)
+            header.resizeSection(JobTableModel.STATE_COLUMN, 150)
+            header.resizeSection(JobTableModel.PROGRESS_COLUMN, 110)
+            header.resizeSection(JobTableModel.SPEED_COLUMN, 100)
+            header.resizeSection(JobTableModel.ETA_COLUMN, 80)
+            header.resizeSection(JobTableModel.DETAILS_COLUMN, 200)
+            main_layout.addWidget(self.job_table, 1)
 
             progress_layout = QVBoxLayout()
 
@@ -387,7 +415,7 @@ class YouLoader(QMainWindow):
                 }
             """)
 
-            self.status_label = QLabel("Pronto para download")
+            self.status_label = QLabel("Carregando o mecanismo de download...")
             self.status_label.setAlignment(Qt.AlignCenter)
 
             progress_layout.addWidget(self.progress_bar)
@@ -395,14 +423,95 @@ class YouLoader(QMainWindow):
 
             main_layout.addLayout(progress_layout)
 
-            main_layout.addStretch()
-
             logging.info("UI configurada com sucesso")
         except Exception as e:
             logging.error(f"Erro ao inicializar UI: {e}")
             logging.exception("Detalhes do erro:")
             raise
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.engine_thread is None:
+            logging.info(f"Janela exibida {self.startup.elapsed() * 1000:.0f} ms após o início")
+            self.startup.milestone("primeira pintura")
+            self.load_engine()
+
+    def load_engine(self):
+        # Chamado na primeira pintura ou, se a janela abrir minimizada, pelo timer de main()
+        if self.engine_thread is not None:
+            return
+        self.engine_thread = Thread(target=self._load_engine, name="carregar-motor", daemon=True)
+        self.engine_thread.start()
+
+    def _load_engine(self):
+        # Fora da thread da interface: só o yt-dlp importa centenas de módulos de extratores
+        try:
+            # Medido à parte: é a maior parte do tempo de carga
+            with self.startup.phase("import yt_dlp"):
+                importlib.import_module("yt_dlp")
+            with self.startup.phase("import engine"):
+                from engine import DownloadQueue
+            with self.startup.phase("import ffmpeg_utils, daemon e demais"):
+                from ffmpeg_utils import FFmpegBootstrap
+                from download_archive import DownloadArchive
+                from job_store import JobStore
+                from bandwidth import BandwidthScheduler, carregar_perfis
+                from metrics import MetricsRecorder
+                from output_writer import OutputWriter
+                # Já importado aqui para ativar a API local não travar a interface
+                importlib.import_module("daemon")
+            with self.startup.phase("mecanismo de download"):
+                # Verificado em segundo plano; os jobs que precisam do FFmpeg esperam por ele
+                self.ffmpeg_bootstrap = FFmpegBootstrap(notificar=self.progress_manager.notice.emit)
+                # Vídeos já baixados com o mesmo formato e qualidade são ignorados, a menos que o arquivo tenha sumido
+                self.download_archive = DownloadArchive(verify_files=True)
+                # Limite de banda compartilhado por todos os downloads; perfis de horário vêm de perfis_banda.txt
+                self.bandwidth = BandwidthScheduler(profiles=carregar_perfis())
+                self.metrics = MetricsRecorder()
+                # Parciais e mesclagens na pasta local (YOULOADER_STAGING_DIR); o destino recebe só o arquivo pronto
+                download_queue = DownloadQueue(self.listeners, ffmpeg_pronto=self.ffmpeg_bootstrap.pronto,
+                                               archive=self.download_archive, scheduler=self.bandwidth,
+                                               metrics=self.metrics, store=JobStore(), writer=OutputWriter())
+            self.engine_loaded.emit(download_queue)
+        except Exception as e:
+            logging.error(f"Erro ao carregar o mecanismo de download: {e}")
+            logging.exception("Detalhes do erro:")
+            self.engine_failed.emit(str(e))
+
+    def engine_ready(self, download_queue):
+        try:
+            from daemon import DEFAULT_PORT
+
+            self.download_queue = download_queue
+            # Valores alterados enquanto o mecanismo carregava
+            if self.workers_spin.value() != DEFAULT_WORKERS:
+                download_queue.set_worker_count(self.workers_spin.value())
+            self.bandwidth.set_rate(self.rate_spin.value() * 1024)
+            self.bandwidth.set_max_per_host(self.per_host_spin.value())
+
+            self.api_check.setText(f"Aceitar jobs pela API local (porta {DEFAULT_PORT})")
+            self.api_check.setEnabled(True)
+            self.download_btn.setText("Baixar")
+            self.download_btn.setEnabled(True)
+            self.stats_btn.setEnabled(True)
+            self.status_label.setText("Pronto para download")
+
+            if self.resume:
+                self.ffmpeg_bootstrap.iniciar()
+                self.resume_jobs()
+            self.startup.milestone("mecanismo de download pronto")
+            logging.info(f"Mecanismo de download pronto {self.startup.elapsed() * 1000:.0f} ms após o início")
+        except Exception as e:
+            logging.error(f"Erro ao ativar o mecanismo de download: {e}")
+            logging.exception("Detalhes do erro:")
+
+    def engine_error(self, error):
+        self.download_btn.setText("Indisponível")
+        self.status_label.setText("Erro ao carregar o mecanismo de download")
+        QMessageBox.critical(self, "Erro de Inicialização",
+                             f"Falha ao carregar o mecanismo de download: {error}\n"
+                             f"Consulte o log para mais detalhes: {log_file}")
+
     def choose_folder(self):
         try:
             folder = QFileDialog.getExistingDirectory(self, "Selecionar Pasta de Destino", self.default_download_folder)
@@ -413,14 +522,103 @@ class YouLoader(QMainWindow):
             logging.error(f"Erro ao selecionar pasta: {e}")
             QMessageBox.warning(self, "Erro", f"Erro ao selecionar pasta: {e}")
 
+    def show_notice(self, nivel, titulo, mensagem):
+        try:
+            if nivel == "aviso":
+                QMessageBox.warning(self, titulo, mensagem)
+            else:
+                self.statusBar().showMessage(mensagem.replace("\n", " "), 15000)
+        except Exception as e:
+            logging.error(f"Erro ao exibir aviso: {e}")
+
+    def change_worker_count(self, value):
+        try:
+            if self.download_queue is None:
+                return
+            self.download_queue.set_worker_count(value)
+        except Exception as e:
+            logging.error(f"Erro ao alterar número de downloads simultâneos: {e}")
+
+    def show_stats(self):
+        try:
+            # Não modal: os downloads continuam e o painel se atualiza enquanto está aberto
+            if self.stats_dialog is None:
+                self.stats_dialog = StatsDialog(self.metrics, self)
+            self.stats_dialog.show()
+            self.stats_dialog.raise_()
+        except Exception as e:
+            logging.error(f"Erro ao abrir estatísticas: {e}")
+
+    def change_rate_limit(self, value):
+        try:
+            if self.download_queue is None:
+                return
+            self.bandwidth.set_rate(value * 1024)
+        except Exception as e:
+            logging.error(f"Erro ao alterar limite de banda: {e}")
+
+    def change_per_host_limit(self, value):
+        try:
+            if self.download_queue is None:
+                return
+            self.bandwidth.set_max_per_host(value)
+        except Exception as e:
+            logging.error(f"Erro ao alterar limite de conexões por servidor: {e}")
+
+    def toggle_api(self, checked):
+        try:
+            from daemon import ApiServer, EventBroadcaster
+
+            if checked and self.api_server is None:
+                self.api_broadcaster = EventBroadcaster()
+                folder = self.folder_input.text().strip() or self.default_download_folder
+                self.api_server = ApiServer(self.download_queue, self.api_broadcaster, folder).iniciar()
+                self.listeners.add(self.api_broadcaster)
+                self.statusBar().showMessage(f"API local disponível em {self.api_server.url_base}, token de acesso em "
+                                             f"{self.api_server.token_file}", 15000)
+            elif not checked and self.api_server is not None:
+                self.listeners.remove(self.api_broadcaster)
+                self.api_broadcaster.close()
+                self.api_server.parar()
+                self.api_server = None
+                self.api_broadcaster = None
+                self.statusBar().showMessage("API local desativada", 15000)
+        except Exception as e:
+            logging.error(f"Erro ao alternar API local: {e}")
+            logging.exception("Detalhes do erro:")
+            self.api_server = None
+            self.api_broadcaster = None
+            self.api_check.blockSignals(True)
+            self.api_check.setChecked(False)
+            self.api_check.blockSignals(False)
+            QMessageBox.warning(self, "Aviso", f"Não foi possível iniciar a API local: {e}")
+
+    def resume_jobs(self):
+        try:
+            # Downloads interrompidos quando o programa foi fechado continuam de onde pararam
+            jobs = self.download_queue.restore_jobs()
+            for job in jobs:
+                self.download_queue.submit(job)
+                self.job_model.add_job(job)
+            if jobs:
+                self.update_summary()
+                self.statusBar().showMessage(f"{len(jobs)} downloads interrompidos foram retomados", 15000)
+        except Exception as e:
+            logging.error(f"Erro ao retomar downloads: {e}")
+            logging.exception("Detalhes do erro:")
+
     def download(self):
         try:
+            if self.download_queue is None:
+                return
             url = self.url_input.text().strip()
             quality = self.quality_combo.currentText()
             format_type = self.format_combo.currentText()
             folder = self.folder_input.text().strip()
+            fast_remux = self.fast_remux_check.isChecked()
 
-            logging.info(f"Iniciando download: URL={url}, Qualidade={quality}, Formato={format_type}, Pasta={folder}")
+            logging.info(f"Novo download: URL={url}, Qualidade={quality}, Formato={format_type}, Pasta={folder}, "
+                         f"Remux rápido={fast_remux}")
 
             if not url:
                 QMessageBox.warning(self, "Aviso", "Insira o link do vídeo.")
@@ -430,135 +628,177 @@ class YouLoader(QMainWindow):
                 folder = self.default_download_folder
                 logging.info(f"Pasta não especificada, usando padrão: {folder}")
 
-            if format_type == "mp4":
-                if quality == "Alta":
-                    format_yt = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/mp4"
-                elif quality == "Média":
-                    format_yt = "bestvideo[height<=480][ext=mp4]+bestaudio[ext=m4a]/best[height<=480][ext=mp4]/mp4"
-                else:
-                    format_yt = "worstvideo[ext=mp4]+worstaudio[ext=m4a]/worst[ext=mp4]/mp4"
-
-                ext = "mp4"
-
-                ydl_opts = {
-                    'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
-                    'format': format_yt,
-                    'progress_hooks': [self.progress_manager.progress_hook],
-                    'merge_output_format': 'mp4',
-                    'postprocessor_args': [
-                        '-c:v', 'libx264',
-                        '-c:a', 'aac',
-                    ],
-                    'verbose': True,
-                }
-
-            else:  # mp3
-                format_yt = "bestaudio/best"
-                ext = "mp3"
-
-                ydl_opts = {
-                    'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
-                    'format': format_yt,
-                    'progress_hooks': [self.progress_manager.progress_hook],
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '192',
-                    }],
-                    'verbose': True,
-                }
-
-            logging.info(f"Formato yt-dlp: {format_yt}")
-            logging.info(f"Opções yt-dlp: {ydl_opts}")
-
-            self.progress_bar.setValue(0)
-            self.status_label.setText("Iniciando download...")
-            self.download_btn.setEnabled(False)
-            self.download_btn.setText("Baixando...")
-
-            def download_thread():
-                try:
-                    logging.info(f"Thread de download iniciada para URL: {url}")
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        info = ydl.extract_info(url, download=False)
-                        logging.info(
-                            f"Informações do vídeo: Título={info.get('title')}, Formatos disponíveis={info.get('formats')}")
-                        ydl.download([url])
-                    logging.info("Download concluído com sucesso")
-                except Exception as e:
-                    logging.error(f"Erro no download: {e}")
-                    logging.exception("Detalhes do erro:")
-                    self.progress_manager.download_error.emit(str(e))
-
-            Thread(target=download_thread, daemon=True).start()
+            job = self.download_queue.submit(DownloadJob(url, quality, format_type, folder, fast_remux))
+            self.own_jobs.add(job.id)
+            self.job_model.add_job(job)
+            self.url_input.clear()
+            self.update_summary()
 
         except Exception as e:
             logging.error(f"Erro ao iniciar download: {e}")
             logging.exception("Detalhes do erro:")
             self.status_label.setText("Erro ao iniciar download")
-            self.download_btn.setEnabled(True)
-            self.download_btn.setText("Baixar")
             QMessageBox.critical(self, "Erro", f"Erro ao iniciar download: {e}")
 
-    def update_progress(self, percent, info):
+    def update_summary(self, info=""):
+        if self.download_queue is None:
+            return
+        counts = self.download_queue.counts()
+        active = self.download_queue.active_jobs()
+        if active:
+            self.progress_bar.setValue(int(sum(job.percent for job in active) / len(active)))
+
+        summary = (f"Baixando: {counts[DownloadJob.DOWNLOADING]} | Na fila: {counts[DownloadJob.QUEUED]} | "
+                   f"Processando: {counts[DownloadJob.PROCESSING]} "
+                   f"(+{counts[DownloadJob.PROCESSING_QUEUED]} aguardando)\n"
+                   f"Concluídos: {counts[DownloadJob.FINISHED]} | Ignorados: {counts[DownloadJob.SKIPPED]} | "
+                   f"Erros: {counts[DownloadJob.ERROR]} | Cancelados: {counts[DownloadJob.CANCELLED]}")
+
+        batches = self.download_queue.active_batches()
+        if batches:
+            done = sum(batch.done for batch in batches)
+            total = sum(max(batch.total or 0, batch.discovered) for batch in batches)
+            throughput = sum(batch.throughput() for batch in batches)
+            summary += (f"\nPlaylists: {len(batches)} | Itens: {done}/{total} | "
+                        f"Velocidade total: {formatar_bytes(throughput)}/s")
+        self.status_label.setText(f"{summary}\n{info}" if info else summary)
+
+    def notify(self, title, message, error=False):
+        # Não modal: a fila e a tabela continuam atualizando enquanto o aviso é exibido
+        self.statusBar().showMessage(f"{title}: {message}".replace("\n", " | "), 15000)
+        if self.tray_icon is not None and not self.isActiveWindow():
+            icon = QSystemTrayIcon.Critical if error else QSystemTrayIcon.Information
+            self.tray_icon.showMessage(title, message, icon, 10000)
+
+    def cancel_selected(self):
         try:
-            self.progress_bar.setValue(int(percent))
-            self.status_label.setText(info)
-            logging.debug(f"Progresso: {percent}% - {info}")
+            if self.download_queue is None:
+                return
+            rows = sorted({index.row() for index in self.job_table.selectionModel().selectedRows()})
+            jobs = [self.job_model.job_at(row) for row in rows]
+            cancelled = sum(1 for job in jobs if job is not None and self.download_queue.cancel(job.id))
+            if cancelled:
+                self.statusBar().showMessage(f"Cancelamento solicitado para {cancelled} downloads", 10000)
+            else:
+                self.statusBar().showMessage("Nenhum download selecionado pode ser cancelado", 10000)
+        except Exception as e:
+            logging.error(f"Erro ao cancelar downloads: {e}")
+            logging.exception("Detalhes do erro:")
+
+    def job_started(self, job):
+        try:
+            self.job_model.add_job(job)
+            self.update_summary("Iniciando download...")
+        except Exception as e:
+            logging.error(f"Erro ao atualizar status: {e}")
+
+    def update_progress(self, batch):
+        try:
+            self.job_model.mark(job_id for job_id, percent, info in batch)
+            # Exibe os detalhes do job atualizado mais recentemente
+            job_id, percent, info = batch[-1]
+            self.update_summary(info)
         except Exception as e:
             logging.error(f"Erro ao atualizar progresso: {e}")
 
-    def download_finished(self):
+    def download_finished(self, job):
         try:
-            self.progress_bar.setValue(100)
-            self.status_label.setText("Download concluído com sucesso!")
-            self.download_btn.setEnabled(True)
-            self.download_btn.setText("Baixar")
+            self.job_model.add_job(job)
+            if not self.download_queue.active_jobs():
+                self.progress_bar.setValue(100)
+            self.update_summary()
+
+            name = job.title or job.url
+            if job.id not in self.own_jobs:
+                self.statusBar().showMessage(f"Job {job.id} concluído: {name}", 15000)
+                return
+            self.own_jobs.discard(job.id)
 
-            dest_folder = self.folder_input.text() or self.default_download_folder
-            logging.info(f"Download concluído em: {dest_folder}")
+            if job.state == DownloadJob.SKIPPED:
+                self.notify("Já baixado", f"{name}\nJá foi baixado com o mesmo formato e qualidade.")
+                return
+
+            logging.info(f"[Job {job.id}] Download concluído em: {job.folder}")
 
-            QMessageBox.information(self, "Sucesso", f"Download concluído em:\n{dest_folder}")
+            message = f"{name}\nSalvo em: {job.folder}"
+            if job.playlist is not None and job.playlist.skipped:
+                message += f"\n{job.playlist.skipped} itens já baixados anteriormente foram ignorados."
+            self.notify("Download concluído", message)
         except Exception as e:
             logging.error(f"Erro ao finalizar download: {e}")
-            QMessageBox.critical(self, "Erro", f"Erro ao finalizar download: {e}")
+            self.statusBar().showMessage(f"Erro ao finalizar download: {e}", 15000)
 
-    def download_error(self, error_msg):
+    def download_error(self, job, error_msg):
         try:
-            self.progress_bar.setValue(0)
-            self.status_label.setText("Erro no download")
-            self.download_btn.setEnabled(True)
-            self.download_btn.setText("Baixar")
-
-            logging.error(f"Erro reportado no download: {error_msg}")
-            QMessageBox.critical(self, "Erro", f"Erro ao baixar vídeo:\n{error_msg}")
+            self.job_model.add_job(job)
+            if not self.download_queue.active_jobs():
+                self.progress_bar.setValue(0)
+            self.update_summary()
+
+            logging.error(f"[Job {job.id}] Erro reportado no download: {error_msg}")
+            if job.id not in self.own_jobs:
+                self.statusBar().showMessage(f"Job {job.id} com erro: {error_msg}", 15000)
+                return
+            self.own_jobs.discard(job.id)
+            self.notify("Erro no download", f"{job.title or job.url}\n{error_msg}", error=True)
         except Exception as e:
             logging.error(f"Erro ao processar falha de download: {e}")
 
+    def download_cancelled(self, job):
+        try:
+            self.job_model.add_job(job)
+            if not self.download_queue.active_jobs():
+                self.progress_bar.setValue(0)
+            self.update_summary()
+            self.own_jobs.discard(job.id)
+            self.statusBar().showMessage(f"Job {job.id} cancelado", 15000)
+        except Exception as e:
+            logging.error(f"Erro ao processar cancelamento: {e}")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="YouLoader")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="mede a inicialização até o mecanismo de download ficar pronto, "
+                             "imprime os tempos de import e de cada etapa e sai")
+    return parser
+
 
 def main():
+    global log_file
     try:
+        # Argumentos desconhecidos ficam para o Qt (-style, -platform...)
+        args, qt_args = criar_parser().parse_known_args()
+        with STARTUP.phase("logging"):
+            log_file = configurar_logging()
         logging.info("=== INICIANDO APLICATIVO ===")
         logging.info(f"Diretório atual: {os.getcwd()}")
         logging.info(f"Diretório do script: {os.path.dirname(os.path.abspath(__file__))}")
-        logging.info(f"Arquivos presentes: {os.listdir()}")
 
-        app = QApplication(sys.argv)
+        with STARTUP.phase("QApplication"):
+            app = QApplication(sys.argv[:1] + qt_args)
         logging.info("QApplication criada com sucesso")
 
-        try:
-            configurar_ffmpeg()
-            baixar_ffmpeg()
-        except Exception as e:
-            logging.error(f"Erro na configuração do FFmpeg: {e}")
-            logging.exception("Detalhes do erro:")
-
-        window = YouLoader()
+        with STARTUP.phase("janela principal"):
+            window = YouLoader(resume=not args.profile_startup)
         logging.info("Janela principal criada")
 
         window.show()
+        # Normalmente o carregamento começa na primeira pintura; isto cobre uma janela que abre minimizada
+        QTimer.singleShot(ENGINE_LOAD_FALLBACK_MS, window.load_engine)
         logging.info("Janela exibida, iniciando loop de eventos")
 
+        if args.profile_startup:
+            window.engine_loaded.connect(app.quit)
+            window.engine_failed.connect(app.quit)
+            code = app.exec()
+            relatorio = STARTUP.report()
+            logging.info(relatorio)
+            # Sem console no executável do PyInstaller: o relatório fica no log
+            if sys.stdout is not None:
+                print(relatorio)
+            sys.exit(code if window.download_queue is not None else 1)
+
         sys.exit(app.exec_())
     except Exception as e:
         logging.critical(f"ERRO FATAL NA FUNÇÃO MAIN: {e}")
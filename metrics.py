@@ -0,0 +1,132 @@
+import os
+import json
+import logging
+from threading import Lock
+
+metrics_dir = os.path.join(os.path.expanduser("~"), "YouLoader_data", "metrics")
+
+# Nomes das fases de pós-processamento a partir do pp_key() do yt-dlp
+PHASE_NAMES = {
+    'Merger': 'merge',
+    'ExtractAudio': 'extract_audio',
+    'MoveFiles': 'move_files',
+}
+
+
+def nome_da_fase(postprocessor):
+    return PHASE_NAMES.get(postprocessor, postprocessor.lower())
+
+
+def fase_agregada(phase):
+    # "download:137" e "download:140" somam na mesma série; o detalhe fica só no JSONL
+    return phase.split(":", 1)[0]
+
+
+def registro_do_job(job):
+    download_seconds = sum(seconds for phase, seconds in job.phases.items() if fase_agregada(phase) == 'download')
+    total = (job.finished_at - job.created_at) if job.finished_at else None
+    return {
+        "job": job.id,
+        "url": job.url,
+        "title": job.title,
+        "state": job.state,
+        "format": job.format_type,
+        "quality": job.quality,
+        "merge_mode": job.merge_mode,
+        "playlist": job.batch.job.id if job.batch else None,
+        "created_at": round(job.created_at, 3),
+        "finished_at": round(job.finished_at, 3) if job.finished_at else None,
+        "total_seconds": round(total, 3) if total is not None else None,
+        "phases": {phase: round(seconds, 3) for phase, seconds in job.phases.items()},
+        "bytes": job.downloaded_bytes,
+        "throughput": round(job.downloaded_bytes / download_seconds) if download_seconds else None,
+        "error": job.error,
+    }
+
+
+class MetricsRecorder:
+    def __init__(self, directory=metrics_dir):
+        self.directory = directory
+        self.jobs_file = os.path.join(directory, "jobs.jsonl")
+        self.prometheus_file = os.path.join(directory, "youloader.prom")
+        os.makedirs(directory, exist_ok=True)
+        self._lock = Lock()
+        self.states = {}
+        self.phase_seconds = {}
+        self.phase_count = {}
+        self.merge_modes = {}
+        self.bytes = 0
+        self.download_seconds = 0.0
+
+    def record(self, job):
+        registro = registro_do_job(job)
+        with self._lock:
+            self.states[job.state] = self.states.get(job.state, 0) + 1
+            for phase, seconds in job.phases.items():
+                phase = fase_agregada(phase)
+                self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+                self.phase_count[phase] = self.phase_count.get(phase, 0) + 1
+                if phase == 'download':
+                    self.download_seconds += seconds
+            if job.merge_mode:
+                self.merge_modes[job.merge_mode] = self.merge_modes.get(job.merge_mode, 0) + 1
+            self.bytes += job.downloaded_bytes
+
+            try:
+                with open(self.jobs_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                self._write_prometheus()
+            except OSError as e:
+                logging.warning(f"Erro ao gravar métricas: {e}")
+
+        logging.info(f"[Job {job.id}] Tempos: " +
+                     ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in registro["phases"].items()))
+        return registro
+
+    def throughput(self):
+        return self.bytes / self.download_seconds if self.download_seconds else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "states": dict(self.states),
+                "phases": {phase: (self.phase_seconds[phase], self.phase_count[phase]) for phase in self.phase_seconds},
+                "merge_modes": dict(self.merge_modes),
+                "bytes": self.bytes,
+                "throughput": self.throughput(),
+            }
+
+    def prometheus_text(self):
+        linhas = [
+            "# HELP youloader_jobs_total Jobs encerrados por estado.",
+            "# TYPE youloader_jobs_total counter",
+        ]
+        linhas += [f'youloader_jobs_total{{state="{state}"}} {count}' for state, count in sorted(self.states.items())]
+        linhas += [
+            "# HELP youloader_phase_seconds Tempo gasto em cada fase dos jobs.",
+            "# TYPE youloader_phase_seconds summary",
+        ]
+        for phase in sorted(self.phase_seconds):
+            linhas.append(f'youloader_phase_seconds_sum{{phase="{phase}"}} {self.phase_seconds[phase]:.3f}')
+            linhas.append(f'youloader_phase_seconds_count{{phase="{phase}"}} {self.phase_count[phase]}')
+        linhas += [
+            "# HELP youloader_merge_total Mesclagens por modo (remux ou transcodificação).",
+            "# TYPE youloader_merge_total counter",
+        ]
+        linhas += [f'youloader_merge_total{{mode="{mode}"}} {count}' for mode, count in sorted(self.merge_modes.items())]
+        linhas += [
+            "# HELP youloader_downloaded_bytes_total Bytes baixados.",
+            "# TYPE youloader_downloaded_bytes_total counter",
+            f"youloader_downloaded_bytes_total {self.bytes}",
+            "# HELP youloader_download_throughput_bytes Vazão média durante as fases de download.",
+            "# TYPE youloader_download_throughput_bytes gauge",
+            f"youloader_download_throughput_bytes {self.throughput():.0f}",
+        ]
+        return "\n".join(linhas) + "\n"
+
+    def _write_prometheus(self):
+        # Escrita atômica: o coletor (ex.: textfile do node_exporter) nunca lê um arquivo pela metade
+        tmp_path = self.prometheus_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, self.prometheus_file)
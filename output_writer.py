@@ -0,0 +1,232 @@
+import os
+import time
+import errno
+import uuid
+import shutil
+import hashlib
+import logging
+from threading import Condition, Lock
+
+from download_archive import data_dir
+from jobs import formatar_bytes
+
+staging_dir = os.environ.get("YOULOADER_STAGING_DIR") or os.path.join(data_dir, "staging")
+
+# Cópias simultâneas para um mesmo disco ou compartilhamento de destino; mais que isso só intercala escritas na rede
+MAX_TRANSFERS_PER_DESTINATION = 2
+# Bloco da cópia para o destino: poucas escritas grandes e sequenciais
+COPY_BUFFER = 8 * 1024 * 1024
+# Espaço deixado livre em cada disco além do que os downloads em andamento ainda vão gravar
+MIN_FREE_SPACE = 256 * 1024 * 1024
+# Nome do arquivo enquanto é copiado para o destino; o nome definitivo só aparece com a cópia completa
+PUBLISH_SUFFIX = '.youloader-tmp'
+
+
+class EspacoInsuficiente(Exception):
+    pass
+
+
+def preallocar(f, tamanho):
+    # Reserva os blocos de uma vez: menos fragmentação, e a falta de espaço aparece antes do download e não no meio
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, tamanho)
+            return
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+            # Sistema de arquivos sem suporte (ex.: alguns compartilhamentos de rede)
+    # No NTFS, estender o arquivo já aloca os clusters
+    f.truncate(tamanho)
+
+
+def pasta_existente(path):
+    # A pasta de destino pode ainda não ter sido criada; vale o disco da pasta mais próxima que existe
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def volume(path):
+    # Identifica o disco ou compartilhamento: C:, \\servidor\pasta ou o dispositivo no Linux
+    drive = os.path.splitdrive(os.path.abspath(path))[0]
+    if drive:
+        return drive.lower()
+    try:
+        return os.stat(pasta_existente(path)).st_dev
+    except OSError:
+        return path
+
+
+def mover_sem_sobrescrever(origem, destino):
+    # Nunca substitui um arquivo que já está no destino: com o nome ocupado, usa "titulo (1).ext", "titulo (2).ext"...
+    base, ext = os.path.splitext(destino)
+    n = 0
+    while True:
+        candidato = f"{base} ({n}){ext}" if n else destino
+        try:
+            # O link falha se o nome já existe, sem a janela entre verificar e renomear
+            os.link(origem, candidato)
+        except FileExistsError:
+            n += 1
+            continue
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                raise
+            # Sistema de arquivos sem links (FAT, alguns compartilhamentos de rede)
+            if os.path.lexists(candidato):
+                n += 1
+                continue
+            try:
+                # No Windows, rename também falha se o nome já existe
+                os.rename(origem, candidato)
+            except FileExistsError:
+                n += 1
+                continue
+            return candidato
+        os.remove(origem)
+        return candidato
+
+
+class OutputWriter:
+    # Downloads, arquivos parciais e mesclagens ficam em uma pasta local; a pasta de destino (muitas vezes um
+    # compartilhamento de rede) recebe só o arquivo pronto, em uma cópia sequencial, com o nome definitivo no fim
+    def __init__(self, directory=staging_dir, max_transfers=MAX_TRANSFERS_PER_DESTINATION, min_free=MIN_FREE_SPACE):
+        self.directory = os.path.abspath(directory)
+        self.max_transfers = max(1, max_transfers)
+        self.min_free = min_free
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = Lock()
+        self._transfer_cond = Condition(self._lock)
+        # Cópias em andamento por volume de destino
+        self._transfers = {}
+        # Bytes que os downloads em andamento ainda vão gravar, por volume, e a parte de cada job
+        self._reserved = {}
+        self._jobs = {}
+        logging.info(f"Pasta de trabalho local: {self.directory} ({self.max_transfers} cópias por destino)")
+
+    def staging_folder(self, folder):
+        # Uma subpasta por destino: o mesmo título em pastas diferentes não colide, e um job retomado reencontra
+        # os arquivos parciais
+        nome = hashlib.sha1(os.path.abspath(folder).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, nome)
+
+    def destination(self, job, filepath):
+        return os.path.join(job.folder, os.path.basename(filepath))
+
+    def reserve(self, job, staging_bytes, destination_bytes):
+        # Verifica o espaço livre antes do download, descontando o que os outros jobs em andamento vão ocupar
+        staging = self.staging_folder(job.folder)
+        demand = {volume(staging): [staging, staging_bytes]}
+        key = volume(job.folder)
+        if key not in demand:
+            demand[key] = [job.folder, destination_bytes]
+        with self._lock:
+            self._release(job.id)
+            for key, (path, size) in demand.items():
+                try:
+                    free = shutil.disk_usage(pasta_existente(path)).free
+                except OSError as e:
+                    logging.warning(f"[Job {job.id}] Não foi possível verificar o espaço livre em {path}: {e}")
+                    continue
+                available = free - self._reserved.get(key, 0) - self.min_free
+                if size > available:
+                    raise EspacoInsuficiente(f"Espaço insuficiente em {path}: {formatar_bytes(size)} necessários, "
+                                             f"{formatar_bytes(max(0, available))} disponíveis")
+            for key, (_, size) in demand.items():
+                self._reserved[key] = self._reserved.get(key, 0) + size
+            self._jobs[job.id] = [(key, size) for key, (_, size) in demand.items()]
+
+    def release(self, job):
+        with self._lock:
+            self._release(job.id)
+
+    def _release(self, job_id):
+        for key, size in self._jobs.pop(job_id, ()):
+            self._reserved[key] -= size
+            if self._reserved[key] <= 0:
+                del self._reserved[key]
+
+    def publish(self, job, filepath):
+        # Leva o arquivo pronto para a pasta de destino e devolve o caminho final
+        destino = self.destination(job, filepath)
+        if os.path.abspath(filepath) == os.path.abspath(destino):
+            return destino
+        os.makedirs(job.folder, exist_ok=True)
+        try:
+            # Mesmo disco: não copia nada
+            return self._avisar_renomeado(job, destino, mover_sem_sobrescrever(filepath, destino))
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        key = volume(job.folder)
+        self._acquire_transfer(key)
+        try:
+            started = time.monotonic()
+            size, destino = self._copy(filepath, destino)
+            elapsed = time.monotonic() - started
+            logging.info(f"[Job {job.id}] Copiado para {destino}: {formatar_bytes(size)} em {elapsed:.1f}s "
+                         f"({formatar_bytes(size / max(elapsed, 1e-6))}/s)")
+        finally:
+            self._release_transfer(key)
+        try:
+            os.remove(filepath)
+        except OSError as e:
+            logging.warning(f"[Job {job.id}] Não foi possível remover o arquivo da pasta de trabalho {filepath}: {e}")
+        return self._avisar_renomeado(job, self.destination(job, filepath), destino)
+
+    def _avisar_renomeado(self, job, pedido, final):
+        if final != pedido:
+            logging.warning(f"[Job {job.id}] {pedido} já existe; salvo como {os.path.basename(final)}")
+        return final
+
+    def _acquire_transfer(self, key):
+        with self._transfer_cond:
+            while self._transfers.get(key, 0) >= self.max_transfers:
+                self._transfer_cond.wait()
+            self._transfers[key] = self._transfers.get(key, 0) + 1
+
+    def _release_transfer(self, key):
+        with self._transfer_cond:
+            count = self._transfers.get(key, 0) - 1
+            if count > 0:
+                self._transfers[key] = count
+            else:
+                self._transfers.pop(key, None)
+            self._transfer_cond.notify_all()
+
+    def _copy(self, origem, destino):
+        # Nome temporário único: dois jobs publicando o mesmo título na mesma pasta não escrevem no mesmo arquivo
+        temporario = f"{destino}.{uuid.uuid4().hex[:12]}{PUBLISH_SUFFIX}"
+        size = os.path.getsize(origem)
+        buffer = bytearray(COPY_BUFFER)
+        view = memoryview(buffer)
+        try:
+            # 'x': nunca abre um arquivo que já existe
+            with open(origem, 'rb') as src, open(temporario, 'xb') as dst:
+                preallocar(dst, size)
+                while True:
+                    lidos = src.readinto(buffer)
+                    if not lidos:
+                        break
+                    dst.write(view[:lidos])
+                dst.flush()
+                # Sem isto o nome definitivo poderia aparecer antes de os dados chegarem ao servidor
+                os.fsync(dst.fileno())
+            try:
+                shutil.copystat(origem, temporario)
+            except OSError as e:
+                logging.debug(f"Data de modificação não copiada para {temporario}: {e}")
+            destino = mover_sem_sobrescrever(temporario, destino)
+        except BaseException:
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+            raise
+        return size, destino
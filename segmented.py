@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import time
+import logging
+from threading import Thread, Lock, Event
+
+from yt_dlp.downloader import PROTOCOL_MAP
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+
+from output_writer import preallocar
+
+# Abaixo disso o custo de abrir novas conexões não compensa
+MIN_SEGMENT_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+PROGRESS_INTERVAL = 0.1
+# Progresso de cada segmento, salvo ao lado do arquivo parcial para retomar o download
+STATE_SUFFIX = '.segmentos'
+STATE_INTERVAL = 1.0
+
+
+class RangeNaoSuportado(Exception):
+    pass
+
+
+def dividir_em_segmentos(total, segmentos, tamanho_minimo=MIN_SEGMENT_SIZE):
+    segmentos = max(1, min(segmentos, total // tamanho_minimo or 1))
+    tamanho = total // segmentos
+    limites = []
+    for i in range(segmentos):
+        inicio = i * tamanho
+        fim = total - 1 if i == segmentos - 1 else inicio + tamanho - 1
+        limites.append((inicio, fim))
+    return limites
+
+
+def descobrir_tamanho(abrir, url, headers=None):
+    # Pede só o primeiro byte: confirma o suporte a Range e lê o tamanho em Content-Range
+    resposta = abrir(url, {**(headers or {}), 'Range': 'bytes=0-0'})
+    try:
+        if resposta.status != 206:
+            raise RangeNaoSuportado(f"servidor respondeu {resposta.status} a um pedido com Range")
+        match = re.search(r'/(\d+)', resposta.headers.get('Content-Range') or '')
+        if not match:
+            raise RangeNaoSuportado("resposta sem Content-Range")
+        return int(match.group(1))
+    finally:
+        resposta.close()
+
+
+def carregar_estado(destino, total):
+    try:
+        with open(destino + STATE_SUFFIX, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+        if estado['total'] != total or os.path.getsize(destino) != total:
+            return None
+        return [tuple(limite) for limite in estado['limites']], estado['baixados']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def salvar_estado(destino, total, limites, baixados):
+    tmp_path = destino + STATE_SUFFIX + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'total': total, 'limites': limites, 'baixados': list(baixados)}, f)
+    os.replace(tmp_path, destino + STATE_SUFFIX)
+
+
+def remover_estado(destino):
+    try:
+        os.remove(destino + STATE_SUFFIX)
+    except OSError:
+        pass
+
+
+def baixar_segmentado(abrir, url, destino, total, segmentos, headers=None, progresso=None, retomar=True):
+    estado = carregar_estado(destino, total) if retomar else None
+    if estado:
+        limites, baixados = estado
+        logging.info(f"Retomando download segmentado: {sum(baixados)} de {total} bytes já baixados")
+    else:
+        limites = dividir_em_segmentos(total, segmentos)
+        baixados = [0] * len(limites)
+        # Pré-aloca o arquivo para que cada conexão escreva direto na sua posição
+        with open(destino, 'wb') as f:
+            preallocar(f, total)
+    erros = []
+    parar = Event()
+    lock = Lock()
+
+    def baixar_parte(indice, inicio, fim):
+        # Segmentos já concluídos em uma execução anterior não abrem conexão
+        inicio += baixados[indice]
+        if inicio > fim:
+            return
+        try:
+            resposta = abrir(url, {**(headers or {}), 'Range': f'bytes={inicio}-{fim}'})
+            try:
+                if resposta.status != 206:
+                    raise RangeNaoSuportado(f"servidor respondeu {resposta.status} a um pedido com Range")
+                with open(destino, 'r+b') as f:
+                    f.seek(inicio)
+                    restante = fim - inicio + 1
+                    while restante > 0 and not parar.is_set():
+                        bloco = resposta.read(min(CHUNK_SIZE, restante))
+                        if not bloco:
+                            raise ConnectionError(f"conexão encerrada faltando {restante} bytes do segmento {indice}")
+                        f.write(bloco)
+                        # O estado salvo nunca conta bytes que ainda estão só no buffer
+                        f.flush()
+                        restante -= len(bloco)
+                        baixados[indice] += len(bloco)
+            finally:
+                resposta.close()
+        except Exception as e:
+            with lock:
+                erros.append(e)
+            parar.set()
+
+    threads = [Thread(target=baixar_parte, args=(i, inicio, fim), daemon=True)
+               for i, (inicio, fim) in enumerate(limites)]
+    if progresso:
+        # Primeira amostra: os bytes retomados de uma execução anterior
+        progresso(sum(baixados))
+    for thread in threads:
+        thread.start()
+
+    # O progresso é reportado só por esta thread, mesmo com várias conexões abertas
+    ultimo_estado = time.monotonic()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(PROGRESS_INTERVAL / len(threads))
+            if progresso:
+                progresso(sum(baixados))
+            if time.monotonic() - ultimo_estado >= STATE_INTERVAL:
+                salvar_estado(destino, total, limites, baixados)
+                ultimo_estado = time.monotonic()
+    except BaseException:
+        # Ex.: download cancelado pelo hook de progresso; as conexões param no próximo bloco
+        parar.set()
+        salvar_estado(destino, total, limites, baixados)
+        raise
+
+    if erros or parar.is_set():
+        salvar_estado(destino, total, limites, baixados)
+        if erros:
+            raise erros[0]
+        raise IOError("download segmentado interrompido")
+    remover_estado(destino)
+    return len(limites)
+
+
+class SegmentedHttpFD(HttpFD):
+    def real_download(self, filename, info_dict):
+        segmentos = self.params.get('youloader_segments') or 1
+        if segmentos <= 1 or self.params.get('test') or info_dict.get('protocol') not in ('http', 'https'):
+            return super().real_download(filename, info_dict)
+
+        url = info_dict['url']
+        headers = info_dict.get('http_headers') or {}
+
+        def abrir(url, extra_headers):
+            return self.ydl.urlopen(Request(url, headers={**headers, **extra_headers}))
+
+        try:
+            total = info_dict.get('filesize') or descobrir_tamanho(abrir, url)
+        except Exception as e:
+            logging.info(f"Download segmentado indisponível para {info_dict.get('format_id')}: {e}")
+            return super().real_download(filename, info_dict)
+
+        if total < 2 * MIN_SEGMENT_SIZE:
+            return super().real_download(filename, info_dict)
+
+        tmpfilename = self.temp_name(filename)
+        retomar = self.params.get('continuedl', True)
+        if (retomar and os.path.exists(tmpfilename) and not os.path.exists(tmpfilename + STATE_SUFFIX)
+                and os.path.getsize(tmpfilename) < total):
+            # Parcial de um download com uma conexão: o downloader padrão continua de onde parou
+            return super().real_download(filename, info_dict)
+        self.report_destination(filename)
+        started = time.time()
+        retomados = []
+
+        def progresso(baixados):
+            now = time.time()
+            if not retomados:
+                retomados.append(baixados)
+            # Velocidade e tempo restante consideram só o que foi baixado nesta execução
+            novos = baixados - retomados[0]
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': baixados,
+                'total_bytes': total,
+                'filename': filename,
+                'tmpfilename': tmpfilename,
+                'elapsed': now - started,
+                'speed': self.calc_speed(started, now, novos),
+                'eta': self.calc_eta(started, now, total - retomados[0], novos),
+            }, info_dict)
+
+        try:
+            usados = baixar_segmentado(abrir, url, tmpfilename, total, segmentos, progresso=progresso, retomar=retomar)
+        except RangeNaoSuportado as e:
+            logging.info(f"Servidor sem suporte a Range, usando uma conexão: {e}")
+            self.try_remove(tmpfilename)
+            remover_estado(tmpfilename)
+            return super().real_download(filename, info_dict)
+
+        logging.debug(f"Download segmentado de {info_dict.get('format_id')}: {usados} conexões, "
+                      f"{total} bytes em {time.time() - started:.1f}s")
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'filename': filename,
+            'elapsed': time.time() - started,
+        }, info_dict)
+        return True
+
+
+def instalar():
+    # Downloads progressivos passam a usar o downloader segmentado; os demais protocolos não mudam
+    PROTOCOL_MAP['http'] = SegmentedHttpFD
+    PROTOCOL_MAP['https'] = SegmentedHttpFD
@@ -0,0 +1,248 @@
+import os
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from threading import Lock
+
+# Um job reservado volta para a fila se o nó não renovar a reserva nesse prazo; os relógios dos nós devem estar
+# sincronizados (NTP) com folga bem menor que isso
+LEASE_SECONDS = 60
+# Renovações por prazo de reserva: uma renovação perdida não basta para o job ser tomado por outro nó
+HEARTBEATS_PER_LEASE = 4
+# Um job cujo nó parou de responder tantas vezes provavelmente derruba quem o baixa; passa a erro
+MAX_CLAIMS = 3
+# Espera pelo bloqueio do arquivo quando outro nó está escrevendo
+BUSY_TIMEOUT = 30
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+SKIPPED = "skipped"
+ERROR = "error"
+STATES = (QUEUED, RUNNING, FINISHED, SKIPPED, ERROR)
+
+JOB_COLUMNS = "id, url, quality, format_type, folder, fast_remux, title, parent_id, claims"
+# Um mesmo link só pode estar uma vez na fila ou em andamento para cada formato, qualidade e pasta
+UNIQUE_COLUMNS = "url, format_type, quality, folder"
+
+
+def linha_do_job(row):
+    return {
+        "id": row[0],
+        "url": row[1],
+        "quality": row[2],
+        "format_type": row[3],
+        "folder": row[4],
+        "fast_remux": bool(row[5]),
+        "title": row[6],
+        "parent_id": row[7],
+        "claims": row[8],
+    }
+
+
+class SharedJobStore:
+    # Backlog compartilhado por vários nós do worker.py. Outro backend (ex.: um substituto em memória) só precisa
+    # oferecer os mesmos métodos: register_node, enqueue, claim, heartbeat, finish, release, outstanding, retry_failed
+    # e stats.
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = Lock()
+        # Sem transação implícita: a reserva de jobs precisa de BEGIN IMMEDIATE para dois nós não pegarem o mesmo
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        # WAL depende de memória compartilhada entre processos da mesma máquina e não funciona em compartilhamentos
+        # de rede; o journal tradicional usa só o bloqueio de arquivo
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    quality TEXT NOT NULL,
+                    format_type TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    fast_remux INTEGER NOT NULL,
+                    title TEXT,
+                    parent_id INTEGER,
+                    state TEXT NOT NULL,
+                    node TEXT,
+                    lease_until REAL,
+                    claims INTEGER NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    seconds REAL,
+                    items INTEGER,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            # Enfileirar a mesma lista de novo não duplica o trabalho em andamento; depois de concluída, a mesma playlist
+            # ou canal pode ser enfileirada de novo para buscar os itens novos. Jobs com erro voltam com retry_failed
+            conn.execute("DROP INDEX IF EXISTS jobs_unique")
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS jobs_active ON jobs ({UNIQUE_COLUMNS}) "
+                         f"WHERE state IN ('{QUEUED}', '{RUNNING}')")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_node ON jobs (node, state)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS nodes (
+                    name TEXT PRIMARY KEY,
+                    workers INTEGER NOT NULL,
+                    started_at REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    finished INTEGER NOT NULL DEFAULT 0,
+                    skipped INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    busy_seconds REAL NOT NULL DEFAULT 0
+                )
+            """)
+        logging.info(f"Backlog compartilhado: {path}")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def register_node(self, node, workers):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO nodes (name, workers, started_at, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET workers = excluded.workers, started_at = excluded.started_at, "
+                "last_seen = excluded.last_seen, finished = 0, skipped = 0, failed = 0, bytes = 0, busy_seconds = 0",
+                (node, workers, now, now))
+
+    def enqueue(self, items):
+        # items: dicionários com url, quality, format_type, folder e, opcionalmente, fast_remux, title e parent_id
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (url, quality, format_type, folder, fast_remux, title, parent_id, state, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(item["url"], item["quality"], item["format_type"], item["folder"],
+                  int(item.get("fast_remux", True)), item.get("title"), item.get("parent_id"), QUEUED, now)
+                 for item in items])
+            return conn.total_changes - before
+
+    def claim(self, node, limit, lease=LEASE_SECONDS):
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            rows = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE state = ? ORDER BY id LIMIT ?",
+                                (QUEUED, limit)).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET state = ?, node = ?, lease_until = ?, claims = claims + 1, started_at = ? "
+                "WHERE id = ?",
+                [(RUNNING, node, now + lease, now, row[0]) for row in rows])
+            conn.execute("UPDATE nodes SET last_seen = ? WHERE name = ?", (now, node))
+        return [linha_do_job(row) for row in rows]
+
+    def _requeue_expired(self, conn, now):
+        # Jobs de nós que pararam de renovar a reserva (travados, desligados ou sem acesso ao arquivo)
+        expired = conn.execute("SELECT id, node, claims FROM jobs WHERE state = ? AND lease_until < ?",
+                               (RUNNING, now)).fetchall()
+        for job_id, node, claims in expired:
+            if claims >= MAX_CLAIMS:
+                conn.execute("UPDATE jobs SET state = ?, node = NULL, lease_until = NULL, finished_at = ?, "
+                             "last_error = ? WHERE id = ?",
+                             (ERROR, now, f"Abandonado {claims} vezes; o último nó foi {node}", job_id))
+                logging.error(f"Backlog: job {job_id} abandonado {claims} vezes (último nó: {node}), marcado como erro")
+            else:
+                conn.execute("UPDATE jobs SET state = ?, node = NULL, lease_until = NULL WHERE id = ?",
+                             (QUEUED, job_id))
+                logging.warning(f"Backlog: reserva do job {job_id} expirou no nó {node}, job devolvido à fila")
+
+    def heartbeat(self, node, lease=LEASE_SECONDS):
+        # Renova as reservas do nó e devolve os jobs que ainda são dele
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET lease_until = ? WHERE node = ? AND state = ?", (now + lease, node, RUNNING))
+            conn.execute("UPDATE nodes SET last_seen = ? WHERE name = ?", (now, node))
+            rows = conn.execute("SELECT id FROM jobs WHERE node = ? AND state = ?", (node, RUNNING)).fetchall()
+        return {row[0] for row in rows}
+
+    def finish(self, node, job_id, state, downloaded_bytes=0, seconds=None, title=None, error=None, items=None):
+        # False se a reserva já tinha expirado e o job foi entregue a outro nó
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, lease_until = NULL, bytes = ?, seconds = ?, title = COALESCE(?, title), "
+                "last_error = ?, items = ?, finished_at = ? WHERE id = ? AND node = ? AND state = ?",
+                (state, downloaded_bytes, seconds, title, error, items, now, job_id, node, RUNNING))
+            if not cursor.rowcount:
+                return False
+            counter = {FINISHED: "finished", SKIPPED: "skipped"}.get(state, "failed")
+            conn.execute(f"UPDATE nodes SET {counter} = {counter} + 1, bytes = bytes + ?, "
+                         f"busy_seconds = busy_seconds + ?, last_seen = ? WHERE name = ?",
+                         (downloaded_bytes, seconds or 0.0, now, node))
+        return True
+
+    def release(self, node):
+        # Encerramento normal: os jobs reservados voltam para a fila sem contar como abandono
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE jobs SET state = ?, node = NULL, lease_until = NULL, claims = claims - 1 "
+                                  "WHERE node = ? AND state = ?", (QUEUED, node, RUNNING))
+            return cursor.rowcount
+
+    def outstanding(self):
+        # Jobs que ainda podem gerar trabalho: na fila ou reservados (uma playlist reservada ainda vai crescer)
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+
+    def retry_failed(self):
+        with self._transaction() as conn:
+            # Um por link, e só se o mesmo link não foi enfileirado de novo nesse meio tempo
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, node = NULL, claims = 0, last_error = NULL WHERE id IN ("
+                "SELECT MIN(id) FROM jobs AS falho WHERE state = ? AND NOT EXISTS (SELECT 1 FROM jobs AS ativo "
+                "WHERE ativo.url = falho.url AND ativo.format_type = falho.format_type "
+                "AND ativo.quality = falho.quality AND ativo.folder = falho.folder AND ativo.state IN (?, ?)) "
+                f"GROUP BY {UNIQUE_COLUMNS})", (QUEUED, ERROR, QUEUED, RUNNING))
+            return cursor.rowcount
+
+    def stats(self, active_within=LEASE_SECONDS):
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            node_rows = self._conn.execute(
+                "SELECT name, workers, started_at, last_seen, finished, skipped, failed, bytes, busy_seconds "
+                "FROM nodes ORDER BY name").fetchall()
+            errors = self._conn.execute("SELECT id, url, node, last_error FROM jobs WHERE state = ? "
+                                        "ORDER BY finished_at DESC LIMIT 10", (ERROR,)).fetchall()
+        nodes = []
+        for name, workers, started_at, last_seen, finished, skipped, failed, downloaded, busy in node_rows:
+            elapsed = max(last_seen - started_at, 1e-6)
+            nodes.append({
+                "node": name,
+                "workers": workers,
+                "active": now - last_seen <= active_within,
+                "finished": finished,
+                "skipped": skipped,
+                "failed": failed,
+                "bytes": downloaded,
+                "throughput": downloaded / elapsed,
+                "busy_seconds": round(busy, 3),
+                "last_seen": last_seen,
+            })
+        return {
+            "states": {state: counts.get(state, 0) for state in STATES},
+            "nodes": nodes,
+            "throughput": sum(node["throughput"] for node in nodes if node["active"]),
+            "recent_errors": [{"id": row[0], "url": row[1], "node": row[2], "error": row[3]} for row in errors],
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager
+from threading import Lock, current_thread, main_thread
+
+
+def tempo_desde_o_inicio_do_processo():
+    # Inclui o que roda antes do main.py: o executável do PyInstaller e a inicialização do interpretador
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            criacao, saida, kernel, usuario, agora = (wintypes.FILETIME() for _ in range(5))
+            kernel32 = ctypes.windll.kernel32
+            if not kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), ctypes.byref(criacao), ctypes.byref(saida),
+                                            ctypes.byref(kernel), ctypes.byref(usuario)):
+                return None
+            kernel32.GetSystemTimeAsFileTime(ctypes.byref(agora))
+            # FILETIME conta intervalos de 100 ns
+            ticks = lambda ft: (ft.dwHighDateTime << 32) | ft.dwLowDateTime
+            return (ticks(agora) - ticks(criacao)) / 10_000_000
+        if os.path.exists("/proc/self/stat"):
+            with open("/proc/self/stat") as f:
+                # O nome do processo pode ter espaços; os campos seguintes começam depois do ')'
+                campos = f.read().rsplit(")", 1)[1].split()
+            with open("/proc/uptime") as f:
+                uptime = float(f.read().split()[0])
+            return uptime - int(campos[19]) / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        logging.debug("Não foi possível obter o horário de início do processo", exc_info=True)
+    return None
+
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # (fase, início e duração em segundos a partir do primeiro import do main.py, thread)
+        self.phases = []
+        self.milestones = {}
+        self._lock = Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name):
+        inicio = self.elapsed()
+        try:
+            yield
+        finally:
+            thread = "interface" if current_thread() is main_thread() else "segundo plano"
+            with self._lock:
+                self.phases.append((name, inicio, self.elapsed() - inicio, thread))
+
+    def milestone(self, name):
+        with self._lock:
+            self.milestones.setdefault(name, self.elapsed())
+
+    def report(self):
+        with self._lock:
+            phases = sorted(self.phases, key=lambda item: item[1])
+            milestones = sorted(self.milestones.items(), key=lambda item: item[1])
+        # Calculado só no relatório: a consulta ao sistema não entra no tempo de inicialização medido
+        idade = tempo_desde_o_inicio_do_processo()
+        before_python = max(0.0, idade - self.elapsed()) if idade is not None else None
+        antes = before_python or 0.0
+
+        linhas = ["Perfil de inicialização (ms desde o início do processo):",
+                  f"  {'fase':<48} {'início':>7} {'duração':>7}"]
+        if before_python is not None:
+            linhas.append(f"  {'antes do main.py (executável e interpretador)':<48} {0:>7.0f} {antes * 1000:>7.0f}")
+        else:
+            linhas.append("  antes do main.py: não disponível neste sistema; tempos contados do primeiro import")
+        for name, inicio, duracao, thread in phases:
+            rotulo = f"{name} [{thread}]"
+            linhas.append(f"  {rotulo:<48} {(antes + inicio) * 1000:>7.0f} {duracao * 1000:>7.0f}")
+        for name, instante in milestones:
+            linhas.append(f"  >> {name:<45} {(antes + instante) * 1000:>7.0f}")
+
+        resultado = {
+            "antes_do_python": round(before_python * 1000, 1) if before_python is not None else None,
+            "fases": [{"fase": name, "inicio": round((antes + inicio) * 1000, 1), "duracao": round(duracao * 1000, 1),
+                       "thread": thread} for name, inicio, duracao, thread in phases],
+            "marcos": {name: round((antes + instante) * 1000, 1) for name, instante in milestones},
+        }
+        # A última linha é JSON para ser comparada entre execuções (benchmarks/bench_inicio.py)
+        linhas.append(json.dumps(resultado, ensure_ascii=False))
+        return "\n".join(linhas)
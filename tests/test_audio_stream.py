@@ -0,0 +1,79 @@
+import io
+import re
+import sys
+
+import pytest
+from yt_dlp.utils import ContentTooShortError
+
+from audio_stream import RespostaEmPartes, transmitir_audio
+
+DADOS = bytes(range(256)) * 40
+
+
+class RespostaFalsa:
+    def __init__(self, dados, status=200, headers=None):
+        self.status = status
+        self.headers = headers or {"Content-Length": str(len(dados))}
+        self._dados = io.BytesIO(dados)
+        self.fechada = False
+
+    def read(self, amt=None):
+        return self._dados.read(amt)
+
+    def close(self):
+        self.fechada = True
+
+
+def servidor(dados, corte=None):
+    # Responde aos pedidos com Range; com corte, a conexão cai depois desse byte do arquivo
+    pedidos = []
+
+    def abrir(headers):
+        inicio, fim = map(int, re.fullmatch(r"bytes=(\d+)-(\d+)", headers["Range"]).groups())
+        pedidos.append((inicio, fim))
+        parte = dados[inicio:min(fim + 1, corte or len(dados))]
+        return RespostaFalsa(parte, 206, {"Content-Range": f"bytes {inicio}-{fim}/{len(dados)}"})
+    return abrir, pedidos
+
+
+def ler_tudo(resposta):
+    partes = []
+    while True:
+        bloco = resposta.read(1000)
+        if not bloco:
+            return b"".join(partes)
+        partes.append(bloco)
+
+
+def test_le_em_partes_com_range():
+    abrir, pedidos = servidor(DADOS)
+    resposta = RespostaEmPartes(abrir, 4096).iniciar()
+    assert resposta.total == len(DADOS)
+    assert ler_tudo(resposta) == DADOS
+    assert pedidos == [(0, 4095), (4096, 8191), (8192, len(DADOS) - 1)]
+
+
+def test_conexao_encerrada_antes_do_fim():
+    abrir, pedidos = servidor(DADOS, corte=5000)
+    resposta = RespostaEmPartes(abrir, 4096).iniciar()
+    assert ler_tudo(resposta) == DADOS[:5000]
+    assert resposta.total == len(DADOS)
+    assert len(pedidos) == 2
+
+
+def test_servidor_sem_range():
+    resposta = RespostaEmPartes(lambda headers: RespostaFalsa(DADOS), 4096).iniciar()
+    assert resposta.total == len(DADOS)
+    assert ler_tudo(resposta) == DADOS
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="usa um script no lugar do FFmpeg")
+def test_stream_truncado_falha(tmp_path):
+    # Faz o papel do FFmpeg: consome a entrada e sai com sucesso
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(f"#!{sys.executable}\nimport sys\nsys.stdin.buffer.read()\n")
+    ffmpeg.chmod(0o755)
+    destino = str(tmp_path / "audio.mp3")
+    with pytest.raises(ContentTooShortError):
+        transmitir_audio(RespostaFalsa(DADOS[:1000]), str(ffmpeg), destino, "192", esperado=len(DADOS))
+    assert transmitir_audio(RespostaFalsa(DADOS), str(ffmpeg), destino, "192", esperado=len(DADOS)) == len(DADOS)
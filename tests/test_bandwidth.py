@@ -0,0 +1,73 @@
+import time
+from datetime import datetime
+from threading import Thread
+
+import pytest
+
+from bandwidth import TokenBucket, interpretar_perfil
+
+
+def horario(texto):
+    return datetime.strptime(f"2026-01-01 {texto}", "%Y-%m-%d %H:%M")
+
+
+def test_perfil_com_conexoes_por_host():
+    perfil = interpretar_perfil(" 08:00 - 18:30 = 512/4 ")
+    assert (perfil.start, perfil.end) == (8 * 60, 18 * 60 + 30)
+    assert perfil.rate == 512 * 1024
+    assert perfil.max_per_host == 4
+
+
+def test_perfil_sem_conexoes_por_host():
+    assert interpretar_perfil("00:00-24:00=0").max_per_host is None
+
+
+def test_perfil_dentro_do_dia():
+    perfil = interpretar_perfil("08:00-18:00=512")
+    assert perfil.active(horario("08:00"))
+    assert perfil.active(horario("17:59"))
+    assert not perfil.active(horario("18:00"))
+    assert not perfil.active(horario("07:59"))
+
+
+def test_perfil_que_atravessa_a_meia_noite():
+    perfil = interpretar_perfil("22:00-06:00=128")
+    for texto in ("22:00", "23:59", "00:00", "05:59"):
+        assert perfil.active(horario(texto)), texto
+    for texto in ("06:00", "12:00", "21:59"):
+        assert not perfil.active(horario(texto)), texto
+
+
+@pytest.mark.parametrize("texto", ["", "abc", "08:00-18:00", "08:00-18:00=", "8-18=512", "08:00-18:00=-1",
+                                   "25:00-06:00=1", "08:00-25:00=1", "08:60-09:00=1", "08:00-09:75=1",
+                                   "08:00-18:00=512/"])
+def test_perfil_invalido(texto):
+    with pytest.raises(ValueError):
+        interpretar_perfil(texto)
+
+
+def test_sem_limite_nao_espera():
+    bucket = TokenBucket(0)
+    inicio = time.monotonic()
+    bucket.consume(10 ** 12)
+    assert time.monotonic() - inicio < 0.1
+
+
+def test_consumo_acima_da_taxa_espera():
+    bucket = TokenBucket(1024 * 1024)
+    inicio = time.monotonic()
+    for _ in range(4):
+        bucket.consume(64 * 1024)
+    # 256 KiB a 1 MiB/s, partindo do saldo zero
+    assert time.monotonic() - inicio >= 0.2
+
+
+def test_remover_o_limite_libera_quem_espera():
+    bucket = TokenBucket(1024)
+    thread = Thread(target=bucket.consume, args=(1024 * 1024,), daemon=True)
+    thread.start()
+    time.sleep(0.1)
+    assert thread.is_alive()
+    bucket.set_rate(0)
+    thread.join(2)
+    assert not thread.is_alive()
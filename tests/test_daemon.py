@@ -0,0 +1,42 @@
+import json
+import types
+import http.client
+
+import pytest
+
+from daemon import ApiServer, EventBroadcaster
+
+TOKEN = "segredo"
+
+
+@pytest.fixture
+def api(tmp_path):
+    fila = types.SimpleNamespace(list_jobs=lambda: [])
+    server = ApiServer(fila, EventBroadcaster(), str(tmp_path), port=0, token=TOKEN).iniciar()
+    yield server
+    server.parar()
+
+
+def chamar(server, method, path, body=b"", headers=None):
+    conexao = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conexao.putrequest(method, path)
+    for nome, valor in {"Authorization": f"Bearer {TOKEN}", **(headers or {})}.items():
+        conexao.putheader(nome, valor)
+    conexao.endheaders(body)
+    resposta = conexao.getresponse()
+    dados = json.loads(resposta.read() or b"null")
+    conexao.close()
+    return resposta.status, dados
+
+
+def test_content_length_invalido(api):
+    for valor in ("abc", "-5"):
+        status, dados = chamar(api, "POST", "/jobs", b"{}",
+                               {"Content-Type": "application/json", "Content-Length": valor})
+        assert status == 400
+        assert "Content-Length" in dados["error"]
+
+
+@pytest.mark.parametrize("limit, status", [("-1", 400), ("x", 400), ("0", 200), ("5", 200)])
+def test_limit(api, limit, status):
+    assert chamar(api, "GET", f"/jobs?limit={limit}")[0] == status
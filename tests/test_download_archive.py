@@ -0,0 +1,24 @@
+import sqlite3
+
+import pytest
+
+from download_archive import DownloadArchive, LOOKUP_CHUNK, SQLITE_MAX_VARIABLES
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = DownloadArchive(str(tmp_path / "archive.sqlite3"))
+    if hasattr(archive._conn, "setlimit"):
+        # O limite das versões antigas do SQLite, mesmo onde a biblioteca aceita mais
+        archive._conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, SQLITE_MAX_VARIABLES)
+    return archive
+
+
+def test_consulta_em_varios_blocos(archive):
+    keys = [("Youtube", f"v{n:05d}") for n in range(2 * LOOKUP_CHUNK + 3)]
+    gravados = set(keys[::7]) | {keys[LOOKUP_CHUNK - 1], keys[LOOKUP_CHUNK], keys[-1]}
+    for key in gravados:
+        archive.record(key, "mp4-Alta")
+    assert archive.contains_many(keys, "mp4-Alta") == gravados
+    assert archive.contains_many(keys, "mp3-Alta") == set()
+
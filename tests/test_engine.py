@@ -0,0 +1,105 @@
+import io
+
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import DownloadError, DownloadCancelled, ExtractorError, GeoRestrictedError, ContentTooShortError
+
+from engine import MetadataCache, argumentos_merge_mp4, chave_do_resultado, erro_transitorio, metadados_invalidos
+
+
+def erro_http(status):
+    return HTTPError(Response(io.BytesIO(b""), "https://example.com/video", {}, status=status))
+
+
+def embrulhado(causa):
+    # Como o yt-dlp entrega a falha ao chamador de extract_info/download
+    return DownloadError(f"ERROR: {causa}", (type(causa), causa, None))
+
+
+def test_erros_de_rede_sao_transitorios():
+    for erro in (TransportError("conexão reiniciada"), ConnectionResetError(), TimeoutError(),
+                 ContentTooShortError(100, 200)):
+        assert erro_transitorio(erro), erro
+        assert erro_transitorio(embrulhado(erro)), erro
+
+
+def test_status_http():
+    for status in (429, 500, 503):
+        assert erro_transitorio(embrulhado(erro_http(status)))
+    for status in (403, 404, 410):
+        assert not erro_transitorio(embrulhado(erro_http(status)))
+
+
+def test_extrator_com_causa_de_rede():
+    erro = ExtractorError("falha ao baixar a página", cause=TransportError("timeout"))
+    assert erro_transitorio(embrulhado(erro))
+
+
+def test_erros_definitivos():
+    for erro in (ExtractorError("Private video", expected=True), GeoRestrictedError("bloqueado"),
+                 DownloadCancelled("cancelado"), ValueError("inesperado")):
+        assert not erro_transitorio(erro), erro
+        assert not erro_transitorio(embrulhado(erro)), erro
+
+
+def test_cadeia_com_ciclo():
+    erro = RuntimeError("a")
+    outro = RuntimeError("b")
+    erro.__context__ = outro
+    outro.__context__ = erro
+    assert not erro_transitorio(erro)
+
+
+def test_cache_mantido_em_erros_transitorios():
+    for erro in (TransportError("timeout"), erro_http(503), erro_http(429), ContentTooShortError(100, 200)):
+        assert not metadados_invalidos(embrulhado(erro)), erro
+
+
+def test_cache_descartado_com_links_expirados():
+    for erro in (erro_http(403), erro_http(410), ExtractorError("Signature extraction failed"),
+                 ExtractorError("Private video", expected=True)):
+        assert metadados_invalidos(embrulhado(erro)), erro
+
+
+def test_nova_tentativa_reaproveita_os_metadados(tmp_path):
+    cache = MetadataCache(str(tmp_path), ttl=60)
+    info = {"id": "abc", "extractor_key": "Youtube", "title": "vídeo", "formats": []}
+
+    class Sessao:
+        def sanitize_info(self, info, remove_private_keys=False):
+            return info
+
+    key = chave_do_resultado(info)
+    for erro, mantido in ((erro_http(503), True), (erro_http(403), False)):
+        cache.put(Sessao(), info)
+        if metadados_invalidos(embrulhado(erro)):
+            cache.invalidate(key)
+        assert (cache.get(key) is not None) == mantido
+
+
+def streams(vcodec, acodec):
+    return {"requested_formats": [{"vcodec": vcodec, "acodec": "none"}, {"vcodec": "none", "acodec": acodec}]}
+
+
+def test_merge_copia_codecs_compativeis_com_mp4():
+    for vcodec, acodec in (("avc1.640028", "mp4a.40.2"), ("hev1.1.6.L93", "mp4a.40.5"), ("av01.0.08M.08", "mp3")):
+        args, descricao = argumentos_merge_mp4(streams(vcodec, acodec))
+        assert args == [], (vcodec, acodec)
+        assert descricao.startswith("remux")
+
+
+def test_merge_transcodifica_so_o_stream_incompativel():
+    assert argumentos_merge_mp4(streams("vp9", "mp4a.40.2"))[0] == ["-c:v", "libx264", "-c:a", "copy"]
+    for acodec in ("vorbis", "opus"):
+        assert argumentos_merge_mp4(streams("avc1.4d401f", acodec))[0] == ["-c:v", "copy", "-c:a", "aac"]
+    assert argumentos_merge_mp4(streams(None, None))[0] == ["-c:v", "libx264", "-c:a", "aac"]
+
+
+def test_merge_sem_remux_rapido_transcodifica():
+    args, descricao = argumentos_merge_mp4(streams("avc1.640028", "mp4a.40.2"), fast_remux=False)
+    assert args == ["-c:v", "libx264", "-c:a", "aac"]
+    assert "remux rápido desativado" in descricao
+
+
+def test_arquivo_unico_sem_mesclagem():
+    assert argumentos_merge_mp4({"vcodec": "avc1", "acodec": "mp4a.40.2"})[0] is None
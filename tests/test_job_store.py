@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import subprocess
+
+from jobs import DownloadJob
+from job_store import JobStore
+
+
+def registrar_em_outro_processo(path, url, esperar):
+    # Outro processo adiciona um job e fica vivo (esperar) ou termina sem fechar o arquivo
+    codigo = (f"import sys, time; sys.path[:0] = {sys.path!r}\n"
+              "from jobs import DownloadJob\nfrom job_store import JobStore\n"
+              f"JobStore({path!r}).add(DownloadJob({url!r}, 'Alta', 'mp4', '/tmp'))\n"
+              "print('ok', flush=True)\n"
+              f"time.sleep({30 if esperar else 0})\n")
+    processo = subprocess.Popen([sys.executable, "-c", codigo], stdout=subprocess.PIPE, text=True)
+    assert processo.stdout.readline().strip() == "ok"
+    if not esperar:
+        processo.wait()
+    return processo
+
+
+def test_so_retoma_jobs_de_processos_encerrados(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    vivo = registrar_em_outro_processo(path, "https://example.com/vivo", esperar=True)
+    try:
+        registrar_em_outro_processo(path, "https://example.com/morto", esperar=False)
+        store = JobStore(path)
+        assert [row["url"] for row in store.claim_pending()] == ["https://example.com/morto"]
+        # Já reservado por este processo
+        assert JobStore(path).claim_pending() == []
+    finally:
+        vivo.kill()
+        vivo.wait()
+    assert [row["url"] for row in JobStore(path).claim_pending()] == ["https://example.com/vivo"]
+
+
+def test_reserva_expirada(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path, lease=0.05)
+    store.add(DownloadJob("https://example.com/a", "Alta", "mp4", "/tmp"))
+    # Mesmo processo, mas outro dono, como um segundo computador com o arquivo em um compartilhamento
+    outro = JobStore(path)
+    outro.owner = f"outro-computador:{os.getpid()}"
+    assert outro.claim_pending() == []
+    time.sleep(0.1)
+    assert [row["url"] for row in outro.claim_pending()] == ["https://example.com/a"]
+
+
+def test_fechar_libera_os_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    store.add(DownloadJob("https://example.com/a", "Alta", "mp4", "/tmp"))
+    store.close()
+    outro = JobStore(path)
+    outro.owner = "outro-computador:1"
+    assert len(outro.claim_pending()) == 1
@@ -0,0 +1,50 @@
+import gc
+from threading import Event, Lock
+
+import engine
+from engine import DownloadQueue, JobResult
+from jobs import DownloadJob, DownloadListener
+
+
+class Contador(DownloadListener):
+    def __init__(self, total):
+        self.restantes = total
+        self.lock = Lock()
+        self.fim = Event()
+
+    def job_cancelled(self, job):
+        with self.lock:
+            self.restantes -= 1
+            if not self.restantes:
+                self.fim.set()
+
+
+def test_jobs_encerrados_limitados_a_max_ended_jobs(monkeypatch):
+    monkeypatch.setattr(engine, "MAX_ENDED_JOBS", 5)
+    contador = Contador(12)
+    fila = DownloadQueue(contador, workers=1)
+    jobs = []
+    for n in range(12):
+        # Cancelados antes de começar: encerram sem acessar a rede
+        job = DownloadJob(f"https://example.com/{n}", "Alta", "mp4", "/tmp")
+        job.cancelled = True
+        jobs.append(fila.submit(job))
+    assert contador.fim.wait(10)
+    assert [job.id for job in fila.list_jobs()] == [job.id for job in jobs[-5:]]
+    assert fila.counts()[DownloadJob.CANCELLED] == 12
+
+
+def test_resultado_nao_guarda_o_info_dict():
+    formatos = [{"format_id": str(n), "url": f"https://example.com/{n}"} for n in range(100)]
+    info = {"id": "abc", "extractor_key": "Youtube", "formats": formatos, "thumbnails": [{}] * 50,
+            "requested_downloads": [{"filepath": "/tmp/video.mp4"}]}
+    result = JobResult.from_info(info)
+    assert (result.key, result.filepath) == (("Youtube", "abc"), "/tmp/video.mp4")
+    assert not hasattr(result, "__dict__")
+    referencias = gc.get_referents(result)
+    assert not any(objeto is info or objeto is formatos for objeto in referencias)
+
+
+def test_jobs_sem_dict_por_instancia():
+    # __slots__: milhares de jobs na fila sem um dicionário de atributos cada
+    assert not hasattr(DownloadJob("https://example.com/1", "Alta", "mp4", "/tmp"), "__dict__")
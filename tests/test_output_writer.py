@@ -0,0 +1,134 @@
+import os
+import errno
+import types
+import shutil
+from threading import Barrier, Thread
+
+import pytest
+
+from output_writer import OutputWriter, EspacoInsuficiente, PUBLISH_SUFFIX, mover_sem_sobrescrever
+
+
+def job(job_id, folder):
+    return types.SimpleNamespace(id=job_id, folder=str(folder))
+
+
+def em_paralelo(funcoes):
+    barreira = Barrier(len(funcoes))
+    resultados = [None] * len(funcoes)
+
+    def executar(indice, funcao):
+        barreira.wait()
+        resultados[indice] = funcao()
+
+    threads = [Thread(target=executar, args=(indice, funcao)) for indice, funcao in enumerate(funcoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+def arquivos_de_origem(pasta, quantidade, tamanho=256 * 1024):
+    os.makedirs(pasta, exist_ok=True)
+    caminhos = []
+    for n in range(quantidade):
+        caminho = os.path.join(pasta, f"{n}", "video.mp4")
+        os.makedirs(os.path.dirname(caminho))
+        with open(caminho, "wb") as f:
+            f.write(bytes([n]) * tamanho)
+        caminhos.append(caminho)
+    return caminhos
+
+
+def conteudos(destino):
+    nomes = sorted(os.listdir(destino))
+    assert not [nome for nome in nomes if nome.endswith(PUBLISH_SUFFIX)]
+    resultado = set()
+    for nome in nomes:
+        with open(os.path.join(destino, nome), "rb") as f:
+            dados = f.read()
+        # Cada arquivo publicado é a cópia inteira de uma das origens, sem mistura
+        assert len(set(dados)) == 1
+        resultado.add(dados[0])
+    return nomes, resultado
+
+
+def test_copias_simultaneas_do_mesmo_titulo(tmp_path):
+    writer = OutputWriter(str(tmp_path / "trabalho"), max_transfers=4)
+    destino = tmp_path / "destino"
+    destino.mkdir()
+    origens = arquivos_de_origem(str(tmp_path / "origem"), 4)
+    resultados = em_paralelo([lambda origem=origem: writer._copy(origem, str(destino / "video.mp4"))
+                              for origem in origens])
+    finais = [final for _, final in resultados]
+    assert len(set(finais)) == 4
+    nomes, bytes_iniciais = conteudos(destino)
+    assert nomes == ["video (1).mp4", "video (2).mp4", "video (3).mp4", "video.mp4"]
+    assert bytes_iniciais == {0, 1, 2, 3}
+
+
+def test_publicacoes_simultaneas_do_mesmo_titulo(tmp_path):
+    writer = OutputWriter(str(tmp_path / "trabalho"))
+    destino = tmp_path / "destino"
+    origens = arquivos_de_origem(str(tmp_path / "origem"), 4)
+    finais = em_paralelo([lambda n=n, origem=origem: writer.publish(job(n, destino), origem)
+                          for n, origem in enumerate(origens)])
+    assert len(set(finais)) == 4
+    assert conteudos(destino)[1] == {0, 1, 2, 3}
+    assert not any(os.path.exists(origem) for origem in origens)
+
+
+def criar(caminho, conteudo):
+    with open(caminho, "w") as f:
+        f.write(conteudo)
+    return str(caminho)
+
+
+def ler(caminho):
+    with open(caminho) as f:
+        return f.read()
+
+
+def test_mover_para_nome_existente(tmp_path):
+    existente = criar(tmp_path / "video.mp4", "antigo")
+    criar(tmp_path / "video (1).mp4", "outro")
+    final = mover_sem_sobrescrever(criar(tmp_path / "novo", "novo"), existente)
+    assert final == str(tmp_path / "video (2).mp4")
+    assert (ler(existente), ler(final)) == ("antigo", "novo")
+    assert not os.path.exists(tmp_path / "novo")
+
+
+def test_mover_sem_suporte_a_links(tmp_path, monkeypatch):
+    def sem_links(origem, destino):
+        raise OSError(errno.EPERM, "links não suportados")
+    monkeypatch.setattr(os, "link", sem_links)
+    existente = criar(tmp_path / "video.mp4", "antigo")
+    final = mover_sem_sobrescrever(criar(tmp_path / "novo", "novo"), existente)
+    assert final == str(tmp_path / "video (1).mp4")
+    assert (ler(existente), ler(final)) == ("antigo", "novo")
+
+
+def test_publicar_o_mesmo_nome_duas_vezes(tmp_path):
+    writer = OutputWriter(str(tmp_path / "trabalho"))
+    destino = tmp_path / "destino"
+    finais = []
+    for conteudo in ("primeiro", "segundo"):
+        origem = os.path.join(writer.staging_folder(str(destino)), "video.mp4")
+        os.makedirs(os.path.dirname(origem), exist_ok=True)
+        finais.append(writer.publish(job(1, destino), criar(origem, conteudo)))
+    assert finais == [str(destino / "video.mp4"), str(destino / "video (1).mp4")]
+    assert [ler(final) for final in finais] == ["primeiro", "segundo"]
+
+
+def test_reserva_desconta_os_jobs_em_andamento(tmp_path):
+    livre = shutil.disk_usage(tmp_path).free
+    writer = OutputWriter(str(tmp_path / "trabalho"), min_free=0)
+    metade = livre // 2 + 1
+    writer.reserve(job(1, tmp_path), metade, metade)
+    # Reservar de novo para o mesmo job substitui a reserva anterior
+    writer.reserve(job(1, tmp_path), metade, metade)
+    with pytest.raises(EspacoInsuficiente):
+        writer.reserve(job(2, tmp_path), metade, metade)
+    writer.release(job(1, tmp_path))
+    writer.reserve(job(2, tmp_path), metade, metade)
@@ -0,0 +1,39 @@
+from segmented import dividir_em_segmentos, MIN_SEGMENT_SIZE
+
+
+def cobre_o_arquivo(limites, total):
+    esperado = 0
+    for inicio, fim in limites:
+        assert inicio == esperado
+        assert fim >= inicio
+        esperado = fim + 1
+    return esperado == total
+
+
+def test_ultimo_segmento_vai_ate_o_fim():
+    total = 10 * MIN_SEGMENT_SIZE + 7
+    limites = dividir_em_segmentos(total, 4)
+    assert len(limites) == 4
+    assert limites[-1][1] == total - 1
+    assert cobre_o_arquivo(limites, total)
+
+
+def test_divisao_exata():
+    limites = dividir_em_segmentos(8 * MIN_SEGMENT_SIZE, 4)
+    assert [fim - inicio + 1 for inicio, fim in limites] == [2 * MIN_SEGMENT_SIZE] * 4
+
+
+def test_segmentos_limitados_pelo_tamanho_minimo():
+    total = 3 * MIN_SEGMENT_SIZE - 1
+    limites = dividir_em_segmentos(total, 8)
+    assert len(limites) == 2
+    assert cobre_o_arquivo(limites, total)
+
+
+def test_arquivos_pequenos_ficam_em_um_segmento():
+    for total in (1, 2, 100, MIN_SEGMENT_SIZE - 1, MIN_SEGMENT_SIZE):
+        assert dividir_em_segmentos(total, 4) == [(0, total - 1)]
+
+
+def test_pelo_menos_um_segmento():
+    assert dividir_em_segmentos(5 * MIN_SEGMENT_SIZE, 0) == [(0, 5 * MIN_SEGMENT_SIZE - 1)]
@@ -0,0 +1,111 @@
+import sqlite3
+
+import pytest
+
+from shared_store import SharedJobStore, MAX_CLAIMS, QUEUED, RUNNING, FINISHED, ERROR
+
+
+def item(n):
+    return {"url": f"https://example.com/{n}", "quality": "Alta", "format_type": "mp4", "folder": "/tmp"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedJobStore(str(tmp_path / "backlog.sqlite3"))
+    store.register_node("a", 2)
+    store.register_node("b", 2)
+    yield store
+    store.close()
+
+
+def test_enqueue_ignora_duplicados(store):
+    assert store.enqueue([item(1), item(2)]) == 2
+    assert store.enqueue([item(2), item(3)]) == 1
+    assert store.outstanding() == 3
+
+
+def test_cada_job_vai_para_um_no(store):
+    store.enqueue([item(n) for n in range(3)])
+    primeiro = store.claim("a", 2)
+    segundo = store.claim("b", 2)
+    assert [job["url"] for job in primeiro] == [item(0)["url"], item(1)["url"]]
+    assert [job["url"] for job in segundo] == [item(2)["url"]]
+    assert store.claim("b", 2) == []
+    assert store.stats()["states"][RUNNING] == 3
+
+
+def test_reserva_expirada_volta_para_a_fila(store):
+    store.enqueue([item(1)])
+    job = store.claim("a", 1, lease=-1)[0]
+    # O nó "a" parou de renovar: o job vai para "b" e o resultado atrasado de "a" é recusado
+    assert [novo["id"] for novo in store.claim("b", 1)] == [job["id"]]
+    assert not store.finish("a", job["id"], FINISHED)
+    assert store.finish("b", job["id"], FINISHED, downloaded_bytes=10)
+    assert store.stats()["states"][FINISHED] == 1
+    assert store.outstanding() == 0
+
+
+def test_heartbeat_mantem_a_reserva(store):
+    store.enqueue([item(1)])
+    job = store.claim("a", 1, lease=-1)[0]
+    assert store.heartbeat("a") == {job["id"]}
+    assert store.claim("b", 1) == []
+
+
+def test_job_abandonado_vira_erro_depois_de_max_claims(store):
+    store.enqueue([item(1)])
+    for _ in range(MAX_CLAIMS):
+        assert len(store.claim("a", 1, lease=-1)) == 1
+    assert store.claim("b", 1) == []
+    stats = store.stats()
+    assert stats["states"][ERROR] == 1
+    assert "Abandonado" in stats["recent_errors"][0]["error"]
+    assert store.retry_failed() == 1
+    assert store.stats()["states"][QUEUED] == 1
+
+
+def test_release_nao_conta_como_abandono(store):
+    store.enqueue([item(1)])
+    for _ in range(MAX_CLAIMS + 1):
+        assert len(store.claim("a", 1)) == 1
+        assert store.release("a") == 1
+    assert store.claim("b", 1)[0]["claims"] == 0
+
+
+def test_enfileirar_de_novo_depois_de_concluido(store):
+    assert store.enqueue([item(1)]) == 1
+    job = store.claim("a", 1)[0]
+    # Em andamento, o mesmo link não entra de novo
+    assert store.enqueue([item(1)]) == 0
+    assert store.finish("a", job["id"], FINISHED)
+    # Concluído: uma nova sincronização da playlist volta para a fila
+    assert store.enqueue([item(1)]) == 1
+    assert [novo["url"] for novo in store.claim("b", 1)] == [item(1)["url"]]
+    assert store.stats()["states"][FINISHED] == 1
+
+
+def test_retry_failed_nao_duplica_link_enfileirado_de_novo(store):
+    store.enqueue([item(1)])
+    for _ in range(MAX_CLAIMS):
+        store.claim("a", 1, lease=-1)
+    store.claim("a", 1)
+    assert store.stats()["states"][ERROR] == 1
+    assert store.enqueue([item(1)]) == 1
+    assert store.retry_failed() == 0
+    assert store.stats()["states"][QUEUED] == 1
+
+
+def test_indice_antigo_e_substituido(tmp_path):
+    path = str(tmp_path / "backlog.sqlite3")
+    SharedJobStore(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX jobs_active")
+    conn.execute("CREATE UNIQUE INDEX jobs_unique ON jobs (url, format_type, quality, folder)")
+    conn.commit()
+    conn.close()
+    store = SharedJobStore(path)
+    store.register_node("a", 1)
+    store.enqueue([item(1)])
+    store.finish("a", store.claim("a", 1)[0]["id"], FINISHED)
+    assert store.enqueue([item(1)]) == 1
+    store.close()
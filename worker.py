@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import logging
+from threading import Lock, Event
+
+from app_logging import configurar_logging
+from jobs import QUALITIES, FORMATS, DEFAULT_WORKERS, DownloadJob, DownloadListener
+from engine import MAX_RETRIES, DownloadQueue
+from ffmpeg_utils import FFmpegBootstrap
+from download_archive import DownloadArchive
+from metrics import MetricsRecorder, metrics_dir
+from bandwidth import BandwidthScheduler, carregar_perfis
+from output_writer import OutputWriter, staging_dir, MAX_TRANSFERS_PER_DESTINATION
+from cli import ler_urls
+from shared_store import SharedJobStore, LEASE_SECONDS, HEARTBEATS_PER_LEASE, FINISHED, SKIPPED, ERROR
+
+# Intervalo entre consultas ao backlog; um job encerrado antecipa a próxima
+POLL_INTERVAL = 2.0
+# Jobs reservados por worker: um baixando e outro esperando, sem tirar trabalho dos demais nós
+CLAIMS_PER_WORKER = 2
+
+
+class SharedQueueWorker(DownloadListener):
+    def __init__(self, store, node, workers, lease=LEASE_SECONDS, stream=sys.stdout):
+        self.store = store
+        self.node = node
+        self.workers = workers
+        self.lease = lease
+        self.stream = stream
+        self.download_queue = None
+        self.finished = 0
+        self.skipped = 0
+        self.failed = 0
+        self.lost = 0
+        # Job local -> (id no backlog, instante da reserva)
+        self._claimed = {}
+        self._lock = Lock()
+        self._wake = Event()
+        self._stop = Event()
+
+    def emit(self, event, **fields):
+        line = json.dumps({"event": event, "time": round(time.time(), 3), "node": self.node, **fields},
+                          ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def run(self, download_queue, exit_when_idle=False, poll_interval=POLL_INTERVAL):
+        self.download_queue = download_queue
+        self.store.register_node(self.node, self.workers)
+        self.emit("node_started", workers=self.workers, store=self.store.path)
+        next_heartbeat = time.monotonic() + self.lease / HEARTBEATS_PER_LEASE
+        try:
+            while not self._stop.is_set():
+                claimed = self._claim()
+                if time.monotonic() >= next_heartbeat:
+                    self._heartbeat()
+                    next_heartbeat = time.monotonic() + self.lease / HEARTBEATS_PER_LEASE
+                if exit_when_idle and not claimed and self._idle() and not self.store.outstanding():
+                    break
+                self._wake.wait(poll_interval)
+                self._wake.clear()
+        finally:
+            try:
+                # Encerramento pedido (Ctrl+C): o que ainda estava reservado volta para os outros nós
+                released = self.store.release(self.node)
+                if released:
+                    logging.info(f"{released} jobs reservados devolvidos ao backlog")
+            except Exception as e:
+                logging.error(f"Erro ao devolver jobs ao backlog: {e}")
+                logging.exception("Detalhes do erro:")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _idle(self):
+        with self._lock:
+            return not self._claimed
+
+    def _claim(self):
+        with self._lock:
+            free = self.workers * CLAIMS_PER_WORKER - len(self._claimed)
+        if free <= 0:
+            return 0
+        try:
+            rows = self.store.claim(self.node, free, self.lease)
+        except Exception as e:
+            # Backlog inacessível (compartilhamento fora do ar): os downloads em andamento continuam
+            logging.error(f"Erro ao reservar jobs no backlog: {e}")
+            logging.exception("Detalhes do erro:")
+            return 0
+        for row in rows:
+            job = DownloadJob(row["url"], row["quality"], row["format_type"], row["folder"], row["fast_remux"])
+            job.title = row["title"]
+            with self._lock:
+                self._claimed[job.id] = (row["id"], time.monotonic())
+            self.emit("claimed", job=row["id"], url=row["url"], attempt=row["claims"] + 1)
+            self.download_queue.submit(job)
+        return len(rows)
+
+    def _heartbeat(self):
+        try:
+            owned = self.store.heartbeat(self.node, self.lease)
+        except Exception as e:
+            logging.error(f"Erro ao renovar as reservas no backlog: {e}")
+            logging.exception("Detalhes do erro:")
+            return
+        with self._lock:
+            lost = [(job_id, store_id) for job_id, (store_id, _) in self._claimed.items() if store_id not in owned]
+            for job_id, _ in lost:
+                del self._claimed[job_id]
+            self.lost += len(lost)
+        for job_id, store_id in lost:
+            # A reserva expirou enquanto o nó estava sem acesso ao backlog; o job pode já estar com outro nó
+            logging.warning(f"[Job {job_id}] Reserva do job {store_id} perdida, cancelando o download local")
+            self.download_queue.cancel(job_id)
+            self.emit("lease_lost", job=store_id)
+
+    def publish_entries(self, parent, entries):
+        # Itens de playlists e canais vão para o backlog: qualquer nó pode baixá-los, não só o que listou
+        with self._lock:
+            claimed = self._claimed.get(parent.id)
+        added = self.store.enqueue([{
+            "url": entry.get('url') or entry.get('webpage_url'),
+            "quality": parent.quality,
+            "format_type": parent.format_type,
+            "folder": parent.folder,
+            "fast_remux": parent.fast_remux,
+            "title": entry.get('title'),
+            "parent_id": claimed[0] if claimed else None,
+        } for entry in entries])
+        logging.info(f"[Job {parent.id}] {added} de {len(entries)} itens da playlist enviados ao backlog compartilhado")
+        self._wake.set()
+
+    def job_finished(self, job):
+        self._report(job, SKIPPED if job.state == DownloadJob.SKIPPED else FINISHED)
+
+    def job_failed(self, job, error):
+        self._report(job, ERROR, error)
+
+    def job_cancelled(self, job):
+        # Só acontece quando a reserva foi perdida; o job já saiu da lista de reservados
+        with self._lock:
+            self._claimed.pop(job.id, None)
+
+    def _report(self, job, state, error=None):
+        with self._lock:
+            claimed = self._claimed.pop(job.id, None)
+        if claimed is None:
+            return
+        store_id, started = claimed
+        seconds = time.monotonic() - started
+        items = job.playlist.delegated if job.playlist is not None else None
+        try:
+            recorded = self.store.finish(self.node, store_id, state, job.downloaded_bytes, seconds, job.title, error,
+                                         items)
+        except Exception as e:
+            # Sem registro a reserva expira e outro nó baixa de novo; o histórico local evita repetir aqui
+            logging.error(f"[Job {job.id}] Erro ao registrar o resultado no backlog: {e}")
+            logging.exception("Detalhes do erro:")
+            recorded = False
+        if not recorded:
+            logging.warning(f"[Job {job.id}] Resultado do job {store_id} não registrado; a reserva já não era deste nó")
+
+        with self._lock:
+            if state == FINISHED:
+                self.finished += 1
+            elif state == SKIPPED:
+                self.skipped += 1
+            else:
+                self.failed += 1
+        fields = {"error": error} if error else {}
+        if items is not None:
+            fields["items"] = items
+        self.emit(state, job=store_id, url=job.url, title=job.title, bytes=job.downloaded_bytes,
+                  seconds=round(seconds, 3), recorded=recorded, **fields)
+        self._wake.set()
+
+
+def nome_do_no():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="youloader-worker",
+        description="Vários computadores baixando um mesmo backlog: os jobs ficam em um arquivo SQLite "
+                    "compartilhado e cada nó reserva, baixa e registra o resultado.")
+    parser.add_argument("--store", default=os.environ.get("YOULOADER_SHARED_STORE"),
+                        help="arquivo do backlog compartilhado (padrão: YOULOADER_SHARED_STORE)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = subparsers.add_parser("enqueue", help="adiciona links ao backlog")
+    enqueue.add_argument("urls", nargs="*", help="links de vídeos, playlists ou canais")
+    enqueue.add_argument("-b", "--batch-file", help="arquivo com um link por linha ('-' para a entrada padrão)")
+    enqueue.add_argument("-f", "--format", choices=FORMATS, default="mp4", help="formato de saída")
+    enqueue.add_argument("-q", "--quality", choices=QUALITIES, default="Alta", help="qualidade do vídeo")
+    enqueue.add_argument("-o", "--output", required=True,
+                         help="pasta de destino, acessível com o mesmo caminho por todos os nós")
+    enqueue.add_argument("--no-fast-remux", action="store_true", help="sempre recodifica o vídeo ao mesclar")
+
+    run = subparsers.add_parser("run", help="baixa jobs do backlog até ser interrompido")
+    run.add_argument("--node", default=nome_do_no(), help="nome deste nó (padrão: computador-pid)")
+    run.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="downloads simultâneos neste nó")
+    run.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                     help="segundos sem renovação até os jobs de um nó voltarem para a fila")
+    run.add_argument("--poll-interval", type=float, default=POLL_INTERVAL,
+                     help="segundos entre consultas ao backlog")
+    run.add_argument("--exit-when-idle", action="store_true",
+                     help="encerra quando não houver mais jobs na fila nem em andamento em nenhum nó")
+    run.add_argument("--limit-rate", type=int, default=0, metavar="KB/s", help="limite de banda deste nó")
+    run.add_argument("--max-per-host", type=int, default=0, metavar="N", help="conexões por servidor")
+    run.add_argument("--no-archive", action="store_true", help="não ignora vídeos já baixados por este nó")
+    run.add_argument("--staging-dir", default=staging_dir,
+                     help="pasta local onde os arquivos são baixados e processados antes de ir para o destino "
+                          "(padrão: YOULOADER_STAGING_DIR ou ~/YouLoader_data/staging)")
+    run.add_argument("--no-staging", action="store_true",
+                     help="baixa e processa direto na pasta de destino")
+    run.add_argument("--max-transfers", type=int, default=MAX_TRANSFERS_PER_DESTINATION, metavar="N",
+                     help="cópias simultâneas para cada disco ou compartilhamento de destino")
+    run.add_argument("--retries", type=int, default=MAX_RETRIES, metavar="N",
+                     help="novas tentativas por job após falhas de rede")
+    run.add_argument("--metrics-dir", default=metrics_dir, help="pasta onde são gravados jobs.jsonl e youloader.prom")
+    run.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+
+    subparsers.add_parser("status", help="mostra jobs por estado e a vazão de cada nó, em JSON")
+    subparsers.add_parser("retry-failed", help="devolve os jobs com erro para a fila")
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if not args.store:
+        parser.error("informe o backlog com --store ou YOULOADER_SHARED_STORE")
+    store = SharedJobStore(args.store)
+
+    if args.command == "enqueue":
+        urls = ler_urls(args)
+        if not urls:
+            parser.error("informe ao menos um link ou um arquivo com --batch-file")
+        folder = os.path.abspath(args.output)
+        added = store.enqueue([{"url": url, "quality": args.quality, "format_type": args.format, "folder": folder,
+                                "fast_remux": not args.no_fast_remux} for url in urls])
+        print(json.dumps({"event": "enqueued", "added": added, "duplicates": len(urls) - added}))
+        return 0
+    if args.command == "status":
+        print(json.dumps(store.stats(), indent=2, ensure_ascii=False))
+        return 0
+    if args.command == "retry-failed":
+        print(json.dumps({"event": "requeued", "jobs": store.retry_failed()}))
+        return 0
+
+    log_file = configurar_logging(args.log_level, frontend="worker")
+    logging.info(f"=== INICIANDO MODO WORKER === nó {args.node}, {args.workers} downloads simultâneos, "
+                 f"backlog {args.store}")
+    bootstrap = FFmpegBootstrap().iniciar()
+    worker = SharedQueueWorker(store, args.node, args.workers, args.lease)
+    # A saída padrão fica reservada para os eventos JSON: o motor já manda as mensagens do yt-dlp para o log
+    download_queue = DownloadQueue(worker, workers=args.workers, ffmpeg_pronto=bootstrap.pronto,
+                                   archive=None if args.no_archive else DownloadArchive(),
+                                   scheduler=BandwidthScheduler(args.limit_rate * 1024, args.max_per_host,
+                                                                carregar_perfis()),
+                                   metrics=MetricsRecorder(args.metrics_dir), max_retries=args.retries,
+                                   entry_sink=worker.publish_entries,
+                                   writer=None if args.no_staging else OutputWriter(args.staging_dir,
+                                                                                    args.max_transfers))
+    started = time.monotonic()
+    code = 0
+    try:
+        worker.run(download_queue, args.exit_when_idle, args.poll_interval)
+    except KeyboardInterrupt:
+        worker.emit("interrupted")
+        code = 130
+    worker.emit("summary", finished=worker.finished, skipped=worker.skipped, failed=worker.failed,
+                lost=worker.lost, elapsed=round(time.monotonic() - started, 3), log=log_file)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())